@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from common.search import trigram_index
+
+
+class Migration(migrations.Migration):
+    """Trigram index of the usernames searched by the users connection."""
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        trigram_index('auth_user', 'username'),
+    ]
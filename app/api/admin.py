@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ApiKey
+from .models import ApiKey, PersistedQuery
 
 
 @admin.register(ApiKey)
@@ -9,5 +9,15 @@ class ApiKeyAdmin(admin.ModelAdmin):
 
     readonly_fields = ('token', 'date_created', 'date_modified')
     fields = (
-        'token', 'revoked', 'owner', 'date_created', 'date_modified'
+        'token', 'revoked', 'owner', 'max_query_cost', 'cost_budget', 'date_created',
+        'date_modified'
     )
+
+
+@admin.register(PersistedQuery)
+class PersistedQueryAdmin(admin.ModelAdmin):
+    """Admin customisation for PersistedQuery model."""
+
+    readonly_fields = ('sha256', 'query', 'date_created', 'date_modified')
+    fields = ('sha256', 'query', 'date_created', 'date_modified')
+    search_fields = ('sha256',)
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     name = 'app.api'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from .auth import invalidate_api_key, invalidate_owner_api_keys
+        from .models import ApiKey
+        post_save.connect(invalidate_api_key, sender=ApiKey)
+        post_delete.connect(invalidate_api_key, sender=ApiKey)
+        post_save.connect(invalidate_owner_api_keys, sender=User)
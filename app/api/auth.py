@@ -1,7 +1,83 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.http import JsonResponse
 
+from common.cache import LRUCache
 from .models import ApiKey
 
+VERSION_KEY = 'api-key:version:{}'
+
+# Validated tokens with the version they were validated at, and False for
+# invalid ones. Entries expire after API_KEY_CACHE_TIMEOUT, by when changes
+# made in other processes are applied. With an API_KEY_VERSION_CACHE, changes
+# set a new version of the token in it, so that every process applies
+# revocations immediately.
+api_key_cache = LRUCache(
+    maxsize=settings.API_KEY_CACHE_SIZE,
+    ttl=settings.API_KEY_CACHE_TIMEOUT
+)
+
+
+def get_version_cache():
+    """Return the cache of the versions of the tokens, read on every request, if any."""
+    if settings.API_KEY_VERSION_CACHE is None:
+        return None
+
+    cache = caches[settings.API_KEY_VERSION_CACHE]
+    if isinstance(cache, BaseDatabaseCache):
+        raise ImproperlyConfigured(
+            'API_KEY_VERSION_CACHE must not be a database cache, read on every request.'
+        )
+    return cache
+
+
+def get_version(token):
+    cache = get_version_cache()
+    return cache.get(VERSION_KEY.format(token)) if cache else None
+
+
+def get_api_key(token):
+    version = get_version(token)
+    entry = api_key_cache.get(token)
+
+    if entry is None or entry[0] != version:
+        try:
+            api_key = ApiKey.objects.select_related('owner').get(token=token, revoked=False)
+        except (ApiKey.DoesNotExist, TypeError):
+            api_key = False
+        entry = (version, api_key)
+        api_key_cache.set(token, entry)
+
+    return entry[1] or None
+
+
+def invalidate_token(token):
+    cache = get_version_cache()
+    if cache:
+        # Versions only need to outlive the entries validated before them
+        cache.set(VERSION_KEY.format(token), uuid.uuid4().hex, settings.API_KEY_CACHE_TIMEOUT)
+    api_key_cache.delete(token)
+
+
+def invalidate_api_key(sender, instance, **kwargs):
+    token = instance.token.hashid
+    invalidate_token(token)
+    # Also drop entries other requests validate before the change is committed
+    transaction.on_commit(lambda: invalidate_token(token))
+
+
+def invalidate_owner_api_keys(sender, instance, **kwargs):
+    # Api keys are cached with their owner
+    tokens = [api_key.token.hashid for api_key in ApiKey.objects.filter(owner_id=instance.pk)]
+    for token in tokens:
+        invalidate_token(token)
+    transaction.on_commit(lambda: [invalidate_token(token) for token in tokens])
+
 
 def authorization_required(func=None):
     def decorator(view_func):
@@ -11,9 +87,8 @@ def authorization_required(func=None):
                 data = {'message': 'Set your api_key in X-TavernaToken header.'}
                 return JsonResponse(data, status=401)
 
-            try:
-                ApiKey.objects.get(token=request.META[api_key], revoked=False)
-            except (ApiKey.DoesNotExist, TypeError):
+            request.api_key = get_api_key(request.META[api_key])
+            if not request.api_key:
                 data = {'message': 'Invalid Token.'}
                 return JsonResponse(data, status=401)
 
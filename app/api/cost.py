@@ -0,0 +1,180 @@
+"""
+Static cost and depth analysis of GraphQL operations, and per api key budgets.
+
+The cost of an operation is the number of objects it may resolve. A
+connection resolves as many as its first or last argument, a list
+GRAPHQL_COST_LIST_SIZE, and each object its own selections again. Scalars
+cost nothing. Operations are analyzed before execution, so that those that
+cost too much are rejected without touching the database.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, get_named_type
+from graphql.utils.get_operation_ast import get_operation_ast
+
+BUDGET_KEY = 'graphql-cost:{}:{}'
+
+
+class CostAnalysis(object):
+    """Cost and depth of the selections of an operation."""
+
+    def __init__(self, schema, fragments, variables):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+
+    def get_fields(self, selection_set, parent_type):
+        """Yield the fields of selection_set with their parent type, through fragments."""
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                yield selection, parent_type
+                continue
+
+            if isinstance(selection, ast.FragmentSpread):
+                selection = self.fragments[selection.name.value]
+            type_condition = selection.type_condition
+            fragment_type = (
+                self.schema.get_type(type_condition.name.value) if type_condition else parent_type
+            )
+            yield from self.get_fields(selection.selection_set, fragment_type)
+
+    def get_argument(self, field_ast, name):
+        for argument in field_ast.arguments:
+            if argument.name.value == name:
+                if isinstance(argument.value, ast.Variable):
+                    return self.variables.get(argument.value.name.value)
+                if isinstance(argument.value, ast.IntValue):
+                    return int(argument.value.value)
+
+    def get_page_size(self, field_ast):
+        sizes = [
+            size for size in (self.get_argument(field_ast, 'first'),
+                              self.get_argument(field_ast, 'last'))
+            if isinstance(size, int) and size >= 0
+        ]
+        return min(sizes) if sizes else settings.GRAPHQL_COST_LIST_SIZE
+
+    @staticmethod
+    def is_connection(graphql_type):
+        fields = getattr(graphql_type, 'fields', {})
+        return 'edges' in fields and 'pageInfo' in fields
+
+    def measure(self, selection_set, parent_type, page_size=None):
+        """Return the cost and depth of selection_set, the edges of a connection of page_size."""
+        cost = depth = 0
+        for field_ast, field_parent_type in self.get_fields(selection_set, parent_type):
+            field = getattr(field_parent_type, 'fields', {}).get(field_ast.name.value)
+            if field is None or not field_ast.selection_set:
+                # Scalars and introspection
+                continue
+
+            field_type = field.type
+            if isinstance(field_type, GraphQLNonNull):
+                field_type = field_type.of_type
+            named_type = get_named_type(field_type)
+
+            # An edge and its node are one object
+            own_cost = 1
+            if page_size is not None and field_ast.name.value == 'edges':
+                count, own_cost = page_size, 0
+            elif isinstance(field_type, GraphQLList):
+                count = settings.GRAPHQL_COST_LIST_SIZE
+            else:
+                count = 1
+
+            field_cost, field_depth = self.measure(
+                field_ast.selection_set,
+                named_type,
+                self.get_page_size(field_ast) if self.is_connection(named_type) else None
+            )
+            cost += count * (own_cost + field_cost)
+            depth = max(depth, field_depth + 1)
+
+        return cost, depth
+
+
+def get_query_cost(schema, document_ast, operation_name=None, variables=None):
+    """Return the cost and depth of the operation of a validated document."""
+    operation = get_operation_ast(document_ast, operation_name)
+    if operation is None:
+        return 0, 0
+
+    root_type = {
+        'query': schema.get_query_type(),
+        'mutation': schema.get_mutation_type(),
+        'subscription': schema.get_subscription_type(),
+    }[operation.operation]
+
+    variables = dict(variables or {})
+    for definition in operation.variable_definitions or []:
+        name = definition.variable.name.value
+        if name not in variables and isinstance(definition.default_value, ast.IntValue):
+            variables[name] = int(definition.default_value.value)
+
+    fragments = {
+        definition.name.value: definition for definition in document_ast.definitions
+        if isinstance(definition, ast.FragmentDefinition)
+    }
+    return CostAnalysis(schema, fragments, variables).measure(operation.selection_set, root_type)
+
+
+def get_limit(value, default):
+    return default if value is None else value
+
+
+def get_budget_cache():
+    """
+    Return the cache counting the budgets, and the number of processes sharing it.
+
+    The increments of a local-memory cache are atomic but only count the
+    operations of their own process, those of the database cache are a read
+    and a write which concurrent requests interleave.
+    """
+    cache = caches[settings.GRAPHQL_COST_CACHE]
+    if isinstance(cache, BaseDatabaseCache):
+        raise ImproperlyConfigured(
+            'GRAPHQL_COST_CACHE must not be a database cache, whose increments are not atomic.'
+        )
+    return cache, settings.GRAPHQL_COST_PROCESSES if isinstance(cache, LocMemCache) else 1
+
+
+def spend_cost_budget(api_key, cost):
+    """
+    Spend cost from the budget of api_key in the current GRAPHQL_COST_WINDOW.
+
+    Return the remaining budget, and the seconds until the next window when
+    cost does not fit in it, in which case nothing is spent. Processes
+    counting in a cache of their own spend their share of the budget, though
+    never less than the max cost of an operation.
+    """
+    cache, processes = get_budget_cache()
+    budget = get_limit(api_key.cost_budget, settings.GRAPHQL_COST_BUDGET)
+    max_cost = get_limit(api_key.max_query_cost, settings.GRAPHQL_MAX_QUERY_COST)
+    budget = min(budget, max(budget // processes, max_cost))
+    window = settings.GRAPHQL_COST_WINDOW
+    now = time.time()
+    key = BUDGET_KEY.format(api_key.pk, int(now // window))
+
+    cache.add(key, 0, window)
+    try:
+        spent = cache.incr(key, cost)
+    except ValueError:
+        # Expired in between
+        cache.add(key, cost, window)
+        spent = cost
+
+    if spent > budget:
+        try:
+            cache.decr(key, cost)
+        except ValueError:
+            pass
+        return budget - spent + cost, math.ceil(window - now % window)
+
+    return budget - spent, 0
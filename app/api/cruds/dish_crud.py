@@ -1,15 +1,20 @@
 from app.timetables.models import Dish
-from django.core.exceptions import ValidationError
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, transaction
 
 import graphene
 from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
-from .utils import get_errors, get_object, load_object
+from common.search import SearchFilter, update_indexes_on_commit
+from .inputs import DishInput
+from .utils import (INSERT_ATTEMPTS, bulk_create, get_bulk_errors, get_conflict_errors,
+                    get_errors, get_field_errors, get_object, load_object)
 
 
 class DishFilter(FilterSet):
 
+    search = SearchFilter(['name'])
     order_by = OrderingFilter(fields=[('id', 'id'),
                                       ('name', 'name'),
                                       ('date_created', 'date_created'),
@@ -54,6 +59,50 @@ class CreateDish(graphene.relay.ClientIDMutation):
             return cls(dish=None, errors=get_errors(e))
 
 
+def clean_dishes(dishes):
+    errors = [get_field_errors(dish, exclude=['slug']) for dish in dishes]
+    for dish_errors, slug_error in zip(errors, Dish.clean_slugs(dishes)):
+        if slug_error:
+            dish_errors.setdefault(NON_FIELD_ERRORS, []).extend(slug_error.messages)
+
+    return errors
+
+
+class CreateDishes(graphene.relay.ClientIDMutation):
+    """Create many dishes at once, or none of them if any is invalid."""
+
+    class Input:
+        dishes = graphene.List(DishInput, required=True)
+
+    dishes = graphene.List(DishNode)
+    errors = graphene.List(graphene.List(graphene.String))
+
+    @classmethod
+    def mutate_and_get_payload(cls, args, context, info):
+        dishes = [
+            Dish(name=item.get('name'), description=item.get('description', ''))
+            for item in args.get('dishes')
+        ]
+
+        for attempt in range(INSERT_ATTEMPTS):
+            # Slugs taken by concurrent requests are reported on retries
+            errors = clean_dishes(dishes)
+            if any(errors):
+                break
+            try:
+                with transaction.atomic():
+                    bulk_create(Dish, dishes, ['slug'])
+                    # bulk_create sends no post_save signals to index the dishes
+                    update_indexes_on_commit(Dish, dishes)
+                return cls(dishes=dishes)
+            except IntegrityError:
+                pass
+        else:
+            errors = get_conflict_errors(errors)
+
+        return cls(dishes=None, errors=get_bulk_errors(errors))
+
+
 class UpdateDish(graphene.relay.ClientIDMutation):
 
     class Input:
@@ -1,12 +1,15 @@
 import graphene
-from graphene_django import DjangoConnectionField, DjangoObjectType
+from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
+from common.search import SearchFilter
 from app.timetables.models import Event
+from .loaders import RelatedConnectionField, load_related
 from .timetable_crud import TimetableNode
 
 
 class EventFilter(FilterSet):
+    search = SearchFilter(['name'])
     order_by = OrderingFilter(fields=[('name', 'name'),
                                       ('timetable', 'timetable'),
                                       ('action', 'action'),
@@ -22,11 +25,13 @@ class EventFilter(FilterSet):
 
 class EventNode(DjangoObjectType):
     original_id = graphene.Int()
-    timetable = DjangoConnectionField(lambda: TimetableNode)
+    timetable = RelatedConnectionField(lambda: TimetableNode)
 
     class Meta:
         model = Event
         interfaces = (graphene.relay.Node, )
 
+    resolve_timetable = load_related('timetable')
+
     def resolve_original_id(self, args, context, info):
         return self.id
@@ -27,3 +27,23 @@ class UserUpdateInput(graphene.InputObjectType):
     is_staff = graphene.Boolean(required=False)
     is_active = graphene.Boolean(required=False)
     password = graphene.String(required=False)
+
+
+class DishInput(graphene.InputObjectType):
+    name = graphene.String(required=True)
+    description = graphene.String(required=False)
+
+
+class MenuItemInput(graphene.InputObjectType):
+    timetable = graphene.String(required=True)
+    cycle_day = graphene.Int(required=True)
+    meal = graphene.String(required=True)
+    course = graphene.String(required=True)
+    dish = graphene.String(required=True)
+
+
+class ReviewInput(graphene.InputObjectType):
+    serving = graphene.String(required=True)
+    value = graphene.Int(required=True)
+    comment = graphene.String(required=False)
+    anonymity_id = graphene.String(required=False)
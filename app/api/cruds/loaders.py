@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from django.db.models import F, Model
+from graphene_django import DjangoConnectionField
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+class ModelLoader(DataLoader):
+    """Load instances of a model by primary key, one query per batch."""
+
+    def __init__(self, model, *args, **kwargs):
+        self.model = model
+        super().__init__(*args, **kwargs)
+
+    def batch_load_fn(self, keys):
+        instances = self.model._default_manager.in_bulk(keys)
+        return Promise.resolve([instances.get(key) for key in keys])
+
+
+class ManyToManyLoader(DataLoader):
+    """Load the instances related through a many-to-many field, one query per batch."""
+
+    def __init__(self, field, *args, **kwargs):
+        self.field = field
+        super().__init__(*args, **kwargs)
+
+    def batch_load_fn(self, keys):
+        query_name = self.field.related_query_name()
+        related_instances = defaultdict(list)
+        queryset = self.field.related_model._default_manager.filter(**{
+            '{}__in'.format(query_name): keys
+        }).annotate(loader_key=F(query_name)).order_by('pk')
+
+        for instance in queryset:
+            related_instances[instance.loader_key].append(instance)
+
+        return Promise.resolve([related_instances[key] for key in keys])
+
+
+def get_loader(context, key, loader_class, *args):
+    # Loaders live on the request so that batches and caches are per request
+    loaders = context.__dict__.setdefault('dataloaders', {})
+    if key not in loaders:
+        loaders[key] = loader_class(*args)
+
+    return loaders[key]
+
+
+def load_related(field_name):
+    """Return a resolver of the field_name relation batched with DataLoaders."""
+
+    def resolver(root, args, context, info):
+        field = root._meta.get_field(field_name)
+
+        if field.many_to_many:
+            prefetched = getattr(root, '_prefetched_objects_cache', {})
+            if field_name in prefetched:
+                return list(prefetched[field_name])
+
+            loader = get_loader(context, (root.__class__, field_name), ManyToManyLoader, field)
+            return loader.load(root.pk)
+
+        # Already fetched, e.g with select_related
+        if hasattr(root, field.get_cache_name()):
+            return getattr(root, field_name)
+
+        related_pk = getattr(root, field.attname)
+        if related_pk is None:
+            return None
+
+        loader = get_loader(context, field.related_model, ModelLoader, field.related_model)
+        return loader.load(related_pk)
+
+    return resolver
+
+
+class RelatedConnectionField(DjangoConnectionField):
+    """Connection of related instances resolved by a resolver returning a Promise."""
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, max_limit,
+                            enforce_first_or_last, root, args, context, info):
+        def resolve_connection(related):
+            if related is None:
+                related = []
+            elif isinstance(related, Model):
+                related = [related]
+
+            return super(RelatedConnectionField, cls).connection_resolver(
+                lambda *resolver_args: related,
+                connection,
+                default_manager,
+                max_limit,
+                enforce_first_or_last,
+                root,
+                args,
+                context,
+                info
+            )
+
+        return Promise.resolve(resolver(root, args, context, info)).then(resolve_connection)
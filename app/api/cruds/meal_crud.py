@@ -7,6 +7,7 @@ from graphene_django.types import DjangoObjectType
 from graphene_django.converter import convert_django_field
 from django_filters import OrderingFilter, FilterSet
 
+from common.search import SearchFilter
 from app.timetables.models import Meal
 from app.api.cruds.utils import get_errors, get_object, load_object
 
@@ -19,6 +20,7 @@ def convert_function(field, registry=None):
 
 class MealFilter(FilterSet):
 
+    search = SearchFilter(['name'])
     order_by = OrderingFilter(fields=[('id', 'id'),
                                       ('name', 'name'),
                                       ('start_time', 'start_time'),
@@ -0,0 +1,137 @@
+"""
+Plan select_related, prefetch_related and only() from a GraphQL selection set.
+
+The selections of a connection field are read through edges { node { ... } }
+so that nested connections and single records are planned the same way.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql.language import ast
+
+
+def get_selections(selection_set, fragments):
+    selections = []
+    for selection in selection_set.selections if selection_set else []:
+        if isinstance(selection, ast.Field):
+            selections.append(selection)
+        elif isinstance(selection, ast.FragmentSpread):
+            selections.extend(get_selections(
+                fragments[selection.name.value].selection_set, fragments
+            ))
+        elif isinstance(selection, ast.InlineFragment):
+            selections.extend(get_selections(selection.selection_set, fragments))
+
+    return selections
+
+
+def get_node_selections(field_ast, fragments):
+    """Return the selections of a record, unwrapping connection edges and nodes."""
+    selections = get_selections(field_ast.selection_set, fragments)
+
+    for edges in selections:
+        if edges.name.value == 'edges':
+            return [
+                selection
+                for node in get_selections(edges.selection_set, fragments)
+                if node.name.value == 'node'
+                for selection in get_selections(node.selection_set, fragments)
+            ]
+
+    return selections
+
+
+def plan_queryset(model, selections, fragments, prefix=''):
+    """Return the only(), select_related and Prefetch lookups of selections on model."""
+    only = {prefix + model._meta.pk.name}
+    select_related = set()
+    prefetch_related = []
+
+    for selection in selections:
+        try:
+            field = model._meta.get_field(to_snake_case(selection.name.value))
+        except FieldDoesNotExist:
+            continue
+
+        if field.many_to_many and field.concrete:
+            related_only, related_select, related_prefetch = plan_queryset(
+                field.related_model,
+                get_node_selections(selection, fragments),
+                fragments
+            )
+            queryset = field.related_model._default_manager.select_related(
+                *related_select
+            ).prefetch_related(*related_prefetch).only(*related_only)
+            prefetch_related.append(Prefetch(prefix + field.name, queryset=queryset))
+        elif (field.many_to_one or field.one_to_one) and field.concrete:
+            lookup = prefix + field.name
+            related_only, related_select, related_prefetch = plan_queryset(
+                field.related_model,
+                get_node_selections(selection, fragments),
+                fragments,
+                prefix=lookup + '__'
+            )
+            only.add(lookup)
+            only.update(related_only)
+            select_related.add(lookup)
+            select_related.update(related_select)
+            prefetch_related.extend(related_prefetch)
+        elif field.concrete:
+            only.add(prefix + field.attname)
+
+    return only, select_related, prefetch_related
+
+
+def optimize_queryset(queryset, info):
+    """Apply the lookups needed by the selection set of info to queryset."""
+    selections = [
+        selection
+        for field_ast in info.field_asts
+        for selection in get_node_selections(field_ast, info.fragments)
+    ]
+    only, select_related, prefetch_related = plan_queryset(
+        queryset.model, selections, info.fragments
+    )
+
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+
+    return queryset.only(*only)
+
+
+class OptimizedFilterConnectionField(DjangoFilterConnectionField):
+    """DjangoFilterConnectionField fetching only what the selection set asks for."""
+
+    @classmethod
+    def get_queryset(cls, default_manager, filterset_class, filtering_args, args, info):
+        filter_kwargs = {k: v for k, v in args.items() if k in filtering_args}
+        qs = filterset_class(
+            data=filter_kwargs,
+            queryset=optimize_queryset(default_manager.get_queryset(), info)
+        ).qs
+        # Covering indexes used with only() do not keep the insertion order
+        if not qs.ordered:
+            qs = qs.order_by('pk')
+
+        return qs
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, max_limit,
+                            enforce_first_or_last, filterset_class, filtering_args,
+                            root, args, context, info):
+        qs = cls.get_queryset(default_manager, filterset_class, filtering_args, args, info)
+
+        return super(DjangoFilterConnectionField, cls).connection_resolver(
+            resolver,
+            connection,
+            qs,
+            max_limit,
+            enforce_first_or_last,
+            root,
+            args,
+            context,
+            info
+        )
@@ -0,0 +1,168 @@
+"""
+Keyset pagination of connections.
+
+Pages start after, or end before, the sort key encoded in a cursor, using a
+WHERE clause on the ordering columns instead of an OFFSET, and without
+counting the rows. Deep pages cost as much as the first one, given an
+index on the ordering columns. The ordering columns must not be nullable.
+"""
+import json
+import operator
+from base64 import b64decode, b64encode
+from copy import copy
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from graphene.relay import PageInfo
+
+from .optimizer import OptimizedFilterConnectionField
+
+CURSOR_PREFIX = 'keyset:'
+
+
+def get_ordering(queryset):
+    """Return the ordering of queryset as (field, descending) pairs, ending with the pk."""
+    opts = queryset.model._meta
+    order_by = queryset.query.order_by
+    if not order_by and queryset.query.default_ordering:
+        order_by = opts.ordering
+
+    ordering = []
+    for name in order_by:
+        field_name = name.lstrip('-')
+        if field_name in queryset.query.annotations:
+            # Like search_rank, a field of the name of the annotation
+            field = copy(queryset.query.annotations[field_name].output_field)
+            field.set_attributes_from_name(field_name)
+        else:
+            field = opts.pk if field_name == 'pk' else opts.get_field(field_name)
+        ordering.append((field, name.startswith('-')))
+
+    if opts.pk not in [field for field, descending in ordering]:
+        ordering.append((opts.pk, False))
+
+    return ordering
+
+
+def encode_value(value):
+    # Dates and times keep their microseconds, unlike with DjangoJSONEncoder
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def encode_cursor(instance, ordering):
+    values = [
+        field.get_prep_value(getattr(instance, field.attname)) for field, descending in ordering
+    ]
+    cursor = CURSOR_PREFIX + json.dumps(values, default=encode_value)
+    return b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        decoded = b64decode(cursor.encode('ascii')).decode('utf-8')
+        if not decoded.startswith(CURSOR_PREFIX):
+            raise ValueError
+        values = json.loads(decoded[len(CURSOR_PREFIX):])
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [
+            field.to_python(value) for (field, descending), value in zip(ordering, values)
+        ]
+    except (ValueError, ValidationError):
+        raise ValidationError(_('Invalid cursor {}.'.format(cursor)))
+
+
+def get_keyset_filter(ordering, values, after=True):
+    """Return the Q of the rows sorted after, or before, the sort key values."""
+    clauses = []
+    equal = {}
+    for (field, descending), value in zip(ordering, values):
+        lookup = 'gt' if descending != after else 'lt'
+        clauses.append(Q(**dict(equal, **{'{}__{}'.format(field.attname, lookup): value})))
+        equal[field.attname] = value
+
+    # Also bound the leading column alone, so that its index can be range scanned
+    field, descending = ordering[0]
+    lookup = 'gte' if descending != after else 'lte'
+    bound = Q(**{'{}__{}'.format(field.attname, lookup): values[0]})
+
+    return bound & reduce(operator.or_, clauses)
+
+
+class KeysetFilterConnectionField(OptimizedFilterConnectionField):
+    """OptimizedFilterConnectionField paginated by keyset rather than offset cursors."""
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, max_limit,
+                            enforce_first_or_last, filterset_class, filtering_args,
+                            root, args, context, info):
+        first = args.get('first')
+        last = args.get('last')
+
+        if enforce_first_or_last:
+            assert first or last, (
+                'You must provide a `first` or `last` value to properly paginate the `{}` '
+                'connection.'
+            ).format(info.field_name)
+
+        for name, limit in (('first', first), ('last', last)):
+            if limit is not None and limit < 0:
+                raise ValidationError(_('Supply a `{}` value of 0 or more.'.format(name)))
+            if max_limit and limit:
+                assert limit <= max_limit, (
+                    'Requesting {} records on the `{}` connection exceeds the `{}` limit of {} '
+                    'records.'
+                ).format(limit, info.field_name, name, max_limit)
+
+        qs = cls.get_queryset(default_manager, filterset_class, filtering_args, args, info)
+        ordering = get_ordering(qs)
+
+        # The sort keys of the nodes make their cursors
+        only, defer = qs.query.deferred_loading
+        if not defer:
+            qs = qs.only(*set(only).union(
+                field.name for field, descending in ordering
+                if field.name not in qs.query.annotations
+            ))
+        qs = qs.order_by(*[
+            ('-' if descending else '') + field.attname for field, descending in ordering
+        ])
+
+        if args.get('after'):
+            qs = qs.filter(get_keyset_filter(ordering, decode_cursor(args['after'], ordering)))
+        if args.get('before'):
+            qs = qs.filter(get_keyset_filter(
+                ordering, decode_cursor(args['before'], ordering), after=False
+            ))
+
+        has_previous_page = has_next_page = False
+        if first is None and last is not None:
+            # Fetch the last rows in reverse, one more to tell if there are more
+            nodes = list(qs.reverse()[:last + 1])
+            has_previous_page = len(nodes) > last
+            nodes = nodes[:last][::-1]
+        else:
+            nodes = list(qs if first is None else qs[:first + 1])
+            if first is not None:
+                has_next_page = len(nodes) > first
+                nodes = nodes[:first]
+            if last is not None:
+                has_previous_page = len(nodes) > last
+                nodes = nodes[max(len(nodes) - last, 0):]
+
+        edges = [
+            connection.Edge(node=node, cursor=encode_cursor(node, ordering)) for node in nodes
+        ]
+        result = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page
+            )
+        )
+        result.iterable = qs
+        return result
@@ -1,16 +1,26 @@
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.translation import ugettext_lazy as _
 
 import graphene
 from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
-from app.reviews.models import Review
-from app.timetables.models import Serving
-from .utils import get_errors, get_object, load_object
+from common.search import SearchFilter, update_indexes_on_commit
+from app.reviews.models import Review, ReviewStatistic
+from app.timetables.models import Dish, Serving, Vendor
+from .dish_crud import DishNode
+from .inputs import ReviewInput
+from .loaders import load_related
+from .vendor_crud import VendorNode
+from .utils import (INSERT_ATTEMPTS, get_bulk_errors, get_conflict_errors, get_errors,
+                    get_field_errors, get_object, load_object)
 
 
 class ReviewFilter(FilterSet):
 
+    search = SearchFilter(['comment'])
     order_by = OrderingFilter(fields=[('value', 'value')])
 
     class Meta:
@@ -28,10 +38,60 @@ class ReviewNode(DjangoObjectType):
         model = Review
         interfaces = (graphene.relay.Node,)
 
+    resolve_user = load_related('user')
+    resolve_serving = load_related('serving')
+
     def resolve_original_id(self, args, context, info):
         return self.id
 
 
+class RatingCount(graphene.ObjectType):
+    value = graphene.Int()
+    count = graphene.Int()
+
+
+class RatingFields(graphene.AbstractType):
+    count = graphene.Int()
+    average = graphene.Float()
+    histogram = graphene.List(RatingCount)
+
+    @classmethod
+    def from_ratings(cls, model, ratings):
+        field_name = model._meta.model_name
+        instances = model.objects.in_bulk([rating[field_name] for rating in ratings])
+        return [
+            cls(**{
+                field_name: instances[rating[field_name]],
+                'count': rating['count'],
+                'average': rating['average'],
+                'histogram': [
+                    RatingCount(value=value, count=count) for value, count in rating['histogram']
+                ],
+            })
+            for rating in ratings
+        ]
+
+
+class DishRating(RatingFields, graphene.ObjectType):
+    """Ratings of a dish summed from the review statistics."""
+
+    dish = graphene.Field(DishNode)
+
+    @classmethod
+    def get(cls, **filters):
+        return cls.from_ratings(Dish, ReviewStatistic.get_ratings('dish', **filters))
+
+
+class VendorRating(RatingFields, graphene.ObjectType):
+    """Ratings of a vendor summed from the review statistics."""
+
+    vendor = graphene.Field(VendorNode)
+
+    @classmethod
+    def get(cls, **filters):
+        return cls.from_ratings(Vendor, ReviewStatistic.get_ratings('vendor', **filters))
+
+
 class CreateReview(graphene.relay.ClientIDMutation):
     """API functionality to create reviews."""
 
@@ -53,13 +113,135 @@ class CreateReview(graphene.relay.ClientIDMutation):
                 comment=args.get('comment', ''),
                 anonymity_id=args.get('anonymity_id', ''),
             )
-            review.full_clean()
+            # The serving was just fetched, and duplicates are rejected on save
+            review.full_clean(exclude=['serving'])
             review.save()
             return cls(review=review)
         except ValidationError as e:
             return cls(review=None, errors=get_errors(e))
 
 
+def get_servings(public_ids):
+    # Servings by the decoded public_id, with a single query
+    field = Serving._meta.get_field('public_id')
+    ids = set()
+    for public_id in public_ids:
+        try:
+            ids.add(field.to_python(public_id).id)
+        except (AttributeError, ValidationError):
+            pass
+
+    return {serving.public_id.id: serving for serving in Serving.objects.filter(public_id__in=ids)}
+
+
+def clean_reviews(rows):
+    """
+    Build a review of each of rows and validate it.
+
+    Returns the reviews, None for rows which aren't dicts, and the errors
+    of each row. Servings are resolved and duplicates found with a query
+    each, rows repeating an earlier anonymity_id for a serving included.
+    """
+    rows = [row if isinstance(row, dict) else None for row in rows]
+    public_ids = [row.get('serving') for row in rows if row and isinstance(row.get('serving'), str)]
+    servings = get_servings(public_ids)
+    field = Serving._meta.get_field('public_id')
+
+    reviews = []
+    errors = []
+    for row in rows:
+        if row is None:
+            reviews.append(None)
+            errors.append({NON_FIELD_ERRORS: ['Supply each review as a JSON object.']})
+            continue
+
+        try:
+            serving = servings.get(field.to_python(row.get('serving')).id)
+        except (AttributeError, ValidationError):
+            serving = None
+
+        review = Review(
+            serving=serving,
+            value=row.get('value'),
+            comment=row.get('comment') or '',
+            anonymity_id=row.get('anonymity_id') or ''
+        )
+        review_errors = get_field_errors(review, exclude=['serving', 'user'])
+        if serving is None:
+            review_errors['serving'] = [
+                'Serving with public_id {} does not exist.'.format(row.get('serving'))
+            ]
+        reviews.append(review)
+        errors.append(review_errors)
+
+    anonymous_reviews = [
+        (review, review_errors) for review, review_errors in zip(reviews, errors)
+        if review and review.anonymity_id and not review_errors
+    ]
+    seen = set(Review.objects.filter(
+        serving_id__in={review.serving_id for review, review_errors in anonymous_reviews},
+        anonymity_id__in={review.anonymity_id for review, review_errors in anonymous_reviews}
+    ).values_list('serving_id', 'anonymity_id')) if anonymous_reviews else set()
+    for review, review_errors in anonymous_reviews:
+        key = (review.serving_id, review.anonymity_id)
+        if key in seen:
+            review_errors[NON_FIELD_ERRORS] = ['anonymity_id and serving must be unique']
+        seen.add(key)
+
+    return reviews, errors
+
+
+def create_reviews(rows):
+    """
+    Insert the valid reviews of rows with bulk_create.
+
+    Returns the number of reviews created and the errors of each row, as
+    lists of redux errors or None for created rows.
+    """
+    if len(rows) > settings.REVIEW_UPLOAD_MAX_ROWS:
+        raise ValidationError(
+            _('Supply at most {} reviews at once.'.format(settings.REVIEW_UPLOAD_MAX_ROWS))
+        )
+
+    for attempt in range(INSERT_ATTEMPTS):
+        # anonymity_ids taken by concurrent requests are reported on retries
+        reviews, errors = clean_reviews(rows)
+        try:
+            with transaction.atomic():
+                created = insert_reviews(reviews, errors)
+            break
+        except IntegrityError:
+            pass
+    else:
+        created, errors = 0, get_conflict_errors(errors)
+
+    return created, get_bulk_errors(errors)
+
+
+def insert_reviews(reviews, errors):
+    valid_reviews = [review for review, review_errors in zip(reviews, errors) if not review_errors]
+    # bulk_create sends no signals, so the rollups and indexes are updated here
+    Review.objects.bulk_create(valid_reviews, batch_size=500)
+    ReviewStatistic.add_reviews([(review.serving_id, review.value) for review in valid_reviews])
+    update_indexes_on_commit(Review, valid_reviews)
+    return len(valid_reviews)
+
+
+class CreateReviews(graphene.relay.ClientIDMutation):
+    """Create many reviews at once, skipping the invalid ones."""
+
+    class Input:
+        reviews = graphene.List(ReviewInput, required=True)
+
+    created = graphene.Int()
+    errors = graphene.List(graphene.List(graphene.String))
+
+    @classmethod
+    def mutate_and_get_payload(cls, args, context, info):
+        created, errors = create_reviews([dict(row) for row in args.get('reviews')])
+        return cls(created=created, errors=errors)
+
+
 class UpdateReview(graphene.relay.ClientIDMutation):
     """API functionality to update reviews."""
 
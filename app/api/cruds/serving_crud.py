@@ -1,9 +1,16 @@
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, transaction
+
 import graphene
 from graphene_django import DjangoObjectType
 from graphene_django.converter import convert_django_field
 from hashid_field import HashidField
 
-from app.timetables.models import Course, MenuItem, Serving
+from app.timetables.models import Course, MenuItem, Schedule, Serving
+from .inputs import MenuItemInput
+from .loaders import load_related
+from .utils import (INSERT_ATTEMPTS, bulk_create, get_bulk_errors, get_conflict_errors,
+                    get_existing, get_field_errors, get_pk)
 
 
 @convert_django_field.register(HashidField)
@@ -18,6 +25,9 @@ class ServingNode(DjangoObjectType):
         model = Serving
         interfaces = (graphene.relay.Node, )
 
+    resolve_menu_item = load_related('menu_item')
+    resolve_vendor = load_related('vendor')
+
     def resolve_original_id(self, args, context, info):
         return self.id
 
@@ -29,10 +39,148 @@ class MenuItemNode(DjangoObjectType):
         model = MenuItem
         interfaces = (graphene.relay.Node, )
 
+    resolve_timetable = load_related('timetable')
+    resolve_meal = load_related('meal')
+    resolve_course = load_related('course')
+    resolve_dish = load_related('dish')
+
     def resolve_original_id(self, args, context, info):
         return self.id
 
 
+def clean_menu_items(items, upsert=False):
+    """
+    Validate menu items to be created together.
+
+    Related objects are loaded and uniqueness is checked with one query per
+    model. Returns the menu items, where the items that already exist are
+    replaced by the saved ones when upserting, and their errors.
+    """
+    related = {}
+    for name in ('timetable', 'meal', 'course', 'dish'):
+        model = MenuItem._meta.get_field(name).related_model
+        pks = {get_pk(item.get(name)) for item in items} - {None}
+        related[name] = model.objects.in_bulk(pks)
+
+    menu_items = []
+    errors = []
+    for item in items:
+        menu_item = MenuItem(cycle_day=item.get('cycle_day'))
+        item_errors = get_field_errors(menu_item, exclude=list(related))
+
+        for name, objects in related.items():
+            obj = objects.get(get_pk(item.get(name)))
+            if obj is None:
+                field = MenuItem._meta.get_field(name)
+                item_errors[name] = [field.error_messages['invalid'] % {
+                    'model': field.related_model._meta.verbose_name,
+                    'field': 'id',
+                    'value': item.get(name),
+                }]
+            else:
+                setattr(menu_item, name, obj)
+
+        if not item_errors:
+            try:
+                menu_item.clean()
+            except ValidationError as e:
+                item_errors[NON_FIELD_ERRORS] = e.messages
+
+        menu_items.append(menu_item)
+        errors.append(item_errors)
+
+    unique_fields = ['timetable_id', 'cycle_day', 'meal_id', 'course_id', 'dish_id']
+    unique_check = ('timetable', 'cycle_day', 'meal', 'course', 'dish')
+    valid_items = [menu_item for menu_item, item_errors in zip(menu_items, errors)
+                   if not item_errors]
+    saved = get_existing(MenuItem, valid_items, unique_fields)
+
+    for index, menu_item in enumerate(menu_items):
+        if errors[index]:
+            continue
+
+        key = tuple(getattr(menu_item, field) for field in unique_fields)
+        if key not in saved:
+            saved[key] = menu_item
+        elif upsert:
+            menu_items[index] = saved[key]
+        else:
+            errors[index][NON_FIELD_ERRORS] = menu_item.unique_error_message(
+                MenuItem, unique_check
+            ).messages
+
+    return menu_items, errors
+
+
+def save_menu_items(items, upsert=False):
+    menu_items, errors = clean_menu_items(items, upsert)
+    if any(errors):
+        return None, errors
+
+    # bulk_create sends no post_save signals to refresh the schedules, which
+    # also invalidates the cached servings. Menu items repeated in an upsert
+    # are the same instance
+    new_menu_items = list({
+        id(menu_item): menu_item for menu_item in menu_items if menu_item.pk is None
+    }.values())
+    for timetable_id in sorted({menu_item.timetable_id for menu_item in new_menu_items}):
+        transaction.on_commit(lambda timetable_id=timetable_id: Schedule.refresh(timetable_id))
+
+    bulk_create(MenuItem, new_menu_items, ['timetable_id', 'cycle_day', 'meal_id',
+                                           'course_id', 'dish_id'])
+    return menu_items, errors
+
+
+def bulk_save_menu_items(items, upsert=False):
+    for attempt in range(INSERT_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                menu_items, errors = save_menu_items(items, upsert)
+            break
+        except IntegrityError:
+            # A concurrent request created some of the menu items
+            pass
+    else:
+        menu_items, errors = None, get_conflict_errors([{}] * len(items))
+
+    return menu_items, get_bulk_errors(errors) if menu_items is None else None
+
+
+class CreateMenuItems(graphene.relay.ClientIDMutation):
+    """Create many menu items at once, or none of them if any is invalid."""
+
+    class Input:
+        menu_items = graphene.List(MenuItemInput, required=True)
+
+    menu_items = graphene.List(MenuItemNode)
+    errors = graphene.List(graphene.List(graphene.String))
+
+    @classmethod
+    def mutate_and_get_payload(cls, args, context, info):
+        menu_items, errors = bulk_save_menu_items(args.get('menu_items'))
+        return cls(menu_items=menu_items, errors=errors)
+
+
+class UpsertMenuItems(graphene.relay.ClientIDMutation):
+    """
+    Create the menu items that don't exist yet and return all of them.
+
+    Every field of a menu item is part of its unique key, so existing menu
+    items are returned unchanged rather than reported as duplicates.
+    """
+
+    class Input:
+        menu_items = graphene.List(MenuItemInput, required=True)
+
+    menu_items = graphene.List(MenuItemNode)
+    errors = graphene.List(graphene.List(graphene.String))
+
+    @classmethod
+    def mutate_and_get_payload(cls, args, context, info):
+        menu_items, errors = bulk_save_menu_items(args.get('menu_items'), upsert=True)
+        return cls(menu_items=menu_items, errors=errors)
+
+
 class CourseNode(DjangoObjectType):
     original_id = graphene.Int()
 
@@ -1,14 +1,17 @@
 import graphene
-from graphene_django import DjangoObjectType, DjangoConnectionField
+from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
+from common.search import SearchFilter
 from app.timetables.models import Timetable
+from .loaders import RelatedConnectionField, load_related
 from .vendor_crud import VendorNode
 from .user_crud import UserNode
 
 
 class TimetableFilter(FilterSet):
 
+    search = SearchFilter(['name'])
     order_by = OrderingFilter(fields=[('id', 'id'),
                                       ('name', 'name'),
                                       ('cycle_length', 'cycle_length'),
@@ -29,12 +32,32 @@ class TimetableFilter(FilterSet):
 
 class TimetableNode(DjangoObjectType):
     original_id = graphene.Int()
-    vendors = DjangoConnectionField(lambda: VendorNode)
-    admins = DjangoConnectionField(lambda: UserNode)
+    vendors = RelatedConnectionField(lambda: VendorNode)
+    admins = RelatedConnectionField(lambda: UserNode)
 
     class Meta:
         model = Timetable
         interfaces = (graphene.relay.Node, )
 
+    resolve_vendors = load_related('vendors')
+    resolve_admins = load_related('admins')
+
     def resolve_original_id(self, args, context, info):
         return self.id
+
+
+class ScheduleDay(graphene.ObjectType):
+    """Cycle day of a date of a timetable and whether meals are served."""
+
+    date = graphene.String()
+    cycle_day = graphene.Int()
+    is_inactive = graphene.Boolean()
+    is_blackout = graphene.Boolean()
+
+    @classmethod
+    def from_cycle_days(cls, cycle_days):
+        return [
+            cls(date=date.isoformat(), cycle_day=cycle_day, is_inactive=inactive,
+                is_blackout=blackout)
+            for date, cycle_day, inactive, blackout in zip(*cycle_days)
+        ]
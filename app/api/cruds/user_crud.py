@@ -5,6 +5,8 @@ import graphene
 from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
+from common.search import SearchFilter
+from .loaders import load_related
 from .utils import get_errors, get_object, load_object
 from app.accounts.models import UserProfile
 from .inputs import ProfileInput, UserCreateInput, UserUpdateInput
@@ -31,6 +33,7 @@ def process_user(instance, args):
 
 class UserFilter(FilterSet):
 
+    search = SearchFilter(['username'])
     order_by = OrderingFilter(fields=[('id', 'id'),
                                       ('username', 'username'),
                                       ('is_staff', 'is_staff'),
@@ -54,6 +57,8 @@ class ProfileNode(DjangoObjectType):
         model = UserProfile
         interfaces = (graphene.relay.Node, )
 
+    resolve_user = load_related('user')
+
     def resolve_original_id(self, args, context, info):
         return self.id
 
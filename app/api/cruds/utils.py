@@ -1,5 +1,12 @@
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import connection
+
 from graphql_relay.node.node import from_global_id
 
+# Attempts of bulk inserts conflicting with the inserts of concurrent requests
+INSERT_ATTEMPTS = 3
+CONFLICT_ERROR = 'Conflicted with a concurrent request, try again.'
+
 
 def get_errors(e):
     # transform django errors to redux errors
@@ -11,6 +18,32 @@ def get_errors(e):
     return errors
 
 
+def get_bulk_errors(error_dicts):
+    # One list of redux errors per item, None for the valid ones
+    return [get_errors(ValidationError(errors)) if errors else None for errors in error_dicts]
+
+
+def get_conflict_errors(error_dicts):
+    # Errors of the items of an insert which conflicted on every attempt
+    return [errors or {NON_FIELD_ERRORS: [CONFLICT_ERROR]} for errors in error_dicts]
+
+
+def get_field_errors(instance, exclude=None):
+    # Validate field values in memory, without the queries of full_clean
+    try:
+        instance.clean_fields(exclude=exclude)
+    except ValidationError as e:
+        return e.message_dict
+    return {}
+
+
+def get_pk(relayId):
+    try:
+        return int(from_global_id(relayId)[1])
+    except (TypeError, ValueError):
+        return None
+
+
 def get_object(object_name, relayId, otherwise=None):
     try:
         return object_name.objects.get(pk=from_global_id(relayId)[1])
@@ -18,6 +51,43 @@ def get_object(object_name, relayId, otherwise=None):
         return otherwise
 
 
+def get_existing(model, instances, fields):
+    """
+    Find the saved objects sharing the values of fields with instances.
+
+    Returns a dict mapping tuples of the values of fields to objects, built
+    with a single query.
+    """
+    if not instances:
+        return {}
+
+    filters = {
+        '{}__in'.format(field): {getattr(instance, field) for instance in instances}
+        for field in fields
+    }
+    return {
+        tuple(getattr(obj, field) for field in fields): obj
+        for obj in model.objects.filter(**filters)
+    }
+
+
+def bulk_create(model, instances, fields):
+    """
+    Insert instances with a single query and return them with their pks.
+
+    Backends that can't return the pks of inserted rows read them back with
+    one more query, matching rows on the unique fields.
+    """
+    model.objects.bulk_create(instances)
+
+    if instances and not connection.features.can_return_ids_from_bulk_insert:
+        saved = get_existing(model, instances, fields)
+        for instance in instances:
+            instance.pk = saved[tuple(getattr(instance, field) for field in fields)].pk
+
+    return instances
+
+
 def load_object(instance, args, exception=['id']):
     if instance:
         [setattr(instance, key, value) for key, value in args.items() if key not in exception]
@@ -4,12 +4,14 @@ import graphene
 from graphene_django import DjangoObjectType
 from django_filters import OrderingFilter, FilterSet
 
+from common.search import SearchFilter
 from app.timetables.models import Vendor
 from .utils import get_errors, get_object, load_object
 
 
 class VendorFilter(FilterSet):
 
+    search = SearchFilter(['name'])
     order_by = OrderingFilter(fields=[('name', 'name')])
 
     class Meta:
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 04:37
+from __future__ import unicode_literals
+
+import common.fields
+import common.utils
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apikey',
+            name='token',
+            field=common.fields.HashidBigField(alphabet='0123456789abcdef', default=common.utils.generate_id, editable=False, min_length=32, unique=True),
+        ),
+    ]
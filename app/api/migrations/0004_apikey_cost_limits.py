@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 05:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_persistedquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='cost_budget',
+            field=models.PositiveIntegerField(blank=True, help_text='Most cost of the GraphQL operations of a GRAPHQL_COST_WINDOW, GRAPHQL_COST_BUDGET when empty.', null=True),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='max_query_cost',
+            field=models.PositiveIntegerField(blank=True, help_text='Most cost of one GraphQL operation, GRAPHQL_MAX_QUERY_COST when empty.', null=True),
+        ),
+    ]
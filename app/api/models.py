@@ -5,24 +5,36 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
-from hashid_field import HashidField
-
+from common.fields import HashidBigField
 from common.mixins import TimestampMixin
-from common.utils import timestamp_seconds
+from common.utils import generate_id
 
 
 class ApiKey(TimestampMixin):
     """Model representing clients' api keys."""
 
-    token = HashidField(
+    token = HashidBigField(
         min_length=32,
         alphabet='0123456789abcdef',
-        default=timestamp_seconds,
+        default=generate_id,
         unique=True,
         editable=False
     )
     revoked = models.BooleanField(default=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    max_query_cost = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Most cost of one GraphQL operation, GRAPHQL_MAX_QUERY_COST when empty.'
+    )
+    cost_budget = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text=(
+            'Most cost of the GraphQL operations of a GRAPHQL_COST_WINDOW, '
+            'GRAPHQL_COST_BUDGET when empty.'
+        )
+    )
 
     def clean(self):
         if not self.owner.is_superuser:
@@ -36,3 +48,16 @@ class ApiKey(TimestampMixin):
 
     def __str__(self):
         return self.token.hashid
+
+
+class PersistedQuery(TimestampMixin):
+    """Model representing GraphQL queries persisted by the SHA-256 hash of their text."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    query = models.TextField()
+
+    class Meta:
+        verbose_name_plural = 'persisted queries'
+
+    def __str__(self):
+        return self.sha256
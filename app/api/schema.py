@@ -1,46 +1,63 @@
 from datetime import datetime
 
-import graphene
-from graphene_django.filter import DjangoFilterConnectionField
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
 
+import graphene
 
-from app.timetables.models import ServingAutoUpdate, Timetable, Vendor
-from .cruds.dish_crud import (DishNode, CreateDish, UpdateDish, DeleteDish,
-                              DishFilter,)
+from app.timetables import cache as servings_cache
+from app.timetables.models import Timetable
+from .cruds.dish_crud import (DishNode, CreateDish, CreateDishes, UpdateDish,
+                              DeleteDish, DishFilter,)
 from .cruds.event_crud import EventNode, EventFilter
 from .cruds.meal_crud import (MealNode, CreateMeal, UpdateMeal, DeleteMeal,
                               MealFilter,)
-from .cruds.review_crud import (ReviewNode, CreateReview, UpdateReview,
-                                DeleteReview, ReviewFilter,)
-from .cruds.serving_crud import ServingNode
-from .cruds.timetable_crud import TimetableNode, TimetableFilter
+from .cruds.optimizer import OptimizedFilterConnectionField
+from .cruds.pagination import KeysetFilterConnectionField
+from .cruds.review_crud import (ReviewNode, CreateReview, CreateReviews, UpdateReview,
+                                DeleteReview, ReviewFilter, DishRating, VendorRating,)
+from .cruds.serving_crud import ServingNode, CreateMenuItems, UpsertMenuItems
+from .cruds.timetable_crud import ScheduleDay, TimetableNode, TimetableFilter
 from .cruds.user_crud import (UserNode, CreateUser, UpdateUser, DeleteUser,
                               UserFilter,)
 from .cruds.vendor_crud import (VendorNode, CreateVendor, UpdateVendor,
                                 DeleteVendor, VendorFilter,)
 
 
+def get_rating_filters(args):
+    filters = {
+        '{}__slug'.format(name): args[name]
+        for name in ('dish', 'vendor', 'timetable') if name in args
+    }
+    if 'from' in args:
+        filters['date__gte'] = datetime.strptime(args['from'], '%Y-%m-%d').date()
+    if 'to' in args:
+        filters['date__lte'] = datetime.strptime(args['to'], '%Y-%m-%d').date()
+    return filters
+
+
 class Query(graphene.AbstractType):
     user = graphene.relay.Node.Field(UserNode)
-    users = DjangoFilterConnectionField(UserNode, filterset_class=UserFilter)
+    users = KeysetFilterConnectionField(UserNode, filterset_class=UserFilter)
 
     dish = graphene.relay.Node.Field(DishNode)
-    dishes = DjangoFilterConnectionField(DishNode, filterset_class=DishFilter)
+    dishes = OptimizedFilterConnectionField(DishNode, filterset_class=DishFilter)
 
     meal = graphene.relay.Node.Field(MealNode)
-    meals = DjangoFilterConnectionField(MealNode, filterset_class=MealFilter)
+    meals = OptimizedFilterConnectionField(MealNode, filterset_class=MealFilter)
 
     vendor = graphene.relay.Node.Field(VendorNode)
-    vendors = DjangoFilterConnectionField(VendorNode, filterset_class=VendorFilter)
+    vendors = OptimizedFilterConnectionField(VendorNode, filterset_class=VendorFilter)
 
     timetable = graphene.relay.Node.Field(TimetableNode)
-    timetables = DjangoFilterConnectionField(TimetableNode, filterset_class=TimetableFilter)
+    timetables = OptimizedFilterConnectionField(TimetableNode, filterset_class=TimetableFilter)
 
     event = graphene.relay.Node.Field(EventNode)
-    events = DjangoFilterConnectionField(EventNode, filterset_class=EventFilter)
+    events = OptimizedFilterConnectionField(EventNode, filterset_class=EventFilter)
 
     review = graphene.relay.Node.Field(ReviewNode)
-    reviews = DjangoFilterConnectionField(ReviewNode, filterset_class=ReviewFilter)
+    reviews = KeysetFilterConnectionField(ReviewNode, filterset_class=ReviewFilter)
 
     servings = graphene.List(
         ServingNode,
@@ -49,16 +66,52 @@ class Query(graphene.AbstractType):
         date=graphene.String()
     )
 
+    dish_ratings = graphene.List(
+        DishRating,
+        dish=graphene.String(),
+        vendor=graphene.String(),
+        timetable=graphene.String(),
+        start_date=graphene.String(name='from'),
+        end_date=graphene.String(name='to')
+    )
+    vendor_ratings = graphene.List(
+        VendorRating,
+        dish=graphene.String(),
+        vendor=graphene.String(),
+        timetable=graphene.String(),
+        start_date=graphene.String(name='from'),
+        end_date=graphene.String(name='to')
+    )
+
+    schedule = graphene.List(
+        ScheduleDay,
+        timetable=graphene.String(required=True),
+        start_date=graphene.String(name='from', required=True),
+        end_date=graphene.String(name='to', required=True)
+    )
+
     def resolve_servings(self, args, context, info):
-        timetable = Timetable.objects.get(slug=args['timetable'])
         date = datetime.strptime(args['date'], '%Y-%m-%d').date()
-        if 'vendor' in args:
-            vendor = Vendor.objects.get(slug=args['vendor'])
-            return ServingAutoUpdate.get_servings(
-                timetable, date, vendor=vendor
+        return servings_cache.get_servings(args['timetable'], date, args.get('vendor'))
+
+    def resolve_dish_ratings(self, args, context, info):
+        return DishRating.get(**get_rating_filters(args))
+
+    def resolve_vendor_ratings(self, args, context, info):
+        return VendorRating.get(**get_rating_filters(args))
+
+    def resolve_schedule(self, args, context, info):
+        timetable = Timetable.objects.get(slug=args['timetable'])
+        start_date = datetime.strptime(args['from'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(args['to'], '%Y-%m-%d').date()
+        if not 0 <= (end_date - start_date).days < settings.SCHEDULE_QUERY_MAX_DAYS:
+            raise ValidationError(
+                _('Supply a range of at most {} days ending on or after its start.'.format(
+                    settings.SCHEDULE_QUERY_MAX_DAYS
+                ))
             )
 
-        return ServingAutoUpdate.get_servings(timetable, date)
+        return ScheduleDay.from_cycle_days(timetable.cycle_days(start_date, end_date))
 
 
 class Mutation(graphene.ObjectType):
@@ -67,9 +120,13 @@ class Mutation(graphene.ObjectType):
     delete_user = DeleteUser.Field()
 
     create_dish = CreateDish.Field()
+    create_dishes = CreateDishes.Field()
     update_dish = UpdateDish.Field()
     delete_dish = DeleteDish.Field()
 
+    create_menu_items = CreateMenuItems.Field()
+    upsert_menu_items = UpsertMenuItems.Field()
+
     create_meal = CreateMeal.Field()
     update_meal = UpdateMeal.Field()
     delete_meal = DeleteMeal.Field()
@@ -79,5 +136,6 @@ class Mutation(graphene.ObjectType):
     delete_vendor = DeleteVendor.Field()
 
     create_review = CreateReview.Field()
+    create_reviews = CreateReviews.Field()
     update_review = UpdateReview.Field()
     delete_review = DeleteReview.Field()
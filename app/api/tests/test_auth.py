@@ -1,9 +1,12 @@
 import json
 
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest, JsonResponse
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 
-from ..auth import authorization_required
+from ..auth import api_key_cache, authorization_required, get_api_key
+from ..models import ApiKey
 from .utils import obtain_api_key, create_admin_account
 
 
@@ -13,6 +16,7 @@ class ApiAuthTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.request = HttpRequest()
+        api_key_cache.clear()
 
     @staticmethod
     @authorization_required
@@ -64,3 +68,79 @@ class ApiAuthTest(TestCase):
         response = self.make_request()
 
         self.assertEqual('Success.', response['message'])
+
+    def test_api_key_validation_is_cached(self):
+        self.request.method = 'GET'
+        create_admin_account()
+        self.request.META['HTTP_X_TAVERNATOKEN'] = obtain_api_key(self.client)
+        self.make_request()
+
+        with self.assertNumQueries(0):
+            response = self.make_request()
+
+        self.assertEqual('Success.', response['message'])
+        self.assertEqual(1, api_key_cache.stats()['hits'])
+
+    def test_invalid_api_key_is_cached(self):
+        self.request.method = 'GET'
+        self.request.META['HTTP_X_TAVERNATOKEN'] = 'a49d7536849be9da859a67bae2d7256f'
+        self.make_request()
+
+        with self.assertNumQueries(0):
+            response = self.make_request()
+
+        self.assertEqual('Invalid Token.', response['message'])
+
+    def test_revoked_api_key_is_rejected_immediately(self):
+        self.request.method = 'GET'
+        create_admin_account()
+        token = obtain_api_key(self.client)
+        self.request.META['HTTP_X_TAVERNATOKEN'] = token
+        self.make_request()
+
+        api_key = ApiKey.objects.get(token=token)
+        api_key.revoked = True
+        api_key.save()
+        response = self.make_request()
+
+        self.assertEqual('Invalid Token.', response['message'])
+
+    @override_settings(API_KEY_VERSION_CACHE='default')
+    def test_revocation_is_applied_by_other_processes(self):
+        self.request.method = 'GET'
+        create_admin_account()
+        token = obtain_api_key(self.client)
+        self.request.META['HTTP_X_TAVERNATOKEN'] = token
+        self.make_request()
+        entry = api_key_cache.get(token)
+
+        api_key = ApiKey.objects.get(token=token)
+        api_key.revoked = True
+        api_key.save()
+        # As cached by a process other than the revoking one
+        api_key_cache.set(token, entry)
+        response = self.make_request()
+
+        self.assertEqual('Invalid Token.', response['message'])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'database': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'api_key_cache',
+        },
+    }, API_KEY_VERSION_CACHE='database')
+    def test_database_version_caches_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_api_key('a49d7536849be9da859a67bae2d7256f')
+
+    def test_owner_changes_invalidate_the_api_key(self):
+        create_admin_account()
+        token = obtain_api_key(self.client)
+        self.assertTrue(get_api_key(token).owner.is_superuser)
+
+        owner = User.objects.get()
+        owner.is_superuser = False
+        owner.save()
+
+        self.assertFalse(get_api_key(token).owner.is_superuser)
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client, TestCase, override_settings
+from graphql import parse
+
+from core.schema import schema
+from ..cost import get_query_cost, spend_cost_budget
+from ..models import ApiKey
+from .utils import create_admin_account, endpoint, obtain_api_key
+
+
+class QueryCostTest(TestCase):
+    """Test the static cost analysis of GraphQL operations."""
+
+    def get_cost(self, query, variables=None, operation_name=None):
+        return get_query_cost(schema, parse(query), operation_name, variables)
+
+    def test_connections_cost_their_page_size(self):
+        self.assertEqual((11, 3), self.get_cost('{users(first: 10) {edges {node {username}}}}'))
+        self.assertEqual((6, 3), self.get_cost(
+            '{users(first: 10, last: 5) {edges {cursor node {username}}}}'
+        ))
+        self.assertEqual((12, 3), self.get_cost(
+            '{users(first: 10) {edges {node {username}} pageInfo {hasNextPage}}}'
+        ))
+
+    @override_settings(GRAPHQL_COST_LIST_SIZE=50)
+    def test_nested_connections_multiply_their_cost(self):
+        self.assertEqual((113, 6), self.get_cost('''{
+            timetables(first: 2) {edges {node {
+                vendors(first: 3) {edges {node {name}}}
+                admins {edges {node {username}}}
+            }}}
+        }'''))
+        self.assertEqual((5151, 6), self.get_cost('''{
+            timetables {edges {node {
+                vendors {edges {node {name}}}
+                admins {edges {node {username}}}
+            }}}
+        }'''))
+
+    def test_variables_and_fragments(self):
+        query = '''
+            query Users($first: Int = 5) {users(first: $first) {...Users}}
+            query Reviews {reviews(first: 2) {edges {node {serving {... on ServingNode {
+                menuItem {dish {name}}
+            }}}}}}
+            fragment Users on UserNodeConnection {edges {node {username}}}
+        '''
+
+        self.assertEqual((6, 3), self.get_cost(query, operation_name='Users'))
+        self.assertEqual((21, 3), self.get_cost(query, {'first': 20}, 'Users'))
+        self.assertEqual((9, 6), self.get_cost(query, operation_name='Reviews'))
+
+    def test_scalars_and_introspection_are_free(self):
+        self.assertEqual((0, 0), self.get_cost('{__schema {types {name}}}'))
+        self.assertEqual((2, 2), self.get_cost(
+            'mutation {createDish(input: {name: "rice", description: "rice"}) {dish {name}}}'
+        ))
+
+
+@override_settings(GRAPHQL_COST_PROCESSES=1)
+class QueryCostLimitTest(TestCase):
+    """Test the cost limits and budgets of api keys."""
+
+    query = 'query {users(first: 10) {edges {node {username}}}}'
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        caches[settings.GRAPHQL_COST_CACHE].clear()
+        self.token = obtain_api_key(self.client)
+
+    def execute(self, query):
+        return self.client.get(endpoint, {'query': query}, HTTP_X_TAVERNATOKEN=self.token)
+
+    def set_limits(self, **limits):
+        api_key = ApiKey.objects.get(token=self.token)
+        for name, value in limits.items():
+            setattr(api_key, name, value)
+        api_key.save()
+
+    def test_cost_is_reported(self):
+        response = self.execute(self.query).json()
+
+        self.assertEqual([{'username': 'admin1'}], response['users'])
+        self.assertEqual({'cost': {
+            'requestedQueryCost': 11, 'maximumQueryCost': 25000, 'remainingBudget': 249989,
+        }}, response['extensions'])
+
+    def test_operations_over_the_max_cost_are_rejected(self):
+        self.set_limits(max_query_cost=10)
+
+        response = self.execute(self.query)
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual({
+            'message': 'Query cost 11 exceeds the limit of 10.',
+            'extensions': {'code': 'QUERY_TOO_COSTLY'},
+        }, response.json()['errors'][0])
+        self.assertEqual({'cost': {'requestedQueryCost': 11, 'maximumQueryCost': 10}},
+                         response.json()['extensions'])
+
+    @override_settings(GRAPHQL_MAX_QUERY_DEPTH=2)
+    def test_operations_over_the_max_depth_are_rejected(self):
+        response = self.execute(self.query)
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('QUERY_TOO_DEEP', response.json()['errors'][0]['extensions']['code'])
+
+    def test_operations_over_the_budget_are_throttled(self):
+        self.set_limits(cost_budget=25)
+
+        for remaining in [14, 3]:
+            response = self.execute(self.query)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(remaining, response.json()['extensions']['cost']['remainingBudget'])
+
+        with self.assertNumQueries(0):
+            response = self.execute(self.query)
+
+        self.assertEqual(429, response.status_code)
+        self.assertLessEqual(int(response['Retry-After']), 60)
+        self.assertIn('Query cost budget spent', response.json()['errors'][0]['message'])
+        self.assertEqual(3, response.json()['extensions']['cost']['remainingBudget'])
+
+        # Cheaper operations still fit
+        response = self.execute('query {users(first: 1) {edges {node {username}}}}')
+        self.assertEqual(1, response.json()['extensions']['cost']['remainingBudget'])
+
+    @override_settings(GRAPHQL_COST_PROCESSES=4)
+    def test_processes_spend_their_share_of_the_budget(self):
+        self.set_limits(cost_budget=100, max_query_cost=20)
+
+        response = self.execute(self.query)
+        self.assertEqual(14, response.json()['extensions']['cost']['remainingBudget'])
+
+        # But never less than the max cost of an operation
+        self.set_limits(max_query_cost=40)
+        response = self.execute(self.query)
+        self.assertEqual(18, response.json()['extensions']['cost']['remainingBudget'])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'database': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cost_cache',
+        },
+    }, GRAPHQL_COST_CACHE='database')
+    def test_database_caches_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            spend_cost_budget(ApiKey.objects.get(token=self.token), 1)
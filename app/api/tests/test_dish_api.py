@@ -1,5 +1,11 @@
-from django.test import Client, TestCase
+from unittest import mock
 
+from django.db import IntegrityError
+from django.test import Client, TestCase, TransactionTestCase
+
+from app.api.cruds.utils import bulk_create
+from app.timetables.models import Dish
+from common.search import clear_indexes
 from .utils import create_admin_account, make_request
 
 
@@ -9,6 +15,7 @@ class DishApiTest(TestCase):
     def setUp(self):
         self.client = Client()
         create_admin_account()
+        clear_indexes()
         self.data = {
             'name': 'rice',
             'description': 'white rice'
@@ -140,6 +147,19 @@ class DishApiTest(TestCase):
 
         self.assertEqual(expected, response)
 
+    def test_search_of_dish_objects(self):
+        self.create_multiple_dishes()
+
+        for arguments, expected in [
+            ('search: "rice"', ['rice', 'Coconut rice']),
+            ('search: "RICE", orderBy: "name"', ['Coconut rice', 'rice']),
+            ('search: "plantian"', ['plantain']),
+            ('search: ""', ['rice', 'Coconut rice', 'plantain']),
+        ]:
+            query = 'query {dishes(%s) {edges{node{name}}}}' % arguments
+            response = make_request(self.client, query)
+            self.assertEqual(expected, [dish['name'] for dish in response['dishes']], arguments)
+
     def test_retrieval_of_multiple_dish_objects_ordering_by_id(self):
         self.create_multiple_dishes()
         records = [
@@ -239,3 +259,95 @@ class DishApiTest(TestCase):
             }
         ''' % ('wrong-id')
         self.assertEqual({'dish': None}, make_request(self.client, query, 'POST'))
+
+    def create_dishes(self, dishes):
+        query = '''
+            mutation{
+              createDishes(input: {dishes: [%s]}){
+                dishes{
+                  originalId,
+                  name
+                }
+                errors
+              }
+            }
+        ''' % ', '.join(
+            '{name: "%s", description: "%s"}' % dish for dish in dishes
+        )
+
+        return make_request(self.client, query, 'POST')
+
+    def test_creation_of_multiple_dish_objects(self):
+        response = self.create_dishes(self.dishes)['createDishes']
+
+        self.assertIsNone(response['errors'])
+        self.assertEqual(
+            [name for name, description in self.dishes],
+            [dish['name'] for dish in response['dishes']]
+        )
+        self.assertEqual(
+            sorted(Dish.objects.values_list('id', flat=True)),
+            sorted(dish['originalId'] for dish in response['dishes'])
+        )
+
+    def test_creation_of_multiple_dish_objects_with_errors(self):
+        self.create_dish(*self.dishes[0])
+        dishes = self.dishes + (('Plantain', 'boiled plantain'), ('', ''))
+
+        response = self.create_dishes(dishes)
+
+        self.assertEqual({
+            'dishes': None,
+            'errors': [
+                ['__all__', 'Entry with name - rice already exists.'],
+                None,
+                None,
+                ['__all__', 'Entry with name - Plantain already exists.'],
+                ['name', 'This field cannot be blank.'],
+            ]
+        }, response)
+        self.assertEqual(1, Dish.objects.count())
+
+    def test_creation_of_multiple_dish_objects_conflicting_with_concurrent_requests(self):
+        with mock.patch('app.api.cruds.dish_crud.bulk_create',
+                        side_effect=[IntegrityError, mock.DEFAULT],
+                        wraps=bulk_create) as bulk_create_mock:
+            response = self.create_dishes(self.dishes[:1])['createDishes']
+        self.assertEqual(2, bulk_create_mock.call_count)
+        self.assertIsNone(response['errors'])
+
+        with mock.patch('app.api.cruds.dish_crud.bulk_create',
+                        side_effect=IntegrityError) as bulk_create_mock:
+            response = self.create_dishes(self.dishes[1:])
+
+        self.assertEqual(3, bulk_create_mock.call_count)
+        self.assertEqual({
+            'dishes': None,
+            'errors': [['__all__', 'Conflicted with a concurrent request, try again.']] * 2,
+        }, response)
+        self.assertEqual(1, Dish.objects.count())
+
+
+class DishSearchIndexTest(TransactionTestCase):
+    """Test the search of the dishes created through the API."""
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        clear_indexes()
+
+    def test_created_dishes_are_searched(self):
+        query = 'query {dishes(search: "ried ri") {edges{node{name}}}}'
+        self.assertEqual({'dishes': {'edges': []}}, make_request(self.client, query))
+
+        make_request(self.client, '''
+            mutation{
+              createDish(input: {name: "Fried rice", description: "rice fried"}){dish{name}}
+              createDishes(input: {dishes: [{name: "Dried rice", description: "rice"}]}){errors}
+            }
+        ''', 'POST')
+
+        self.assertEqual(
+            ['Dried rice', 'Fried rice'],
+            sorted(dish['name'] for dish in make_request(self.client, query)['dishes'])
+        )
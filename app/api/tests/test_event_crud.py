@@ -21,3 +21,13 @@ class EventApiTest(TestCase):
             'name': self.event.name
         }]}
         self.assertEqual(expected, response)
+
+    def test_retrieve_events_with_timetable(self):
+        query = 'query {events{edges{node{name timetable{edges{node{name}}}}}}}'
+        response = make_request(self.client, query)
+
+        expected = {'events': [{
+            'name': self.event.name,
+            'timetable': {'edges': [{'node': {'name': self.event.timetable.name}}]}
+        }]}
+        self.assertEqual(expected, response)
@@ -0,0 +1,134 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from common.search import clear_indexes
+from core.schema import schema
+
+
+class KeysetPaginationTest(TestCase):
+    """Tests for keyset paginated connections."""
+
+    def setUp(self):
+        for username in ['ada', 'bola', 'chidi', 'dayo', 'emeka', 'funmi', 'gozie']:
+            User.objects.create(username=username, is_staff=username in ('bola', 'emeka'))
+
+    def execute(self, arguments):
+        query = '''query {
+                    users(%s) {
+                        edges {
+                            cursor
+                            node {
+                                username
+                            }
+                        }
+                        pageInfo {
+                            startCursor
+                            endCursor
+                            hasNextPage
+                            hasPreviousPage
+                        }
+                    }
+                }''' % arguments
+        result = schema.execute(query, context_value=RequestFactory().get('/api'))
+        if result.errors:
+            return {'error': str(result.errors[0])}
+
+        users = result.data['users']
+        return {
+            'usernames': [edge['node']['username'] for edge in users['edges']],
+            'cursors': [edge['cursor'] for edge in users['edges']],
+            'page_info': users['pageInfo'],
+        }
+
+    def paginate_forward(self, arguments, first):
+        usernames = []
+        after = ''
+        while True:
+            page = self.execute('{}, first: {}{}'.format(arguments, first, after))
+            usernames.extend(page['usernames'])
+            if not page['page_info']['hasNextPage']:
+                return usernames
+            after = ', after: "{}"'.format(page['page_info']['endCursor'])
+
+    def test_forward_pagination(self):
+        for arguments, expected in [
+            ('orderBy: "username"', ['ada', 'bola', 'chidi', 'dayo', 'emeka', 'funmi', 'gozie']),
+            ('orderBy: "-username"', ['gozie', 'funmi', 'emeka', 'dayo', 'chidi', 'bola', 'ada']),
+            ('orderBy: "-is_staff"', ['bola', 'emeka', 'ada', 'chidi', 'dayo', 'funmi', 'gozie']),
+            ('orderBy: "is_staff,-username"',
+             ['gozie', 'funmi', 'dayo', 'chidi', 'ada', 'emeka', 'bola']),
+            ('isStaff: false', ['ada', 'chidi', 'dayo', 'funmi', 'gozie']),
+        ]:
+            self.assertEqual(expected, self.paginate_forward(arguments, 2), arguments)
+            self.assertEqual(expected, self.paginate_forward(arguments, 3), arguments)
+
+    def test_backward_pagination(self):
+        page = self.execute('orderBy: "username", last: 2')
+        self.assertEqual(['funmi', 'gozie'], page['usernames'])
+        self.assertTrue(page['page_info']['hasPreviousPage'])
+
+        page = self.execute('orderBy: "username", last: 4, before: "{}"'.format(
+            page['page_info']['startCursor']
+        ))
+        self.assertEqual(['bola', 'chidi', 'dayo', 'emeka'], page['usernames'])
+        self.assertTrue(page['page_info']['hasPreviousPage'])
+
+        page = self.execute('orderBy: "username", last: 4, before: "{}"'.format(
+            page['page_info']['startCursor']
+        ))
+        self.assertEqual(['ada'], page['usernames'])
+        self.assertFalse(page['page_info']['hasPreviousPage'])
+
+    def test_pagination_between_cursors(self):
+        cursors = self.execute('orderBy: "username"')['cursors']
+
+        page = self.execute('orderBy: "username", after: "{}", before: "{}"'.format(
+            cursors[1], cursors[5]
+        ))
+        self.assertEqual(['chidi', 'dayo', 'emeka'], page['usernames'])
+        self.assertEqual(cursors[2:5], page['cursors'])
+
+        page = self.execute('orderBy: "username", after: "{}", first: 3, last: 2'.format(
+            cursors[1]
+        ))
+        self.assertEqual(['dayo', 'emeka'], page['usernames'])
+        self.assertTrue(page['page_info']['hasNextPage'])
+        self.assertTrue(page['page_info']['hasPreviousPage'])
+
+    def test_deep_pages_are_not_offset_nor_counted(self):
+        cursors = self.execute('orderBy: "username"')['cursors']
+
+        with CaptureQueriesContext(connection) as context:
+            page = self.execute('orderBy: "username", first: 2, after: "{}"'.format(cursors[4]))
+
+        self.assertEqual(['funmi', 'gozie'], page['usernames'])
+        self.assertEqual(1, len(context.captured_queries))
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql)
+
+    def test_pagination_of_search_results(self):
+        clear_indexes()
+        User.objects.create(username='adaobi')
+        User.objects.create(username='adamma')
+
+        # Equally similar users follow their pks
+        self.assertEqual(['ada', 'adaobi', 'adamma'], self.paginate_forward('search: "ada"', 1))
+        self.assertEqual(
+            ['adaobi', 'adamma', 'ada'],
+            self.paginate_forward('search: "ada", orderBy: "-username"', 2)
+        )
+
+    def test_invalid_cursors(self):
+        cursors = self.execute('orderBy: "username"')['cursors']
+
+        for arguments in [
+            'after: "YXJyYXljb25uZWN0aW9uOjA="',
+            'after: "not a cursor"',
+            'orderBy: "username,-is_staff", after: "{}"'.format(cursors[0]),
+        ]:
+            self.assertIn('Invalid cursor', self.execute(arguments)['error'])
+
+        self.assertIn('0 or more', self.execute('first: -1')['error'])
@@ -1,7 +1,14 @@
-from django.test import Client, TestCase
+from unittest import mock
 
-from app.timetables.factories import ServingFactory
-from .utils import create_admin_account, make_request
+from django.db import IntegrityError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from app.reviews.models import Review, ReviewStatistic
+from app.timetables.factories import DishFactory, MenuItemFactory, ServingFactory
+from common.search import clear_indexes, search as search_queryset
+from ..cruds.review_crud import create_reviews, insert_reviews
+from .utils import create_admin_account, endpoint, make_request, obtain_api_key
 
 
 class ReviewApiTest(TestCase):
@@ -10,6 +17,7 @@ class ReviewApiTest(TestCase):
     def setUp(self):
         self.client = Client()
         create_admin_account()
+        clear_indexes()
         self.serving = ServingFactory()
         self.first_review = self.create_review(
             self.serving.public_id.hashid,
@@ -144,6 +152,49 @@ class ReviewApiTest(TestCase):
 
         self.assertEqual(expected, response)
 
+    def test_search_reviews_by_comment(self):
+        self.create_multiple_reviews()
+
+        for search, expected in [
+            ('meal', [{'comment': 'Fair meal'}, {'comment': 'Good meal'},
+                      {'comment': 'Excellent meal'}]),
+            ('exelent meal', [{'comment': 'Excellent meal'}]),
+            ('poor', {'edges': []}),
+        ]:
+            query = 'query {reviews(search: "%s") {edges{node{comment}}}}' % search
+            self.assertEqual({'reviews': expected}, make_request(self.client, query))
+
+    def test_retrieve_nested_review_relations_in_constant_queries(self):
+        query = 'query {reviews{edges{node{value serving{menuItem{dish{name}}}}}}}'
+        header = {'HTTP_X_TAVERNATOKEN': obtain_api_key(self.client)}
+        self.client.get(endpoint, data={'query': query}, **header)
+
+        with CaptureQueriesContext(connection) as single_review_queries:
+            self.client.get(endpoint, data={'query': query}, **header)
+
+        for dish_name in ['Bread and Egg', 'Apples']:
+            serving = ServingFactory(
+                menu_item=MenuItemFactory(
+                    timetable=self.serving.menu_item.timetable,
+                    meal=self.serving.menu_item.meal,
+                    course=self.serving.menu_item.course,
+                    dish=DishFactory(name=dish_name)
+                ),
+                vendor=self.serving.vendor
+            )
+            self.create_review(serving.public_id.hashid, 4, 'Good meal')
+
+        with CaptureQueriesContext(connection) as multiple_reviews_queries:
+            response = self.client.get(endpoint, data={'query': query}, **header).json()
+
+        self.assertEqual(
+            ['Coconut rice', 'Bread and Egg', 'Apples'],
+            [review['serving']['menuItem']['dish']['name'] for review in response['reviews']]
+        )
+        # A single select joining the selected relations, keyset pages are not counted
+        self.assertEqual(1, len(single_review_queries))
+        self.assertEqual(1, len(multiple_reviews_queries))
+
     def test_update_review_object(self):
         # Update with valid id
         query = '''
@@ -238,3 +289,166 @@ class ReviewApiTest(TestCase):
             }
         ''' % ('jjjkhfihokjojf')
         self.assertEqual({'review': None}, make_request(self.client, query, 'POST'))
+
+    def test_retrieve_ratings(self):
+        self.create_multiple_reviews()
+        other_dish_serving = ServingFactory(
+            menu_item=MenuItemFactory(
+                timetable=self.serving.menu_item.timetable,
+                meal=self.serving.menu_item.meal,
+                course=self.serving.menu_item.course,
+                dish=DishFactory(name='Apples')
+            ),
+            vendor=self.serving.vendor
+        )
+        self.create_review(other_dish_serving.public_id.hashid, 1, 'Terrible meal')
+        query = '''query {
+                    dishRatings(timetable: "%s", from: "%s", to: "%s") {
+                        dish {
+                            name
+                        }
+                        count
+                        average
+                        histogram {
+                            value
+                            count
+                        }
+                    }
+                    vendorRatings {
+                        vendor {
+                            name
+                        }
+                        count
+                        average
+                    }
+                }''' % (
+            self.serving.menu_item.timetable.slug,
+            self.serving.date_served.isoformat(),
+            self.serving.date_served.isoformat()
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = make_request(self.client, query)
+
+        expected = {
+            'dishRatings': [
+                {
+                    'dish': {'name': 'Coconut rice'},
+                    'count': 3,
+                    'average': 4.0,
+                    'histogram': [
+                        {'value': value, 'count': count}
+                        for value, count in [(1, 0), (2, 0), (3, 1), (4, 1), (5, 1)]
+                    ],
+                },
+                {
+                    'dish': {'name': 'Apples'},
+                    'count': 1,
+                    'average': 1.0,
+                    'histogram': [
+                        {'value': value, 'count': int(value == 1)} for value in range(1, 6)
+                    ],
+                },
+            ],
+            'vendorRatings': [
+                {'vendor': {'name': self.serving.vendor.name}, 'count': 4, 'average': 3.25},
+            ],
+        }
+        self.assertEqual(expected, response)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'FROM "reviews_review"' in query['sql']
+        ])
+
+    def create_reviews(self, reviews):
+        query = '''
+                mutation{
+                    createReviews(input: {reviews: [%s]}){
+                        created
+                        errors
+                    }
+                }
+                ''' % ', '.join(
+            '{serving: "%s", value: %s, anonymityId: "%s"}' % review for review in reviews
+        )
+        return make_request(self.client, query, 'POST')
+
+    def test_creation_of_multiple_reviews_conflicting_with_concurrent_uploads(self):
+        public_id = self.serving.public_id.hashid
+        reviews = [(public_id, 5, 'kiosk-1'), (public_id, 9, 'kiosk-2')]
+
+        with mock.patch('app.api.cruds.review_crud.insert_reviews',
+                        side_effect=[IntegrityError, mock.DEFAULT],
+                        wraps=insert_reviews) as insert_mock:
+            response = self.create_reviews(reviews)['createReviews']
+        self.assertEqual(2, insert_mock.call_count)
+        self.assertEqual(1, response['created'])
+
+        with mock.patch('app.api.cruds.review_crud.insert_reviews', side_effect=IntegrityError):
+            response = self.create_reviews([(public_id, 4, 'kiosk-3')] + reviews)['createReviews']
+
+        self.assertEqual(0, response['created'])
+        self.assertEqual([
+            ['__all__', 'Conflicted with a concurrent request, try again.'],
+            ['__all__', 'anonymity_id and serving must be unique'],
+            ['value', 'Value 9 is not a valid choice.'],
+        ], response['errors'])
+
+    def test_creation_of_multiple_reviews(self):
+        Review.objects.create(serving=self.serving, value=3, anonymity_id='kiosk-1')
+        public_id = self.serving.public_id.hashid
+        reviews = [
+            (public_id, 5, 'kiosk-2'),
+            (public_id, 4, 'kiosk-1'),
+            ('unknown', 4, 'kiosk-3'),
+            (public_id, 9, 'kiosk-4'),
+            (public_id, 2, 'kiosk-2'),
+            (public_id, 1, ''),
+            (public_id, 1, ''),
+        ]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.create_reviews(reviews)['createReviews']
+
+        self.assertEqual(3, response['created'])
+        self.assertEqual([
+            None,
+            ['__all__', 'anonymity_id and serving must be unique'],
+            ['serving', 'Serving with public_id unknown does not exist.'],
+            ['value', 'Value 9 is not a valid choice.'],
+            ['__all__', 'anonymity_id and serving must be unique'],
+            None,
+            None,
+        ], response['errors'])
+        reviews = Review.objects.filter(value__in=[5, 1]).order_by('-value')
+        self.assertEqual([5, 1, 1], list(reviews.values_list('value', flat=True)))
+        self.assertEqual(1, len([
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "reviews_review"')
+        ]))
+        self.assertEqual(1, len([
+            query for query in context.captured_queries
+            if '"timetables_serving"."public_id" IN' in query['sql']
+        ]))
+        self.assertEqual(5, ReviewStatistic.objects.get(dish=self.serving.menu_item.dish).count)
+
+
+class ReviewSearchIndexTest(TransactionTestCase):
+    """Test the search of the reviews uploaded in bulk."""
+
+    def setUp(self):
+        clear_indexes()
+        self.serving = ServingFactory()
+
+    def search_comments(self, query):
+        reviews = search_queryset(Review.objects.all(), ['comment'], query)
+        return [review.comment for review in reviews]
+
+    def test_created_reviews_are_searched(self):
+        self.assertEqual([], self.search_comments('lovely'))
+
+        create_reviews([
+            {'serving': self.serving.public_id.hashid, 'value': 5, 'comment': 'Lovely meal'},
+        ])
+
+        self.assertEqual(['Lovely meal'], self.search_comments('lovely'))
@@ -1,9 +1,16 @@
-from django.test import Client, TestCase
+from unittest import mock
+
+from django.db import IntegrityError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from graphql_relay import to_global_id
 
 from app.timetables.factories import (
-    CourseFactory, DishFactory, MealFactory, MenuItemFactory,
+    CourseFactory, DishFactory, MealFactory, MenuItemFactory, TimetableFactory,
     VendorServiceFactory,
 )
+from app.timetables.models import MenuItem
 from .utils import create_admin_account, make_request
 
 
@@ -144,3 +151,173 @@ class ServingApiTest(TestCase):
 
         for x in response['servings']:
             self.assertIn(x, expected['servings'])
+
+    def test_retrieval_of_servings_batches_related_lookups(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.retrieve_servings(self.timetable.slug, self.date.isoformat())
+
+        self.assertEqual(3, len(response['servings']))
+        for table in ['vendor', 'menuitem', 'meal', 'course', 'dish', 'timetable']:
+            self.assertEqual(1, len([
+                query for query in context.captured_queries
+                if 'FROM "timetables_{0}" WHERE "timetables_{0}"."id" IN'.format(table)
+                in query['sql']
+            ]), table)
+
+
+class MenuItemMutationMixin(object):
+    """Set up and run the bulk MenuItem mutations."""
+
+    def setUp(self):
+        self.timetable = TimetableFactory()
+        self.meal = MealFactory()
+        self.course = CourseFactory()
+        self.dishes = [DishFactory(name=name) for name in ['Rice', 'Beans', 'Yam']]
+
+        self.client = Client()
+        create_admin_account()
+
+    def menu_item_input(self, cycle_day, dish, timetable=None):
+        return '{timetable: "%s", cycleDay: %d, meal: "%s", course: "%s", dish: "%s"}' % (
+            to_global_id('TimetableNode', (timetable or self.timetable).id),
+            cycle_day,
+            to_global_id('MealNode', self.meal.id),
+            to_global_id('CourseNode', self.course.id),
+            to_global_id('DishNode', dish.id),
+        )
+
+    def save_menu_items(self, mutation, menu_items):
+        query = '''
+            mutation{
+              %s(input: {menuItems: [%s]}){
+                menuItems{
+                  originalId
+                  cycleDay
+                  dish {
+                    name
+                  }
+                }
+                errors
+              }
+            }
+        ''' % (mutation, ', '.join(self.menu_item_input(*item) for item in menu_items))
+
+        return make_request(self.client, query, 'POST')
+
+
+class MenuItemApiTest(MenuItemMutationMixin, TestCase):
+    """Tests for the bulk MenuItem mutations."""
+
+    def test_creation_of_multiple_menu_items(self):
+        response = self.save_menu_items('createMenuItems', [
+            (1, self.dishes[0]), (1, self.dishes[1]), (2, self.dishes[2])
+        ])['createMenuItems']
+
+        self.assertIsNone(response['errors'])
+        self.assertEqual(
+            [(1, 'Rice'), (1, 'Beans'), (2, 'Yam')],
+            [(item['cycleDay'], item['dish']['name']) for item in response['menuItems']]
+        )
+        self.assertEqual(
+            sorted(MenuItem.objects.values_list('id', flat=True)),
+            sorted(item['originalId'] for item in response['menuItems'])
+        )
+
+    def test_creation_of_multiple_menu_items_with_errors(self):
+        MenuItemFactory(
+            timetable=self.timetable, cycle_day=1, meal=self.meal,
+            course=self.course, dish=self.dishes[0]
+        )
+        deleted_dish = DishFactory(name='Moi-moi')
+        deleted_dish.delete()
+
+        response = self.save_menu_items('createMenuItems', [
+            (1, self.dishes[0]),
+            (2, self.dishes[1]),
+            (2, self.dishes[1]),
+            (15, self.dishes[2]),
+            (3, deleted_dish),
+        ])
+
+        unique_error = (
+            'Menu Item with this Timetable, Cycle day, Meal, Course and Dish already exists.'
+        )
+        self.assertEqual({
+            'menuItems': None,
+            'errors': [
+                ['__all__', unique_error],
+                None,
+                ['__all__', unique_error],
+                ['__all__', 'Supply a cycle day in the range 1 - 14'],
+                ['dish', 'dish instance with id %r does not exist.' % to_global_id(
+                    'DishNode', deleted_dish.id
+                )],
+            ]
+        }, response)
+        self.assertEqual(1, MenuItem.objects.count())
+
+    def test_upsert_of_multiple_menu_items(self):
+        menu_item = MenuItemFactory(
+            timetable=self.timetable, cycle_day=1, meal=self.meal,
+            course=self.course, dish=self.dishes[0]
+        )
+
+        response = self.save_menu_items('upsertMenuItems', [
+            (1, self.dishes[0]), (1, self.dishes[1]), (1, self.dishes[1])
+        ])['upsertMenuItems']
+
+        self.assertIsNone(response['errors'])
+        ids = [item['originalId'] for item in response['menuItems']]
+        self.assertEqual(menu_item.id, ids[0])
+        self.assertEqual(ids[1], ids[2])
+        self.assertEqual(2, MenuItem.objects.count())
+
+    def test_creation_of_multiple_menu_items_conflicting_with_concurrent_requests(self):
+        with mock.patch('app.api.cruds.serving_crud.save_menu_items',
+                        side_effect=IntegrityError) as save_mock:
+            response = self.save_menu_items('createMenuItems', [
+                (1, self.dishes[0]), (2, self.dishes[1])
+            ])
+
+        self.assertEqual(3, save_mock.call_count)
+        self.assertEqual({
+            'menuItems': None,
+            'errors': [['__all__', 'Conflicted with a concurrent request, try again.']] * 2,
+        }, response)
+
+    def test_mutation_queries_do_not_grow_with_menu_items(self):
+        # The first request also warms up the api key authentication
+        query_counts = []
+        for cycle_day in [1, 2, 3]:
+            with CaptureQueriesContext(connection) as context:
+                self.save_menu_items('createMenuItems', [
+                    (cycle_day, dish) for dish in self.dishes[:cycle_day]
+                ])
+            query_counts.append(len(context.captured_queries))
+
+        self.assertEqual(6, MenuItem.objects.count())
+        self.assertEqual(query_counts[1], query_counts[2])
+
+
+class MenuItemServingsCacheTest(MenuItemMutationMixin, TransactionTestCase):
+    """Tests the servings cached before menu items are created in bulk."""
+
+    def test_cached_servings_are_invalidated_by_created_menu_items(self):
+        VendorServiceFactory(timetable=self.timetable, start_date=None, end_date=None)
+        MenuItemFactory(
+            timetable=self.timetable, cycle_day=2, meal=self.meal,
+            course=self.course, dish=self.dishes[0]
+        )
+        query = 'query {servings(timetable: "%s", date: "%s") {menuItem {dish {name}}}}' % (
+            self.timetable.slug, self.timetable.ref_cycle_date.isoformat()
+        )
+
+        self.assertEqual(1, len(make_request(self.client, query)['servings']))
+
+        self.save_menu_items('createMenuItems', [(2, self.dishes[1])])
+
+        self.assertEqual(
+            ['Beans', 'Rice'],
+            sorted(serving['menuItem']['dish']['name']
+                   for serving in make_request(self.client, query)['servings'])
+        )
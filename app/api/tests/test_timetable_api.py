@@ -1,7 +1,8 @@
 from django.test import Client, TestCase
 
 from .utils import create_admin_account, make_request
-from app.timetables.factories import TimetableFactory
+from app.timetables.factories import (TimetableFactory, TimetableManagementFactory,
+                                      VendorFactory, VendorServiceFactory,)
 
 
 class TimetableApiTest(TestCase):
@@ -24,3 +25,60 @@ class TimetableApiTest(TestCase):
             }]
         }
         self.assertEqual(expected, response)
+
+    def test_retrieve_timetables_with_vendors_and_admins(self):
+        another_timetable = TimetableFactory(name='Staff Timetable')
+        for timetable in [self.timetable, another_timetable]:
+            VendorServiceFactory(timetable=timetable, vendor=VendorFactory(
+                name='{} Vendor'.format(timetable.name)
+            ))
+        TimetableManagementFactory(timetable=self.timetable)
+        query = '''query {timetables{edges{node{
+                    name
+                    vendors{edges{node{name}}}
+                    admins{edges{node{username}}}
+                }}}}'''
+
+        response = make_request(self.client, query)
+
+        self.assertEqual(
+            [{
+                'name': timetable.name,
+                'vendors': {'edges': [
+                    {'node': {'name': '{} Vendor'.format(timetable.name)}}
+                ]},
+                'admins': {'edges': [
+                    {'node': {'username': 'admin'}}
+                ] if timetable == self.timetable else []},
+            } for timetable in [self.timetable, another_timetable]],
+            response['timetables']
+        )
+
+    def test_retrieve_schedule(self):
+        query = '''query {schedule(timetable: "%s", from: "2016-10-01", to: "2016-10-04") {
+                    date
+                    cycleDay
+                    isInactive
+                    isBlackout
+                }}''' % self.timetable.slug
+
+        response = make_request(self.client, query)
+
+        self.assertEqual({'schedule': [
+            {'date': '2016-10-01', 'cycleDay': 2, 'isInactive': False, 'isBlackout': False},
+            {'date': '2016-10-02', 'cycleDay': 3, 'isInactive': False, 'isBlackout': False},
+            {'date': '2016-10-03', 'cycleDay': 4, 'isInactive': True, 'isBlackout': False},
+            {'date': '2016-10-04', 'cycleDay': 5, 'isInactive': False, 'isBlackout': False},
+        ]}, response)
+
+    def test_retrieve_schedule_of_invalid_range(self):
+        query = '''query {schedule(timetable: "%s", from: "2016-10-04", to: "2016-10-01") {
+                    date
+                }}''' % self.timetable.slug
+
+        response = make_request(self.client, query)
+
+        self.assertEqual(
+            "['Supply a range of at most 3660 days ending on or after its start.']",
+            response['error']
+        )
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+
+from ..tracing import TraceSummary, Tracer, trace_summary
+from .utils import create_admin_account, endpoint, obtain_api_key
+
+
+class TracingTest(TestCase):
+    """Test the tracing of the resolvers of GraphQL operations."""
+
+    query = 'query {users(first: 10) {edges {node {username}}}}'
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        self.token = obtain_api_key(self.client)
+        trace_summary.clear()
+
+    def execute(self, **extra):
+        return self.client.get(
+            endpoint, {'query': self.query}, HTTP_X_TAVERNATOKEN=self.token, **extra
+        )
+
+    def test_trace_is_reported_with_the_header(self):
+        response = self.execute(HTTP_X_TAVERNATRACE='1')
+        trace = response.json()['extensions']['tracing']
+        resolvers = {resolver['path']: resolver for resolver in trace['resolvers']}
+
+        self.assertEqual(
+            ['users', 'users.edges', 'users.edges.node', 'users.edges.node.username'],
+            list(resolvers)
+        )
+        self.assertEqual(1, resolvers['users']['queries'])
+        self.assertEqual(1, resolvers['users']['rows'])
+        self.assertEqual(0, resolvers['users.edges.node.username']['queries'])
+        self.assertEqual(1, trace['queries'])
+        self.assertEqual(0, trace_summary.get_summary()['operations'])
+
+    def test_operations_are_not_traced_by_default(self):
+        response = self.execute()
+
+        self.assertNotIn('tracing', response.json()['extensions'])
+        self.assertEqual(0, trace_summary.get_summary()['operations'])
+
+    @override_settings(GRAPHQL_TRACING=True)
+    def test_traces_are_summarized(self):
+        self.execute()
+        self.execute()
+
+        response = self.client.get('/api/tracing', HTTP_X_TAVERNATOKEN=self.token)
+        summary = response.json()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, summary['operations'])
+        self.assertEqual(4, len(summary['resolvers']))
+        users = [resolver for resolver in summary['resolvers'] if resolver['path'] == 'users']
+        self.assertEqual([2, 2], [users[0]['count'], users[0]['queries']])
+
+
+class TraceSummaryTest(TestCase):
+    """Test TraceSummary."""
+
+    def add_trace(self, summary, path):
+        tracer = Tracer()
+        tracer.paths[path] = {'count': 1, 'duration': 0.5, 'queries': 2, 'rows': 3}
+        summary.add(tracer)
+
+    @override_settings(GRAPHQL_TRACING_WINDOW=100)
+    def test_old_traces_leave_the_window(self):
+        summary = TraceSummary()
+
+        with mock.patch('app.api.tracing.monotonic', return_value=1000):
+            self.add_trace(summary, 'dishes')
+        with mock.patch('app.api.tracing.monotonic', return_value=1050):
+            self.add_trace(summary, 'dishes')
+            self.add_trace(summary, 'users')
+
+            self.assertEqual({
+                'window': 100,
+                'operations': 3,
+                'resolvers': [
+                    {'path': 'dishes', 'count': 2, 'duration': 1000.0, 'queries': 4, 'rows': 6},
+                    {'path': 'users', 'count': 1, 'duration': 500.0, 'queries': 2, 'rows': 3},
+                ],
+            }, summary.get_summary())
+
+        with mock.patch('app.api.tracing.monotonic', return_value=1100):
+            self.assertEqual(2, summary.get_summary()['operations'])
+            self.add_trace(summary, 'users')
+
+            # The bucket of the first trace is dropped
+            self.assertEqual(2, len(summary._buckets))
+            self.assertEqual(3, summary.get_summary()['operations'])
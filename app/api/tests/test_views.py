@@ -1,10 +1,18 @@
+import hashlib
+import json
 from base64 import b64encode
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
-
-from ..models import ApiKey
-from .utils import (create_admin_account, admin_test_credentials,
+from django.test import Client, TestCase, override_settings
+from graphql import parse, validate
+
+from app.reviews.models import Review
+from app.timetables.factories import ServingFactory
+from ..models import ApiKey, PersistedQuery
+from ..views import document_cache
+from .utils import (create_admin_account, admin_test_credentials, obtain_api_key,
                     normal_user_credentials, create_normal_user_acount,)
 
 
@@ -146,3 +154,269 @@ class ApiViewTest(TestCase):
         ).json()
 
         self.assertEqual('Bad Request.', response['message'])
+
+
+class ReviewUploadViewTest(TestCase):
+    """Test for the review upload view."""
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        self.header = {'HTTP_X_TAVERNATOKEN': obtain_api_key(self.client)}
+        self.endpoint = '/api/reviews'
+        self.serving = ServingFactory()
+        self.reviews = [
+            {'serving': self.serving.public_id.hashid, 'value': 5, 'anonymity_id': 'kiosk-1'},
+            {'serving': self.serving.public_id.hashid, 'value': 4, 'anonymity_id': 'kiosk-1'},
+            {'serving': self.serving.public_id.hashid, 'value': '3', 'comment': 'Fair meal'},
+        ]
+
+    def test_upload_of_json_reviews(self):
+        response = self.client.post(
+            self.endpoint, json.dumps(self.reviews), content_type='application/json', **self.header
+        )
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual({
+            'created': 2,
+            'errors': [None, ['__all__', 'anonymity_id and serving must be unique'], None],
+        }, response.json())
+        self.assertEqual(
+            [(5, 'kiosk-1', ''), (3, '', 'Fair meal')],
+            list(Review.objects.order_by('-value').values_list('value', 'anonymity_id', 'comment'))
+        )
+
+    def test_upload_of_ndjson_reviews(self):
+        body = '\n'.join([json.dumps(self.reviews[0]), '{"serving":', '', json.dumps([])])
+        response = self.client.post(
+            self.endpoint, body, content_type='application/x-ndjson', **self.header
+        )
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual({
+            'created': 1,
+            'errors': [
+                None,
+                ['__all__', 'Supply each review as a JSON object.'],
+                ['__all__', 'Supply each review as a JSON object.'],
+            ],
+        }, response.json())
+
+    def test_upload_of_invalid_bodies(self):
+        for body in ['{"serving":', json.dumps(self.reviews[0])]:
+            response = self.client.post(
+                self.endpoint, body, content_type='application/json', **self.header
+            )
+
+            self.assertEqual(400, response.status_code)
+            self.assertEqual(
+                'Supply a JSON list of reviews, or one review per line as NDJSON.',
+                response.json()['message']
+            )
+
+    @override_settings(REVIEW_UPLOAD_MAX_ROWS=2)
+    def test_upload_of_too_many_reviews(self):
+        response = self.client.post(
+            self.endpoint, json.dumps(self.reviews), content_type='application/json', **self.header
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('Supply at most 2 reviews at once.', response.json()['message'])
+        self.assertFalse(Review.objects.exists())
+
+    def test_upload_without_api_key(self):
+        response = self.client.post(
+            self.endpoint, json.dumps(self.reviews), content_type='application/json'
+        )
+
+        self.assertEqual(401, response.status_code)
+
+
+class GraphQLDocumentCacheTest(TestCase):
+    """Test the cache of parsed and validated GraphQL documents."""
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        self.header = {'HTTP_X_TAVERNATOKEN': obtain_api_key(self.client)}
+        document_cache.clear()
+
+    def execute(self, query, method='get'):
+        return getattr(self.client, method)('/api', {'query': query}, **self.header)
+
+    def test_repeated_queries_are_parsed_and_validated_once(self):
+        query = 'query {users {edges {node {username}}}}'
+
+        with mock.patch('app.api.views.parse', wraps=parse) as parse_mock, \
+                mock.patch('app.api.views.validate', wraps=validate) as validate_mock:
+            responses = [self.execute(query).json()['users'] for _ in range(3)]
+
+        self.assertEqual(1, parse_mock.call_count)
+        self.assertEqual(1, validate_mock.call_count)
+        self.assertEqual([[{'username': 'admin1'}]] * 3, responses)
+        self.assertEqual({'hits': 2, 'misses': 1, 'hit_rate': 2 / 3, 'size': 1, 'maxsize': 256},
+                         document_cache.stats())
+
+    def test_invalid_queries_are_not_cached(self):
+        for query in ['query {users {edges {node {unknown}}}}', 'query {']:
+            for _ in range(2):
+                response = self.execute(query)
+                self.assertEqual(400, response.status_code)
+                self.assertIn('errors', response.json())
+
+        self.assertEqual(0, len(document_cache))
+
+    def test_cached_mutations_are_not_executed_from_get_requests(self):
+        query = 'mutation {createDish(input: {name: "rice", description: "rice"}) {dish {name}}}'
+
+        self.assertEqual(200, self.execute(query, 'post').status_code)
+        self.assertEqual(405, self.execute(query).status_code)
+        self.assertEqual(1, document_cache.stats()['hits'])
+
+
+class PersistedQueryTest(TestCase):
+    """Test automatic persisted queries."""
+
+    query = 'query {users {edges {node {username}}}}'
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        self.header = {'HTTP_X_TAVERNATOKEN': obtain_api_key(self.client)}
+        document_cache.clear()
+        self.sha256 = hashlib.sha256(self.query.encode('utf-8')).hexdigest()
+        self.extensions = {'persistedQuery': {'version': 1, 'sha256Hash': self.sha256}}
+
+    def get(self, extensions, **data):
+        data['extensions'] = json.dumps(extensions)
+        return self.client.get('/api', data, **self.header)
+
+    def post(self, extensions, **data):
+        data['extensions'] = extensions
+        return self.client.post(
+            '/api', json.dumps(data), content_type='application/json', **self.header
+        )
+
+    def test_unknown_persisted_query(self):
+        response = self.get(self.extensions)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{
+            'message': 'PersistedQueryNotFound',
+            'extensions': {'code': 'PERSISTED_QUERY_NOT_FOUND'},
+        }], response.json()['errors'])
+        self.assertFalse(PersistedQuery.objects.exists())
+        self.assertNotIn('Cache-Control', response)
+
+    def test_registered_persisted_query_is_cacheable_with_get(self):
+        response = self.post(self.extensions, query=self.query)
+        self.assertEqual([{'username': 'admin1'}], response.json()['users'])
+        self.assertEqual(self.query, PersistedQuery.objects.get(sha256=self.sha256).query)
+        self.assertNotIn('Cache-Control', response)
+
+        document_cache.clear()
+        for _ in range(2):
+            response = self.get(self.extensions)
+            self.assertEqual([{'username': 'admin1'}], response.json()['users'])
+            self.assertEqual('public, max-age=60', response['Cache-Control'])
+            self.assertIn('X-TavernaToken', response['Vary'])
+            self.assertIn('Accept', response['Vary'])
+            self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+            # Cached responses are served to other api keys
+            self.assertEqual(
+                {'requestedQueryCost', 'maximumQueryCost'},
+                set(response.json()['extensions']['cost'])
+            )
+
+        self.assertEqual(1, document_cache.stats()['hits'])
+
+    def test_queries_are_not_registered_without_api_key(self):
+        response = self.client.post(
+            '/gh', json.dumps({'extensions': self.extensions, 'query': self.query}),
+            content_type='application/json'
+        )
+
+        self.assertEqual([{'username': 'admin1'}], response.json()['users'])
+        self.assertFalse(PersistedQuery.objects.exists())
+
+    def test_persisted_query_requires_api_key(self):
+        self.post(self.extensions, query=self.query)
+
+        response = self.client.get('/api', {'extensions': json.dumps(self.extensions)})
+
+        self.assertEqual(401, response.status_code)
+
+    def test_persisted_query_with_errors_is_not_cacheable(self):
+        query = 'query {users(first: -1) {edges {node {username}}}}'
+        extensions = {'persistedQuery': {
+            'version': 1, 'sha256Hash': hashlib.sha256(query.encode('utf-8')).hexdigest()
+        }}
+
+        response = self.get(extensions, query=query)
+
+        self.assertIn('error', response.json())
+        self.assertNotIn('Cache-Control', response)
+
+    def test_persisted_mutation_is_not_executed_with_get(self):
+        query = 'mutation {createDish(input: {name: "rice", description: "rice"}) {dish {name}}}'
+        extensions = {'persistedQuery': {
+            'version': 1, 'sha256Hash': hashlib.sha256(query.encode('utf-8')).hexdigest()
+        }}
+        self.post(extensions, query=query)
+
+        response = self.get(extensions)
+
+        self.assertEqual(405, response.status_code)
+        self.assertNotIn('Cache-Control', response)
+
+    def test_invalid_persisted_queries(self):
+        response = self.post(
+            {'persistedQuery': {'version': 1, 'sha256Hash': '0' * 64}}, query=self.query
+        )
+        self.assertEqual(400, response.status_code)
+        self.assertEqual({
+            'message': 'provided sha does not match query',
+            'extensions': {'code': 'INVALID_PERSISTED_QUERY'},
+        }, response.json()['errors'][0])
+
+        for extensions in [
+            {'persistedQuery': {'version': 2, 'sha256Hash': self.sha256}},
+            {'persistedQuery': {'version': 1, 'sha256Hash': 'abc'}},
+            {'persistedQuery': 'abc'},
+        ]:
+            self.assertEqual(400, self.get(extensions).status_code)
+
+        response = self.client.get('/api', {'extensions': '{'}, **self.header)
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(PersistedQuery.objects.exists())
+
+
+class QueryBudgetTest(TestCase):
+    """Test the query budget of GraphQL requests."""
+
+    def setUp(self):
+        self.client = Client()
+        create_admin_account()
+        self.header = {'HTTP_X_TAVERNATOKEN': obtain_api_key(self.client)}
+
+    def execute(self):
+        return self.client.get('/api', {
+            'query': 'query Users {users {edges {node {username}}}}'
+        }, **self.header)
+
+    @override_settings(QUERY_BUDGET_LOG_QUERIES=0)
+    def test_operation_and_api_key_are_logged(self):
+        api_key = ApiKey.objects.get()
+
+        with self.assertLogs('common.middleware', 'WARNING') as logs:
+            self.assertEqual(200, self.execute().status_code)
+
+        self.assertIn('operation Users, api key {}'.format(api_key.pk), logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ENFORCED=True, QUERY_BUDGET_MAX_QUERIES=0)
+    def test_operations_over_the_budget_are_aborted(self):
+        with self.assertLogs('common.middleware', 'WARNING'):
+            response = self.execute()
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('The request exceeded its query budget.', response.json()['message'])
@@ -34,7 +34,11 @@ def make_request(client, query, method='GET'):
     }
 
     if method == 'GET':
-        return client.get(endpoint, data={'query': query}, **header).json()
+        response = client.get(endpoint, data={'query': query}, **header).json()
 
     if method == 'POST':
-        return client.post(endpoint, data={'query': query}, **header).json()
+        response = client.post(endpoint, data={'query': query}, **header).json()
+
+    # The cost of the queries is tested in test_cost
+    response.pop('extensions', None)
+    return response
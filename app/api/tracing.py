@@ -0,0 +1,149 @@
+"""
+Tracing of the resolvers of GraphQL operations.
+
+A Tracer is a graphene middleware recording, by resolved path such as
+servings.menuItem.dish, how many times the resolvers ran, their wall time
+and the SQL queries and rows they fetched. Paths follow the objects that the
+resolvers return, so connections read users.edges.node.username. Loads
+batched by DataLoaders are counted in the resolver running when they are
+dispatched.
+"""
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+
+from common.db import QueryObserver
+
+FIELDS = ('count', 'duration', 'queries', 'rows')
+
+
+def get_milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+class Tracer(QueryObserver):
+    """Trace the resolvers of an operation, while entered as a QueryObserver."""
+
+    def __init__(self):
+        super().__init__()
+        self.start = monotonic()
+        self.paths = OrderedDict()
+        # Objects returned by the resolvers, by id, with their paths
+        self.objects = {}
+        self.current = None
+
+    def resolve(self, next, root, args, context, info):
+        parent = self.objects.get(id(root))
+        if parent and parent[0] is root:
+            path = '{}.{}'.format(parent[1], info.field_name)
+        else:
+            path = info.field_name
+
+        stats = self.paths.get(path)
+        if stats is None:
+            stats = self.paths[path] = dict.fromkeys(FIELDS, 0)
+
+        previous, self.current = self.current, stats
+        start = monotonic()
+        try:
+            result = next(root, args, context, info)
+        finally:
+            stats['count'] += 1
+            stats['duration'] += monotonic() - start
+            self.current = previous
+
+        if result.is_fulfilled:
+            self.register(result.value, path)
+            return result
+        return result.then(lambda value: self.register(value, path))
+
+    def register(self, value, path):
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            if hasattr(item, '__dict__'):
+                self.objects[id(item)] = (item, path)
+        return value
+
+    def executed(self, sql, params, duration, many):
+        super().executed(sql, params, duration, many)
+        if self.current is not None:
+            self.current['queries'] += 1
+
+    def fetched(self, count):
+        super().fetched(count)
+        if self.current is not None:
+            self.current['rows'] += count
+
+    def get_trace(self):
+        return {
+            'duration': get_milliseconds(monotonic() - self.start),
+            'queries': self.queries,
+            'rows': self.rows,
+            'resolvers': [
+                dict(stats, path=path, duration=get_milliseconds(stats['duration']))
+                for path, stats in self.paths.items()
+            ],
+        }
+
+
+class TraceSummary(object):
+    """
+    Rolling summary of the traces of the last GRAPHQL_TRACING_WINDOW seconds.
+
+    Traces are added up by path in buckets of a tenth of the window, and the
+    oldest bucket is dropped as a new one starts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def add(self, tracer):
+        window = settings.GRAPHQL_TRACING_WINDOW
+        bucket_number = int(monotonic() // (window / 10))
+
+        with self._lock:
+            bucket = self._buckets.setdefault(bucket_number, {'operations': 0, 'paths': {}})
+            while next(iter(self._buckets)) <= bucket_number - 10:
+                self._buckets.popitem(last=False)
+
+            bucket['operations'] += 1
+            for path, stats in tracer.paths.items():
+                totals = bucket['paths'].setdefault(path, dict.fromkeys(FIELDS, 0))
+                for field in FIELDS:
+                    totals[field] += stats[field]
+
+    def get_summary(self):
+        """Return the totals of the paths of the window, the slowest first."""
+        oldest_bucket_number = int(
+            monotonic() // (settings.GRAPHQL_TRACING_WINDOW / 10)
+        ) - 9
+        operations = 0
+        paths = {}
+        with self._lock:
+            for bucket_number, bucket in self._buckets.items():
+                if bucket_number < oldest_bucket_number:
+                    continue
+                operations += bucket['operations']
+                for path, stats in bucket['paths'].items():
+                    totals = paths.setdefault(path, dict.fromkeys(FIELDS, 0))
+                    for field in FIELDS:
+                        totals[field] += stats[field]
+
+        resolvers = sorted(paths.items(), key=lambda item: -item[1]['duration'])
+        return {
+            'window': settings.GRAPHQL_TRACING_WINDOW,
+            'operations': operations,
+            'resolvers': [
+                dict(stats, path=path, duration=get_milliseconds(stats['duration']))
+                for path, stats in resolvers
+            ],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+trace_summary = TraceSummary()
@@ -1,9 +1,12 @@
 from django.conf.urls import url
 from django.views.decorators.csrf import csrf_exempt
 
-from .views import ApiKeyView
+from .auth import authorization_required
+from .views import ApiKeyView, ReviewUploadView, TraceSummaryView
 
 urlpatterns = [
     url(r'^api_key$', csrf_exempt(ApiKeyView.as_view())),
     url(r'^api_key/(?P<token>[0-9a-f]*)$', csrf_exempt(ApiKeyView.as_view())),
+    url(r'^reviews$', csrf_exempt(authorization_required(ReviewUploadView.as_view()))),
+    url(r'^tracing$', authorization_required(TraceSummaryView.as_view())),
 ]
@@ -1,12 +1,284 @@
+import hashlib
+import json
+import re
 from base64 import b64decode
+from contextlib import ExitStack
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
+from django.http import (HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed,
+                         JsonResponse)
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views import View
 
-from .models import ApiKey
+from graphene_django.views import GraphQLView, HttpError
+from graphql import GraphQLError, Source, parse, validate
+from graphql.execution import ExecutionResult
+from graphql.utils.get_operation_ast import get_operation_ast
+
+from common.cache import LRUCache
+from common.middleware import GraphqlResponseFlattenerMiddleware
+from .cost import get_limit, get_query_cost, spend_cost_budget
+from .cruds.review_crud import create_reviews
+from .models import ApiKey, PersistedQuery
+from .tracing import Tracer, trace_summary
+
+
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+# Parsed and validated documents by the SHA-256 of their query text. Both
+# GraphQL endpoints serve the same schema.
+document_cache = LRUCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+def get_sha256(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def get_document(schema, query=None, sha256=None):
+    """
+    Return the parsed document of query and its validation errors.
+
+    Without query, the document is that of the query persisted with the
+    sha256 hash, or None when there is none. Valid documents are cached, so
+    that repeated queries are neither parsed nor validated again.
+    """
+    sha256 = sha256 or get_sha256(query)
+    document_ast = document_cache.get(sha256)
+    if document_ast is not None:
+        return document_ast, []
+
+    if query is None:
+        query = PersistedQuery.objects.filter(sha256=sha256).values_list('query', flat=True).first()
+        if query is None:
+            return None, []
+
+    document_ast = parse(Source(query, name='GraphQL request'))
+    validation_errors = validate(schema, document_ast)
+    if not validation_errors:
+        document_cache.set(sha256, document_ast)
+
+    return document_ast, validation_errors
+
+
+class CodedGraphQLError(GraphQLError):
+    """GraphQL error with a code in its extensions, for clients to tell it apart."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class ApiGraphQLView(GraphQLView):
+    """
+    GraphQL view of the api.
+
+    It supports automatic persisted queries: clients send the SHA-256 hash
+    of their query in the persistedQuery extension, and its text only when
+    told PersistedQueryNotFound. Only requests with an api key register
+    queries. Persisted queries can be sent with GET, and their successful
+    responses are then cacheable for PERSISTED_QUERY_MAX_AGE seconds by the
+    proxies in front of the api, without the remaining cost budget of the
+    api key which sent them.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+
+        if getattr(request, 'cacheable_graphql_response', False):
+            patch_cache_control(response, public=True, max_age=settings.PERSISTED_QUERY_MAX_AGE)
+            # The flattener reshapes the response depending on Accept
+            patch_vary_headers(response, ['Accept', 'X-TavernaToken'])
+            # The api is token authenticated, and a cookie would keep it out of caches
+            response.cookies.pop(settings.CSRF_COOKIE_NAME, None)
+            request.META['CSRF_COOKIE_USED'] = False
+
+        return response
+
+    @staticmethod
+    def get_persisted_query_hash(request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if not extensions:
+            return None
+
+        try:
+            if isinstance(extensions, str):
+                extensions = json.loads(extensions)
+            persisted_query = extensions.get('persistedQuery')
+        except (ValueError, AttributeError):
+            raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+
+        if persisted_query is None:
+            return None
+
+        if (not isinstance(persisted_query, dict) or persisted_query.get('version') != 1 or
+                not SHA256.match(str(persisted_query.get('sha256Hash')))):
+            raise HttpError(HttpResponseBadRequest(
+                'Supply the version 1 and the sha256Hash of the persisted query.'
+            ))
+
+        return persisted_query['sha256Hash']
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name,
+                                show_graphiql=False):
+        # GraphQLView.execute_graphql_request, with the documents of get_document
+        sha256 = self.get_persisted_query_hash(request, data)
+        if sha256 and query and get_sha256(query) != sha256:
+            return ExecutionResult(errors=[CodedGraphQLError(
+                'provided sha does not match query', 'INVALID_PERSISTED_QUERY'
+            )], invalid=True)
+
+        if not query and not sha256:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        try:
+            document_ast, validation_errors = get_document(self.schema, query, sha256)
+            if document_ast is None:
+                return ExecutionResult(errors=[CodedGraphQLError(
+                    'PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND'
+                )])
+            if validation_errors:
+                return ExecutionResult(errors=validation_errors, invalid=True)
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+        # Only clients with an api key register queries, which are stored for good
+        if sha256 and query and getattr(request, 'api_key', None):
+            PersistedQuery.objects.get_or_create(sha256=sha256, defaults={'query': query})
+
+        operation_ast = get_operation_ast(document_ast, operation_name)
+        request.graphql_operation_name = (
+            operation_ast.name.value if operation_ast and operation_ast.name else operation_name
+        )
+
+        if request.method.lower() == 'get':
+            if operation_ast and operation_ast.operation != 'query':
+                if show_graphiql:
+                    return None
+
+                raise HttpError(HttpResponseNotAllowed(
+                    ['POST'],
+                    'Can only perform a {} operation from a POST request.'.format(
+                        operation_ast.operation
+                    )
+                ))
+
+        cost_error = self.check_cost(request, document_ast, operation_name, variables)
+        if cost_error:
+            return ExecutionResult(errors=[cost_error], invalid=True)
+
+        tracer = self.get_tracer(request)
+        request.graphql_tracer = tracer
+        try:
+            with ExitStack() as stack:
+                if tracer:
+                    stack.enter_context(tracer)
+                result = self.execute(
+                    document_ast,
+                    root_value=self.get_root_value(request),
+                    variable_values=variables,
+                    operation_name=operation_name,
+                    context_value=self.get_context(request),
+                    middleware=self.get_middleware(request),
+                    executor=self.executor,
+                )
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+        if tracer and request.graphql_trace_reported:
+            request.graphql_trace = tracer.get_trace()
+        elif tracer:
+            trace_summary.add(tracer)
+
+        request.cacheable_graphql_response = bool(
+            sha256 and request.method.lower() == 'get' and not result.errors and
+            settings.PERSISTED_QUERY_MAX_AGE and not request.graphql_trace_reported
+        )
+        return result
+
+    def get_middleware(self, request):
+        middleware = list(super().get_middleware(request) or [])
+        if getattr(request, 'graphql_tracer', None):
+            middleware.append(request.graphql_tracer)
+
+        return middleware
+
+    @staticmethod
+    def get_tracer(request):
+        """
+        Return a Tracer of the operation when it is to be traced.
+
+        Traces are reported in the response to superusers sending the
+        X-TavernaTrace header, and else added to the trace summary when
+        GRAPHQL_TRACING is on.
+        """
+        api_key = getattr(request, 'api_key', None)
+        request.graphql_trace_reported = bool(
+            request.META.get('HTTP_X_TAVERNATRACE') and api_key and api_key.owner.is_superuser
+        )
+        if request.graphql_trace_reported or settings.GRAPHQL_TRACING:
+            return Tracer()
+
+    def check_cost(self, request, document_ast, operation_name, variables):
+        """
+        Return the error of an operation over the limits of the api key.
+
+        Operations within them are charged to the budget of the api key, and
+        are throttled once it is spent. The cost is reported in the
+        extensions of the response.
+        """
+        cost, depth = get_query_cost(self.schema, document_ast, operation_name, variables)
+        api_key = getattr(request, 'api_key', None)
+        max_cost = get_limit(api_key and api_key.max_query_cost, settings.GRAPHQL_MAX_QUERY_COST)
+        request.graphql_cost = {'requestedQueryCost': cost, 'maximumQueryCost': max_cost}
+
+        if depth > settings.GRAPHQL_MAX_QUERY_DEPTH:
+            return CodedGraphQLError('Query depth {} exceeds the limit of {}.'.format(
+                depth, settings.GRAPHQL_MAX_QUERY_DEPTH
+            ), 'QUERY_TOO_DEEP')
+        if cost > max_cost:
+            return CodedGraphQLError('Query cost {} exceeds the limit of {}.'.format(
+                cost, max_cost
+            ), 'QUERY_TOO_COSTLY')
+
+        if api_key:
+            remaining, retry_after = spend_cost_budget(api_key, cost)
+            request.graphql_cost['remainingBudget'] = remaining
+            if retry_after:
+                response = HttpResponse(status=429)
+                response['Retry-After'] = retry_after
+                raise HttpError(response, 'Query cost budget spent, retry in {} seconds.'.format(
+                    retry_after
+                ))
+
+    @staticmethod
+    def format_error(error):
+        formatted_error = GraphQLView.format_error(error)
+        if isinstance(error, CodedGraphQLError):
+            formatted_error['extensions'] = {'code': error.code}
+
+        return formatted_error
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = {}
+        if getattr(request, 'graphql_cost', None) is not None:
+            extensions['cost'] = dict(request.graphql_cost)
+            if getattr(request, 'cacheable_graphql_response', False):
+                # Cached responses are served to other api keys
+                extensions['cost'].pop('remainingBudget', None)
+        if getattr(request, 'graphql_trace', None) is not None:
+            extensions['tracing'] = request.graphql_trace
+        if extensions:
+            d = dict(d, extensions=extensions)
+
+        if getattr(request, 'flatten_graphql_response', False):
+            d = GraphqlResponseFlattenerMiddleware.flatten(d)
+
+        return super().json_encode(request, d, pretty=pretty)
 
 
 class ApiKeyView(View):
@@ -72,3 +344,58 @@ class ApiKeyView(View):
 
         data = {'message': kwargs['token'] + ' was revoked.'}
         return JsonResponse(data, status=200)
+
+
+class ReviewUploadView(View):
+    """
+    View for uploading reviews in bulk, e.g buffered by offline devices.
+
+    The body is a JSON list of reviews, or one review per line with the
+    application/x-ndjson content type. Valid reviews are created and the
+    errors of the others are reported by their position.
+    """
+
+    @classmethod
+    def parse_rows(cls, request):
+        body = request.body.decode('utf-8')
+        if request.content_type == 'application/x-ndjson':
+            rows = []
+            for line in body.splitlines():
+                if line.strip():
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        rows.append(None)
+            return rows
+
+        rows = json.loads(body)
+        if not isinstance(rows, list):
+            raise ValueError('Supply a list of reviews.')
+        return rows
+
+    def post(self, request, **kwargs):
+        try:
+            rows = self.parse_rows(request)
+        except ValueError:
+            data = {'message': 'Supply a JSON list of reviews, or one review per line as NDJSON.'}
+            return JsonResponse(data, status=400)
+
+        try:
+            created, errors = create_reviews(rows)
+        except ValidationError as e:
+            data = {'message': '; '.join(e.messages)}
+            return JsonResponse(data, status=400)
+
+        data = {'created': created, 'errors': errors}
+        return JsonResponse(data, status=201 if created else 200)
+
+
+class TraceSummaryView(View):
+    """View of the rolling trace summary of the GraphQL resolvers of this process."""
+
+    def get(self, request, **kwargs):
+        if not request.api_key.owner.is_superuser:
+            data = {'message': 'Unauthorized.'}
+            return JsonResponse(data, status=401)
+
+        return JsonResponse(trace_summary.get_summary())
@@ -1,7 +1,16 @@
 from __future__ import unicode_literals
 
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class ReviewsConfig(AppConfig):
     name = 'app.reviews'
+
+    def ready(self):
+        from .models import Review
+        from .signals import count_review, remember_counted_review, uncount_review
+
+        pre_save.connect(remember_counted_review, sender=Review)
+        post_save.connect(count_review, sender=Review)
+        post_delete.connect(uncount_review, sender=Review)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.reviews.models import ReviewStatistic
+
+
+class Command(BaseCommand):
+    help = 'Compute the review statistics rollups from the reviews.'
+
+    def handle(self, *args, **options):
+        ReviewStatistic.rebuild()
+        self.stdout.write('Rebuilt {} review statistics.'.format(ReviewStatistic.objects.count()))
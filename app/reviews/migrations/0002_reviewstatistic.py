@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 04:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0006_vendorservice_tenure_index'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStatistic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('terrible_count', models.PositiveIntegerField(default=0)),
+                ('poor_count', models.PositiveIntegerField(default=0)),
+                ('fair_count', models.PositiveIntegerField(default=0)),
+                ('good_count', models.PositiveIntegerField(default=0)),
+                ('excellent_count', models.PositiveIntegerField(default=0)),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetables.Dish')),
+                ('timetable', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetables.Timetable')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetables.Vendor')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewstatistic',
+            unique_together=set([('dish', 'vendor', 'timetable', 'date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='reviewstatistic',
+            index_together=set([('vendor', 'date'), ('timetable', 'date')]),
+        ),
+    ]
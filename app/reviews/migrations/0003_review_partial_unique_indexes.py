@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import Counter, defaultdict
+
+from django.db import migrations
+from django.db.models import F
+
+HISTOGRAM_FIELDS = {
+    1: 'terrible_count',
+    2: 'poor_count',
+    3: 'fair_count',
+    4: 'good_count',
+    5: 'excellent_count',
+}
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    """Delete the reviews duplicating earlier ones, and uncount them from their rollups."""
+    Review = apps.get_model('reviews', 'Review')
+    ReviewStatistic = apps.get_model('reviews', 'ReviewStatistic')
+    Serving = apps.get_model('timetables', 'Serving')
+
+    seen = set()
+    duplicates = []
+    for pk, user_id, anonymity_id, serving_id, value in Review.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'anonymity_id', 'serving_id', 'value'
+    ).iterator():
+        keys = set()
+        if user_id is not None:
+            keys.add(('user', user_id, serving_id))
+        if anonymity_id:
+            keys.add(('anonymity_id', anonymity_id, serving_id))
+
+        if keys & seen:
+            duplicates.append((pk, serving_id, value))
+        else:
+            seen.update(keys)
+
+    for start in range(0, len(duplicates), 500):
+        Review.objects.filter(
+            pk__in=[pk for pk, serving_id, value in duplicates[start:start + 500]]
+        ).delete()
+
+    rollup_keys = {
+        row[0]: row[1:] for row in Serving.objects.filter(
+            pk__in={serving_id for pk, serving_id, value in duplicates}
+        ).values_list(
+            'pk', 'menu_item__dish_id', 'vendor_id', 'menu_item__timetable_id', 'date_served'
+        )
+    }
+    value_counts = defaultdict(Counter)
+    for pk, serving_id, value in duplicates:
+        value_counts[rollup_keys[serving_id]][value] += 1
+
+    for (dish_id, vendor_id, timetable_id, date), counts in sorted(value_counts.items()):
+        changes = {
+            'count': F('count') - sum(counts.values()),
+            'total': F('total') - sum(value * count for value, count in counts.items()),
+        }
+        changes.update({
+            HISTOGRAM_FIELDS[value]: F(HISTOGRAM_FIELDS[value]) - count
+            for value, count in counts.items()
+        })
+        ReviewStatistic.objects.filter(
+            dish_id=dish_id, vendor_id=vendor_id, timetable_id=timetable_id, date=date
+        ).update(**changes)
+
+
+class Migration(migrations.Migration):
+    """
+    Unique reviews of a serving per user and per anonymity_id.
+
+    Reviews without either, or with an empty anonymity_id, aren't constrained.
+    Partial indexes are supported by PostgreSQL and SQLite alike. Duplicate
+    reviews are deleted first, keeping the earliest of each.
+    """
+
+    dependencies = [
+        ('reviews', '0002_reviewstatistic'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX reviews_review_user_serving_uniq '
+             'ON reviews_review (user_id, serving_id) WHERE user_id IS NOT NULL'],
+            ['DROP INDEX reviews_review_user_serving_uniq'],
+        ),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX reviews_review_anonymity_id_serving_uniq '
+             'ON reviews_review (anonymity_id, serving_id) '
+             "WHERE anonymity_id IS NOT NULL AND anonymity_id <> ''"],
+            ['DROP INDEX reviews_review_anonymity_id_serving_uniq'],
+        ),
+    ]
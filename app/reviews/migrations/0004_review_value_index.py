@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 05:01
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_review_partial_unique_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='review',
+            index_together=set([('value', 'id')]),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from common.search import trigram_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_review_value_index'),
+    ]
+
+    operations = [
+        trigram_index('reviews_review', 'comment'),
+    ]
@@ -1,12 +1,15 @@
 from __future__ import unicode_literals
 
-from django.db import models
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, IntegerField, Sum, When
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
 from common.mixins import TimestampMixin
-from app.timetables.models import Serving
+from app.timetables.models import Dish, Serving, Timetable, Vendor
 
 
 class Review(TimestampMixin):
@@ -42,21 +45,174 @@ class Review(TimestampMixin):
             self.user or self.anonymity_id, self.serving
         )
 
+    class Meta:
+        # Keyset pages of reviews ordered by value
+        index_together = ('value', 'id')
+
+    def get_uniqueness_errors(self):
+        reviews = self.__class__.objects.exclude(pk=self.pk).filter(serving_id=self.serving_id)
+        if self.user_id and reviews.filter(user_id=self.user_id).exists():
+            return ValidationError(_('user and serving must be unique'))
+        if self.anonymity_id and reviews.filter(anonymity_id=self.anonymity_id).exists():
+            return ValidationError(_('anonymity_id and serving must be unique'))
+
     def clean(self):
-        if self.user:
-            if self.__class__.objects.filter(
-                user=self.user, serving=self.serving
-            ).exists():
-                raise ValidationError(_('user and serving must be unique'))
-        if self.anonymity_id:
-            if self.__class__.objects.filter(
-                anonymity_id=self.anonymity_id, serving=self.serving
-            ).exists():
-                raise ValidationError(
-                    _('anonymity_id and serving must be unique')
-                )
+        # For model forms, like the admin's, to report duplicates. save()
+        # doesn't call it, the unique indexes are authoritative.
+        errors = self.get_uniqueness_errors()
+        if errors:
+            raise errors
         super().clean()
 
     def save(self, *args, **kwargs):
-        self.clean()
-        return super().save(*args, **kwargs)
+        # Duplicates are rejected by the partial unique indexes of migration
+        # 0003 rather than checked beforehand, so that they can't race.
+        try:
+            with transaction.atomic():
+                return super().save(*args, **kwargs)
+        except IntegrityError:
+            errors = self.get_uniqueness_errors()
+            if errors:
+                raise errors
+            raise
+
+
+class ReviewStatistic(models.Model):
+    """
+    Rollup of the reviews of a dish served by a vendor on a timetable on a date.
+
+    Rows are kept current by signals on Review, so that ratings are read
+    without aggregating reviews. Run the rebuild_review_statistics command
+    to compute them from scratch.
+    """
+
+    KEY_FIELDS = ('dish_id', 'vendor_id', 'timetable_id', 'date')
+    HISTOGRAM_FIELDS = (
+        (Review.TERRIBLE, 'terrible_count'),
+        (Review.POOR, 'poor_count'),
+        (Review.FAIR, 'fair_count'),
+        (Review.GOOD, 'good_count'),
+        (Review.EXCELLENT, 'excellent_count'),
+    )
+
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    timetable = models.ForeignKey(Timetable, on_delete=models.CASCADE)
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    terrible_count = models.PositiveIntegerField(default=0)
+    poor_count = models.PositiveIntegerField(default=0)
+    fair_count = models.PositiveIntegerField(default=0)
+    good_count = models.PositiveIntegerField(default=0)
+    excellent_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '{} reviews of {} by {} on {}'.format(self.count, self.dish, self.vendor, self.date)
+
+    class Meta:
+        unique_together = ('dish', 'vendor', 'timetable', 'date')
+        index_together = (('vendor', 'date'), ('timetable', 'date'))
+
+    @classmethod
+    def get_keys(cls, serving_ids):
+        rows = Serving.objects.filter(pk__in=serving_ids).values_list(
+            'pk', 'menu_item__dish_id', 'vendor_id', 'menu_item__timetable_id', 'date_served'
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    @classmethod
+    def add_review(cls, serving_id, value, delta=1):
+        """Count a review of value of the serving in its rollup, or uncount it with delta -1."""
+        cls.add_reviews([(serving_id, value)], delta=delta)
+
+    @classmethod
+    def add_reviews(cls, reviews, delta=1):
+        """Count many reviews given as (serving_id, value) pairs, one update per rollup."""
+        keys = cls.get_keys({serving_id for serving_id, value in reviews})
+        value_counts = defaultdict(Counter)
+        for serving_id, value in reviews:
+            if serving_id in keys:
+                value_counts[keys[serving_id]][value] += delta
+
+        # Lock the rollups in a fixed order, so concurrent uploads can't deadlock
+        for key, counts in sorted(value_counts.items()):
+            cls.update_rollup(dict(zip(cls.KEY_FIELDS, key)), counts)
+
+    @classmethod
+    def update_rollup(cls, key, counts):
+        fields = dict(cls.HISTOGRAM_FIELDS)
+        changes = {
+            'count': F('count') + sum(counts.values()),
+            'total': F('total') + sum(value * count for value, count in counts.items()),
+        }
+        changes.update({fields[value]: F(fields[value]) + count for value, count in counts.items()})
+        if cls.objects.filter(**key).update(**changes) or min(counts.values()) < 0:
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    count=sum(counts.values()),
+                    total=sum(value * count for value, count in counts.items()),
+                    **dict(key, **{fields[value]: count for value, count in counts.items()})
+                )
+        except IntegrityError:
+            # Created by a concurrent review of the same dish
+            cls.objects.filter(**key).update(**changes)
+
+    @classmethod
+    def rebuild(cls):
+        """Compute all rollups from the reviews."""
+        rows = Review.objects.values(
+            'serving__menu_item__dish_id', 'serving__vendor_id',
+            'serving__menu_item__timetable_id', 'serving__date_served'
+        ).annotate(
+            review_count=models.Count('pk'),
+            review_total=Sum('value'),
+            **{
+                field: Sum(Case(When(value=value, then=1), default=0, output_field=IntegerField()))
+                for value, field in cls.HISTOGRAM_FIELDS
+            }
+        ).order_by()
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(
+                    dish_id=row['serving__menu_item__dish_id'],
+                    vendor_id=row['serving__vendor_id'],
+                    timetable_id=row['serving__menu_item__timetable_id'],
+                    date=row['serving__date_served'],
+                    count=row['review_count'],
+                    total=row['review_total'],
+                    **{field: row[field] for value, field in cls.HISTOGRAM_FIELDS}
+                )
+                for row in rows
+            ], batch_size=500)
+
+    @classmethod
+    def get_ratings(cls, group_by, **filters):
+        """
+        Return the summed rollups matching filters, by the values of the group_by field.
+
+        Each rating is a dict of the group_by value, count, average and
+        histogram, a list of (value, count) pairs.
+        """
+        rows = cls.objects.filter(count__gt=0, **filters).values(group_by).annotate(
+            review_count=Sum('count'),
+            review_total=Sum('total'),
+            **{field + '_sum': Sum(field) for value, field in cls.HISTOGRAM_FIELDS}
+        ).order_by(group_by)
+
+        return [
+            {
+                group_by: row[group_by],
+                'count': row['review_count'],
+                'average': row['review_total'] / row['review_count'],
+                'histogram': [
+                    (value, row[field + '_sum']) for value, field in cls.HISTOGRAM_FIELDS
+                ],
+            }
+            for row in rows
+        ]
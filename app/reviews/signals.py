@@ -0,0 +1,27 @@
+from .models import Review, ReviewStatistic
+
+
+def remember_counted_review(sender, instance, raw=False, **kwargs):
+    # The review as counted in the rollups, to uncount it once saved
+    instance._counted_review = None
+    if instance.pk and not raw:
+        instance._counted_review = Review.objects.filter(pk=instance.pk).values_list(
+            'serving_id', 'value'
+        ).first()
+
+
+def count_review(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    counted_review = getattr(instance, '_counted_review', None)
+    if counted_review == (instance.serving_id, instance.value):
+        return
+
+    if counted_review:
+        ReviewStatistic.add_review(*counted_review, delta=-1)
+    ReviewStatistic.add_review(instance.serving_id, instance.value)
+
+
+def uncount_review(sender, instance, **kwargs):
+    ReviewStatistic.add_review(instance.serving_id, instance.value, delta=-1)
@@ -1,8 +1,18 @@
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.forms import modelform_factory
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from app.reviews.factories import ReviewFactory
-from app.reviews.models import Review
+from app.reviews.models import Review, ReviewStatistic
+from app.timetables.factories import ServingFactory, VendorFactory
 
 
 class ReviewTest(TestCase):
@@ -31,6 +41,77 @@ class ReviewTest(TestCase):
 
         self.assertRaises(ValidationError, review_new.save)
 
+    def test_duplicate_reviews_leave_the_transaction_usable(self):
+        with self.assertRaisesMessage(ValidationError, 'user and serving must be unique'):
+            Review.objects.create(user=self.review.user, serving=self.review.serving, value=2)
+
+        self.assertEqual(1, Review.objects.count())
+
+    def test_duplicate_reviews_are_reported_by_model_forms(self):
+        form = modelform_factory(Review, fields=('user', 'serving', 'value'))({
+            'user': self.review.user_id, 'serving': self.review.serving_id, 'value': 2,
+        })
+
+        self.assertEqual(['user and serving must be unique'], form.errors['__all__'])
+
+    def test_duplicate_reviews_are_removed_before_indexing(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX reviews_review_user_serving_uniq')
+            cursor.execute('DROP INDEX reviews_review_anonymity_id_serving_uniq')
+        Review.objects.bulk_create([
+            Review(user=self.review.user, serving=self.review.serving, value=2),
+            Review(anonymity_id='somerandomid', serving=self.review.serving, value=1),
+            Review(anonymity_id='otherid', serving=self.review.serving, value=5),
+        ])
+        ReviewStatistic.rebuild()
+
+        # The models of the migration, whose deletes send no signals
+        apps = MigrationLoader(connection).project_state(('reviews', '0002_reviewstatistic')).apps
+        migration = import_module('app.reviews.migrations.0003_review_partial_unique_indexes')
+        migration.remove_duplicate_reviews(apps, connection.schema_editor())
+
+        self.assertEqual(
+            [(self.review.user_id, 'somerandomid', 4), (None, 'otherid', 5)],
+            list(Review.objects.order_by('pk').values_list('user_id', 'anonymity_id', 'value'))
+        )
+        statistic = ReviewStatistic.objects.get()
+        self.assertEqual((2, 9), (statistic.count, statistic.total))
+        self.assertEqual((0, 0, 1, 1), (
+            statistic.terrible_count, statistic.poor_count,
+            statistic.good_count, statistic.excellent_count
+        ))
+
+    def test_multiple_reviews_with_empty_anonymity_id(self):
+        Review.objects.create(serving=self.review.serving, value=2, anonymity_id='')
+        Review.objects.create(serving=self.review.serving, value=3, anonymity_id='')
+
+        self.assertEqual(3, Review.objects.count())
+
+    def test_updated_review_is_not_its_own_duplicate(self):
+        self.review.value = 1
+        self.review.save()
+
+        self.assertEqual(1, Review.objects.get().value)
+
+    def test_saving_a_review_inserts_without_checking_duplicates(self):
+        review = Review(
+            user=self.review.user,
+            anonymity_id='otherid',
+            serving=ServingFactory(
+                menu_item=self.review.serving.menu_item, vendor=self.review.serving.vendor,
+                date_served=self.review.serving.date_served.replace(day=2)
+            ),
+            value=2
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            review.save()
+
+        self.assertEqual(['INSERT'], [
+            query['sql'].split()[0] for query in context.captured_queries
+            if '"reviews_review"' in query['sql']
+        ])
+
     def test_multiple_reviews_without_user_and_anonymity_id(self):
         review_one = Review.objects.create(
             serving=self.review.serving,
@@ -47,3 +128,111 @@ class ReviewTest(TestCase):
         reviews = Review.objects.all()
         self.assertIn(review_one, reviews)
         self.assertIn(review_two, reviews)
+
+
+class ReviewStatisticTest(TestCase):
+    """Test the ReviewStatistic rollups."""
+
+    def setUp(self):
+        self.serving = ServingFactory()
+        self.review = Review.objects.create(serving=self.serving, value=4)
+
+    def get_statistic(self):
+        return ReviewStatistic.objects.get(
+            dish=self.serving.menu_item.dish,
+            vendor=self.serving.vendor,
+            timetable=self.serving.menu_item.timetable,
+            date=self.serving.date_served
+        )
+
+    def assertStatistic(self, count, total, histogram):
+        statistic = self.get_statistic()
+        self.assertEqual((count, total), (statistic.count, statistic.total))
+        self.assertEqual(histogram, [
+            getattr(statistic, field) for value, field in ReviewStatistic.HISTOGRAM_FIELDS
+        ])
+
+    def test_reviews_are_counted(self):
+        Review.objects.create(serving=self.serving, value=2)
+        Review.objects.create(serving=self.serving, value=4)
+
+        self.assertStatistic(3, 10, [0, 1, 0, 2, 0])
+
+    def test_updated_reviews_are_recounted(self):
+        self.review.value = 1
+        self.review.save()
+        self.review.comment = 'Cold'
+        self.review.save()
+
+        self.assertStatistic(1, 1, [1, 0, 0, 0, 0])
+
+    def test_reviews_moved_to_another_serving_are_recounted(self):
+        other_serving = ServingFactory(
+            menu_item=self.serving.menu_item,
+            vendor=VendorFactory(name='Other Vendor')
+        )
+        self.review.serving = other_serving
+        self.review.save()
+
+        self.assertStatistic(0, 0, [0, 0, 0, 0, 0])
+        self.assertEqual(1, ReviewStatistic.objects.get(vendor=other_serving.vendor).count)
+
+    def test_deleted_reviews_are_uncounted(self):
+        Review.objects.create(serving=self.serving, value=5)
+        self.review.delete()
+
+        self.assertStatistic(1, 5, [0, 0, 0, 0, 1])
+
+    def test_rollups_are_updated_in_key_order(self):
+        other_serving = ServingFactory(
+            menu_item=self.serving.menu_item,
+            vendor=VendorFactory(name='Other Vendor')
+        )
+        servings = sorted([self.serving, other_serving], key=lambda serving: serving.vendor_id)
+
+        with mock.patch.object(
+            ReviewStatistic, 'update_rollup', wraps=ReviewStatistic.update_rollup
+        ) as update_mock:
+            ReviewStatistic.add_reviews([(serving.pk, 3) for serving in reversed(servings)])
+
+        self.assertEqual(
+            [serving.vendor_id for serving in servings],
+            [call[0][0]['vendor_id'] for call in update_mock.call_args_list]
+        )
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        Review.objects.create(serving=self.serving, value=5)
+        Review.objects.create(serving=self.serving, value=5)
+        expected = self.get_statistic()
+        ReviewStatistic.objects.update(count=0, total=0, excellent_count=0)
+
+        out = StringIO()
+        call_command('rebuild_review_statistics', stdout=out)
+
+        statistic = self.get_statistic()
+        self.assertIn('Rebuilt 1 review statistics.', out.getvalue())
+        self.assertEqual(
+            [getattr(expected, field.attname) for field in ReviewStatistic._meta.fields[1:]],
+            [getattr(statistic, field.attname) for field in ReviewStatistic._meta.fields[1:]]
+        )
+
+    def test_get_ratings(self):
+        Review.objects.create(serving=self.serving, value=1)
+        other_serving = ServingFactory(
+            menu_item=self.serving.menu_item,
+            vendor=VendorFactory(name='Other Vendor')
+        )
+        Review.objects.create(serving=other_serving, value=3)
+
+        self.assertEqual([{
+            'dish': self.serving.menu_item.dish_id,
+            'count': 3,
+            'average': 8 / 3,
+            'histogram': [(1, 1), (2, 0), (3, 1), (4, 1), (5, 0)],
+        }], ReviewStatistic.get_ratings('dish'))
+        self.assertEqual(
+            [(self.serving.vendor_id, 2), (other_serving.vendor_id, 1)],
+            [(rating['vendor'], rating['count']) for rating in ReviewStatistic.get_ratings(
+                'vendor', date=self.serving.date_served
+            )]
+        )
@@ -3,7 +3,7 @@ from django.conf import settings
 from django.contrib import admin
 
 from .models import (
-    Course, Dish, Event, Meal, MenuItem, Serving, ServingAutoUpdate,
+    Course, Dish, Event, Meal, MenuItem, Schedule, Serving, ServingAutoUpdate,
     Timetable, TimetableManagement, Vendor, VendorService,
 )
 
@@ -184,3 +184,4 @@ admin.site.empty_value_display = ''
 admin.site.register(TimetableManagement)
 admin.site.register(Serving)
 admin.site.register(ServingAutoUpdate)
+admin.site.register(Schedule)
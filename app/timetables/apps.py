@@ -1,7 +1,40 @@
 from __future__ import unicode_literals
 
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class TimetablesConfig(AppConfig):
     name = 'app.timetables'
+
+    def ready(self):
+        from .models import Event, MenuItem, Serving, Timetable, VendorService
+        from .signals import (create_timetable_version, invalidate_blackouts,
+                              invalidate_served_servings, invalidate_tenures,
+                              invalidate_timetable_caches, refresh_event_schedule,
+                              refresh_schedule, refresh_timetable_schedule,
+                              remember_previous_state,)
+
+        post_save.connect(create_timetable_version, sender=Timetable)
+
+        for model in (MenuItem, VendorService, Event):
+            pre_save.connect(remember_previous_state, sender=model)
+
+        # Connected first so that schedules are refreshed from fresh caches
+        post_save.connect(invalidate_tenures, sender=VendorService)
+        post_delete.connect(invalidate_tenures, sender=VendorService)
+        post_save.connect(invalidate_blackouts, sender=Event)
+        post_delete.connect(invalidate_blackouts, sender=Event)
+        post_save.connect(invalidate_timetable_caches, sender=Timetable)
+
+        # Refreshing the schedule bumps the version of the cached servings
+        post_save.connect(invalidate_served_servings, sender=Serving)
+        post_delete.connect(invalidate_served_servings, sender=Serving)
+
+        for model in (MenuItem, VendorService):
+            post_save.connect(refresh_schedule, sender=model)
+            post_delete.connect(refresh_schedule, sender=model)
+
+        post_save.connect(refresh_event_schedule, sender=Event)
+        post_delete.connect(refresh_event_schedule, sender=Event)
+        post_save.connect(refresh_timetable_schedule, sender=Timetable)
@@ -0,0 +1,63 @@
+"""
+Read-through cache of the servings of a timetable on a date.
+
+Entries are keyed by timetable, vendor slug and date, and hold the field
+values of the servings rather than pickled instances. Every key also carries
+the TimetableVersion of its timetable, which is bumped in the database once
+changes are committed and the schedule is refreshed, so that invalidating a
+timetable doesn't depend on deleting keys by pattern, works with any cache
+backend, including local-memory and file-based ones, and reaches the entries
+of every process.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Schedule, Serving, Timetable, TimetableVersion, Vendor
+
+SERVINGS_KEY = 'servings:{}:{}:{}:{}'
+
+
+def get_cache():
+    return caches[settings.SERVINGS_CACHE]
+
+
+def get_version(timetable_slug):
+    """Return the id and the version of the timetable with timetable_slug, if any."""
+    return TimetableVersion.objects.filter(
+        timetable__slug=timetable_slug
+    ).values_list('timetable_id', 'version').first()
+
+
+def serialize(servings):
+    fields = Serving._meta.concrete_fields
+    return [
+        {field.attname: field.get_prep_value(field.value_from_object(serving)) for field in fields}
+        for serving in servings
+    ]
+
+
+def deserialize(values):
+    servings = [Serving(**value) for value in values]
+    for serving in servings:
+        serving._state.adding = False
+    return servings
+
+
+def get_servings(timetable_slug, date, vendor_slug=None):
+    """Return the servings of a timetable on date, resolving them on cache misses."""
+    cache = get_cache()
+    key = None
+    version = get_version(timetable_slug)
+    if version:
+        key = SERVINGS_KEY.format(version[0], vendor_slug or '', date.isoformat(), version[1])
+
+    values = cache.get(key) if key else None
+    if values is None:
+        timetable = Timetable.objects.get(slug=timetable_slug)
+        vendor = Vendor.objects.get(slug=vendor_slug) if vendor_slug else None
+        values = serialize(Schedule.get_servings(timetable, date, vendor=vendor))
+        if key:
+            cache.set(key, values, settings.SERVINGS_CACHE_TIMEOUT)
+
+    return deserialize(values)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.timetables.models import Schedule, Timetable, VendorService
+
+
+class Command(BaseCommand):
+    help = 'Precompute the daily schedule of timetables for the coming days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SCHEDULE_HORIZON_DAYS,
+            help='Number of days to precompute, starting from the start date.'
+        )
+        parser.add_argument(
+            '--start',
+            help='First date to precompute in YYYY-MM-DD format. Defaults to today.'
+        )
+        parser.add_argument(
+            '--timetable',
+            action='append',
+            dest='timetables',
+            help='Slug of a timetable to precompute. Defaults to all active timetables.'
+        )
+
+    def handle(self, *args, **options):
+        if options['start']:
+            try:
+                start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Supply the start date in YYYY-MM-DD format.')
+        else:
+            start_date = timezone.localdate()
+
+        if options['days'] < 1:
+            raise CommandError('Supply a number of days greater than 0.')
+
+        end_date = start_date + timedelta(days=options['days'] - 1)
+
+        if options['timetables']:
+            timetables = Timetable.objects.filter(slug__in=options['timetables'])
+        else:
+            timetables = Timetable.objects.filter(is_active=True)
+
+        # Load the tenures of all the timetables with a single query
+        timetables = list(timetables)
+        tenures = VendorService.load_tenures(
+            [timetable.pk for timetable in timetables], start_date, end_date
+        )
+
+        for timetable in timetables:
+            Schedule.build(timetable, start_date, end_date, tenures[timetable.pk])
+            self.stdout.write('Scheduled {} from {} to {}.'.format(
+                timetable.name, start_date, end_date
+            ))
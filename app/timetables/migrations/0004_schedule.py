@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 04:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0003_auto_20171107_1103'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('cycle_day', models.PositiveSmallIntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('course', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='timetables.Course')),
+                ('dish', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='timetables.Dish')),
+                ('meal', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='timetables.Meal')),
+                ('menu_item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='timetables.MenuItem')),
+                ('timetable', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetables.Timetable')),
+                ('vendor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='timetables.Vendor')),
+            ],
+            options={
+                'verbose_name': 'Schedule',
+                'verbose_name_plural': 'Schedules',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='schedule',
+            index_together=set([('timetable', 'date')]),
+        ),
+    ]
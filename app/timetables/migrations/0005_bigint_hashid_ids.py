@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 04:37
+from __future__ import unicode_literals
+
+import common.fields
+import common.utils
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0004_schedule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='serving',
+            name='public_id',
+            field=common.fields.HashidBigField(alphabet='0123456789abcdefghijklmnopqrstuvwxyz', default=common.utils.generate_id, min_length=7, unique=True),
+        ),
+    ]
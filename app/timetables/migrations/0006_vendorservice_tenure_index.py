@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 04:45
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0005_bigint_hashid_ids'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='vendorservice',
+            index_together=set([('timetable', 'start_date', 'end_date')]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from common.search import trigram_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0006_vendorservice_tenure_index'),
+    ]
+
+    operations = [
+        trigram_index('timetables_dish', 'name'),
+        trigram_index('timetables_meal', 'name'),
+        trigram_index('timetables_vendor', 'name'),
+        trigram_index('timetables_timetable', 'name'),
+        trigram_index('timetables_event', 'name'),
+    ]
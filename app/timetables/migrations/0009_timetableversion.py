@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 05:53
+from __future__ import unicode_literals
+
+import app.timetables.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_versions(apps, schema_editor):
+    Timetable = apps.get_model('timetables', 'Timetable')
+    TimetableVersion = apps.get_model('timetables', 'TimetableVersion')
+    TimetableVersion.objects.bulk_create(
+        TimetableVersion(timetable_id=timetable_id)
+        for timetable_id in Timetable.objects.values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetables', '0008_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('timetable', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version', serialize=False, to='timetables.Timetable')),
+                ('version', models.BigIntegerField(default=app.timetables.models.get_initial_version)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
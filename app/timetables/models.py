@@ -1,17 +1,34 @@
 from __future__ import unicode_literals
 
+import time
+from collections import namedtuple
+from datetime import date as Date, timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import (MinValueValidator,
                                     validate_comma_separated_integer_list,)
 from django.db import models, transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from hashid_field import HashidField
-
+from common.cache import LRUCache
+from common.fields import HashidBigField
+from common.intervals import IntervalSet, IntervalTree
 from common.mixins import SlugifyMixin, TimestampMixin
-from common.utils import timestamp_seconds
+from common.utils import generate_id, id_generator
+
+# Parallel lists describing each date of a range of a timetable
+CycleDays = namedtuple('CycleDays', ['dates', 'cycle_days', 'inactive', 'blackout'])
+
+# Interval trees of vendor tenures by timetable id with their version, see
+# VendorService.get_tenures
+tenure_cache = LRUCache(settings.TENURE_CACHE_SIZE, ttl=settings.TENURE_CACHE_TIMEOUT)
+
+# Blackout dates by timetable id with their version, see Timetable.get_blackouts
+blackout_cache = LRUCache(settings.BLACKOUT_CACHE_SIZE, ttl=settings.BLACKOUT_CACHE_TIMEOUT)
 
 
 class Meal(SlugifyMixin, models.Model):
@@ -78,9 +95,7 @@ class Vendor(SlugifyMixin, models.Model):
     slugify_field = 'name'
 
     def is_vendor_serving(self, timetable, date):
-        query = (models.Q(timetable=timetable, vendor=self, end_date__gte=date)
-                 | models.Q(timetable=timetable, vendor=self, end_date=None))
-        return VendorService.objects.filter(query).exists()
+        return self.pk in VendorService.get_vendor_ids(timetable.pk, date)
 
     def __str__(self):
         return self.name
@@ -171,17 +186,132 @@ class Timetable(SlugifyMixin, TimestampMixin):
 
         return cycle_day
 
+    def cycle_days(self, start_date, end_date, blackouts=None):
+        """
+        Compute the cycle days, inactive weekdays and blackouts from start_date to end_date.
+
+        Cycle days repeat every cycle_length days and inactive weekdays every
+        week, so each sequence is one period rotated to start_date and repeated
+        over the range rather than computed date by date. Unlike
+        calculate_cycle_day, dates before ref_cycle_date are counted backwards.
+        Blackouts are those of get_blackouts unless given.
+        """
+        count = (end_date - start_date).days + 1
+        if count <= 0:
+            return CycleDays([], [], [], [])
+
+        def repeat(period, offset):
+            period = period[offset:] + period[:offset]
+            return (period * (count // len(period) + 1))[:count]
+
+        start_ordinal = start_date.toordinal()
+        dates = [Date.fromordinal(start_ordinal + day) for day in range(count)]
+
+        offset = ((start_date - self.ref_cycle_date).days + self.ref_cycle_day - 1)
+        cycle_days = repeat(list(range(1, self.cycle_length + 1)), offset % self.cycle_length)
+
+        inactive_weekdays = [str(weekday) in self.inactive_weekdays for weekday in range(7)]
+        inactive = repeat(inactive_weekdays, start_date.weekday())
+
+        blackout_dates = self.get_blackout_dates(start_date, end_date, blackouts)
+        blackout = [date in blackout_dates for date in dates]
+
+        return CycleDays(dates, cycle_days, inactive, blackout)
+
+    def load_blackouts(self):
+        """
+        Return the IntervalSet of the dates of the timetable without meals.
+
+        The no-meal events of the timetable are loaded with one query.
+        """
+        default_timezone = timezone.get_default_timezone()
+        intervals = []
+        for start_date, end_date in Event.objects.filter(
+            timetable_id=self.pk,
+            action=Event.NO_MEAL
+        ).values_list('start_date', 'end_date'):
+            # An event ending at midnight does not black out the day it ends on
+            first_date = timezone.localtime(start_date, default_timezone).date()
+            last_date = timezone.localtime(
+                end_date - timedelta(microseconds=1), default_timezone
+            ).date()
+            if first_date <= last_date:
+                intervals.append((first_date, last_date))
+
+        return IntervalSet(intervals)
+
+    def get_blackouts(self):
+        """
+        Return the blackouts of load_blackouts, cached.
+
+        They are kept in blackout_cache with the TimetableVersion they were
+        loaded at, so that changes committed by any process invalidate them.
+        """
+        version = TimetableVersion.objects.filter(
+            timetable_id=self.pk
+        ).values_list('version', flat=True).first()
+        cached = blackout_cache.get(self.pk)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        blackouts = self.load_blackouts()
+        blackout_cache.set(self.pk, (version, blackouts))
+        return blackouts
+
+    def is_blackout(self, date):
+        return date in self.get_blackouts()
+
+    def get_blackout_dates(self, start_date, end_date, blackouts=None):
+        """Return the set of dates from start_date to end_date without meals."""
+        if blackouts is None:
+            blackouts = self.get_blackouts()
+
+        blackout_dates = set()
+        for date, last_date in blackouts.overlapping(start_date, end_date):
+            while date <= last_date:
+                blackout_dates.add(date)
+                date += timedelta(days=1)
+
+        return blackout_dates
+
     def get_vendors(self, date):
-        return [vendor for vendor in Vendor.objects.filter(
-            timetable__slug=self.slug,
-            vendorservice__start_date__lte=date,
-            vendorservice__end_date__gte=date
-        )]
+        return list(Vendor.objects.filter(pk__in=VendorService.get_vendor_ids(self.pk, date)))
 
     def is_timetable_inactive_this_day(self, date):
         return str(date.weekday()) in self.inactive_weekdays
 
 
+def get_initial_version():
+    # Start from the time rather than 0, so that the versions of a timetable
+    # recreated with the id of a deleted one don't bring back its entries
+    return int(time.time() * 1000)
+
+
+class TimetableVersion(models.Model):
+    """
+    Model representing the version of the cached data of a timetable.
+
+    Cached servings are keyed by the version of their timetable, which is
+    bumped with an atomic update once changes to the timetable are committed
+    and its schedule is refreshed, so that the entries of every process are
+    invalidated.
+    """
+
+    timetable = models.OneToOneField(
+        Timetable, on_delete=models.CASCADE, primary_key=True, related_name='version'
+    )
+    version = models.BigIntegerField(default=get_initial_version)
+
+    @classmethod
+    def bump(cls, timetable_ids):
+        cls.objects.filter(timetable_id__in=timetable_ids).update(
+            version=models.F('version') + 1
+        )
+
+    def __str__(self):
+        return '{} - {}'.format(self.timetable, self.version)
+
+
 class Dish(SlugifyMixin, TimestampMixin):
     """
     Model representing the actual food served.
@@ -301,9 +431,9 @@ class Event(TimestampMixin):
 class Serving(TimestampMixin):
     """Model representing already served menu."""
 
-    public_id = HashidField(
+    public_id = HashidBigField(
         alphabet='0123456789abcdefghijklmnopqrstuvwxyz',
-        default=timestamp_seconds,
+        default=generate_id,
         unique=True
     )
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -343,7 +473,88 @@ class VendorService(models.Model):
     def __str__(self):
         return '{} - {}'.format(self.timetable, self.vendor)
 
+    @classmethod
+    def load_tenures(cls, timetable_ids, start_date, end_date):
+        """
+        Return interval trees of the vendors serving timetables from start_date to end_date.
+
+        Each tree maps dates to the ids of the vendors serving the timetable,
+        open-ended tenures included. The tenures of all the timetables are
+        loaded with a single range query.
+        """
+        tenures = {timetable_id: [] for timetable_id in timetable_ids}
+        for timetable_id, vendor_id, tenure_start, tenure_end in cls.objects.filter(
+            models.Q(start_date__lte=end_date) | models.Q(start_date=None),
+            models.Q(end_date__gte=start_date) | models.Q(end_date=None),
+            timetable_id__in=tenures
+        ).values_list('timetable_id', 'vendor_id', 'start_date', 'end_date'):
+            tenures[timetable_id].append(
+                (tenure_start or Date.min, tenure_end or Date.max, vendor_id)
+            )
+
+        return {
+            timetable_id: IntervalTree(intervals) for timetable_id, intervals in tenures.items()
+        }
+
+    @classmethod
+    def get_tenures(cls, timetable_ids, start_date, end_date):
+        """
+        Return the trees of load_tenures, cached.
+
+        Trees are cached per timetable with the range of dates they cover and
+        the TimetableVersion they were loaded at, so that changes committed by
+        any process invalidate them.
+        """
+        timetable_ids = set(timetable_ids)
+        versions = dict(TimetableVersion.objects.filter(
+            timetable_id__in=timetable_ids
+        ).values_list('timetable_id', 'version'))
+
+        trees = {}
+        missing = []
+        range_start, range_end = start_date, end_date
+        for timetable_id in timetable_ids:
+            cached = tenure_cache.get(timetable_id)
+            if cached and cached[0] != versions.get(timetable_id):
+                cached = None
+            if cached and cached[1] <= start_date and end_date <= cached[2]:
+                trees[timetable_id] = cached[3]
+            else:
+                missing.append(timetable_id)
+                if cached:
+                    # Grow the cached range rather than replace it
+                    range_start = min(range_start, cached[1])
+                    range_end = max(range_end, cached[2])
+
+        if missing:
+            for timetable_id, tree in cls.load_tenures(missing, range_start, range_end).items():
+                trees[timetable_id] = tree
+                tenure_cache.set(
+                    timetable_id, (versions.get(timetable_id), range_start, range_end, tree)
+                )
+
+        return trees
+
+    @classmethod
+    def get_vendor_ids(cls, timetable_id, date):
+        """Return the ids of the vendors serving a timetable on date."""
+        return sorted(cls.get_tenures([timetable_id], date, date)[timetable_id].at(date))
+
+    @classmethod
+    def get_vendor_ids_in_bulk(cls, timetable_ids, dates):
+        """Map timetable ids to dicts of the ids of the vendors serving them on each of dates."""
+        dates = list(dates)
+        if not dates:
+            return {timetable_id: {} for timetable_id in timetable_ids}
+
+        trees = cls.get_tenures(timetable_ids, min(dates), max(dates))
+        return {
+            timetable_id: {date: sorted(tree.at(date)) for date in dates}
+            for timetable_id, tree in trees.items()
+        }
+
     class Meta:
+        index_together = ('timetable', 'start_date', 'end_date')
         unique_together = ('timetable', 'vendor')
         verbose_name = 'Vendor Service'
         verbose_name_plural = 'Vendor Services'
@@ -379,9 +590,92 @@ class ServingAutoUpdate(models.Model):
                   'for the specified Date on the specified Timetable')
             )
 
+    @staticmethod
+    def verify_vendors_are_serving(timetable, vendor_ids, date, serving_vendor_ids=None):
+        if serving_vendor_ids is None:
+            serving_vendor_ids = VendorService.get_vendor_ids(timetable.pk, date)
+
+        if not vendor_ids or not set(vendor_ids) <= set(serving_vendor_ids):
+            raise ValidationError(
+                _('Ensure the specified Vendor has an active tenure '
+                  'for the specified Date on the specified Timetable')
+            )
+
+    @staticmethod
+    def bulk_create_ignoring_conflicts(model, objects):
+        """
+        Insert objects with a single query, skipping rows that already exist.
+
+        Django 1.11 has no conflict-ignoring bulk insert, so when a concurrent
+        request inserted some of the rows first, fall back to inserting them
+        one at a time and swallow the IntegrityError of the existing ones.
+        """
+        if not objects:
+            return
+
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objects)
+        except IntegrityError:
+            for obj in objects:
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create([obj])
+                except IntegrityError:
+                    pass
+
+    @classmethod
+    def create_missing_servings(cls, vendor_ids, menu_item_ids, date):
+        existing_servings = set(Serving.objects.filter(
+            menu_item_id__in=menu_item_ids,
+            vendor_id__in=vendor_ids,
+            date_served=date
+        ).values_list('menu_item_id', 'vendor_id'))
+
+        missing_servings = [
+            (menu_item_id, vendor_id)
+            for vendor_id in vendor_ids
+            for menu_item_id in menu_item_ids
+            if (menu_item_id, vendor_id) not in existing_servings
+        ]
+        public_ids = id_generator.generate(len(missing_servings))
+
+        cls.bulk_create_ignoring_conflicts(Serving, [
+            Serving(
+                public_id=public_id,
+                menu_item_id=menu_item_id,
+                vendor_id=vendor_id,
+                date_served=date
+            )
+            for public_id, (menu_item_id, vendor_id) in zip(public_ids, missing_servings)
+        ])
+
+    @classmethod
+    def materialize_servings(cls, timetable, vendor_ids, menu_item_ids, date):
+        """Create the missing servings and auto updates in bulk and return the servings."""
+        cls.create_missing_servings(vendor_ids, menu_item_ids, date)
+
+        updated_vendor_ids = set(cls.objects.filter(
+            timetable=timetable,
+            vendor_id__in=vendor_ids,
+            date=date
+        ).values_list('vendor_id', flat=True))
+        cls.bulk_create_ignoring_conflicts(cls, [
+            cls(timetable=timetable, vendor_id=vendor_id, date=date)
+            for vendor_id in vendor_ids
+            if vendor_id not in updated_vendor_ids
+        ])
+
+        return Serving.objects.filter(
+            menu_item_id__in=menu_item_ids,
+            vendor_id__in=vendor_ids,
+            date_served=date
+        )
+
     @classmethod
     def get_servings(cls, timetable, date, vendor=None):
-        if not timetable.is_active or timetable.is_timetable_inactive_this_day(date):
+        if (not timetable.is_active or timetable.is_timetable_inactive_this_day(date) or
+                timetable.is_blackout(date)):
             raise ValidationError(
                 _('Timetable {} is inactive on {}.'.format(
                     timetable.name,
@@ -389,44 +683,28 @@ class ServingAutoUpdate(models.Model):
                 ))
             )
 
-        if vendor:
-            cls.verify_vendor_is_serving(timetable, vendor, date)
-            vendors = [vendor]
-        else:
-            vendors = Vendor.objects.all()
+        serving_vendor_ids = VendorService.get_vendor_ids(timetable.pk, date)
+        vendor_ids = [vendor.pk] if vendor else serving_vendor_ids
 
+        cls.verify_vendors_are_serving(timetable, vendor_ids, date, serving_vendor_ids)
         menu_items = cls.get_menu_items(timetable, date)
 
-        for vendor in vendors:
-            kwargs = {
-                'timetable': timetable,
-                'vendor': vendor,
-                'date': date
-            }
-            if not cls.objects.filter(**kwargs).exists():
-                cls.objects.create(**kwargs)
-
-        return Serving.objects.filter(
-            menu_item__in=menu_items,
-            vendor__in=vendors,
-            date_served=date
+        return cls.materialize_servings(
+            timetable,
+            vendor_ids,
+            [menu_item.pk for menu_item in menu_items],
+            date
         )
 
     @classmethod
     def create_servings_if_not_exist(cls, timetable, vendor, date):
         cls.verify_vendor_is_serving(timetable, vendor, date)
         menu_items = cls.get_menu_items(timetable, date)
-
-        for menu_item in menu_items:
-            try:
-                with transaction.atomic():
-                    Serving.objects.create(
-                        menu_item=menu_item,
-                        vendor=vendor,
-                        date_served=date
-                    )
-            except IntegrityError:
-                pass
+        cls.create_missing_servings(
+            [vendor.pk],
+            [menu_item.pk for menu_item in menu_items],
+            date
+        )
 
     def clean(self):
         # This is called here instead of save() in order to handle ValidationError
@@ -444,3 +722,155 @@ class ServingAutoUpdate(models.Model):
         unique_together = ('timetable', 'vendor', 'date')
         verbose_name = 'ServingAutoUpdate'
         verbose_name_plural = 'ServingAutoUpdates'
+
+
+class Schedule(models.Model):
+    """
+    Model representing the precomputed daily schedule of a timetable.
+
+    Each row is a menu item served by a vendor on a date of a timetable.
+    Dates without any serving, like inactive weekdays or cycle days without
+    menu items, are kept as a single row without menu item and vendor so
+    that looking them up never falls back to computing the schedule.
+    """
+
+    timetable = models.ForeignKey(Timetable, on_delete=models.CASCADE)
+    date = models.DateField()
+    cycle_day = models.PositiveSmallIntegerField()
+    is_active = models.BooleanField(default=True)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, null=True)
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, null=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True)
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, null=True)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, null=True)
+
+    @classmethod
+    def build(cls, timetable, start_date, end_date, tenures=None):
+        """
+        Compute the schedule of timetable for the dates from start_date to end_date.
+
+        Tenures and blackouts are read from the database, never from caches
+        other processes may not have invalidated yet. The tenures may be given
+        as the tree of load_tenures covering the dates.
+        """
+        start_date = max(start_date, timetable.ref_cycle_date)
+
+        menu_items = {}
+        for menu_item in MenuItem.objects.filter(timetable=timetable):
+            menu_items.setdefault(menu_item.cycle_day, []).append(menu_item)
+
+        if tenures is None:
+            tenures = VendorService.load_tenures([timetable.pk], start_date, end_date)[timetable.pk]
+
+        entries = []
+        for date, cycle_day, inactive, blackout in zip(
+                *timetable.cycle_days(start_date, end_date, timetable.load_blackouts())):
+            is_active = timetable.is_active and not (inactive or blackout)
+            vendor_ids = sorted(tenures.at(date)) or [None]
+            day_menu_items = menu_items.get(cycle_day, []) if is_active else []
+
+            if day_menu_items:
+                entries.extend(
+                    cls(
+                        timetable=timetable,
+                        date=date,
+                        cycle_day=cycle_day,
+                        menu_item=menu_item,
+                        meal_id=menu_item.meal_id,
+                        course_id=menu_item.course_id,
+                        dish_id=menu_item.dish_id,
+                        vendor_id=vendor_id
+                    )
+                    for menu_item in day_menu_items
+                    for vendor_id in vendor_ids
+                )
+            else:
+                entries.append(cls(
+                    timetable=timetable,
+                    date=date,
+                    cycle_day=cycle_day,
+                    is_active=is_active
+                ))
+
+        with transaction.atomic():
+            cls.objects.filter(
+                timetable=timetable,
+                date__gte=start_date,
+                date__lte=end_date
+            ).delete()
+            cls.objects.bulk_create(entries)
+
+    @classmethod
+    def refresh(cls, timetable_id, start_date=None, end_date=None):
+        """
+        Recompute the already generated part of a timetable's schedule.
+
+        The version of the timetable is bumped afterwards, also when none of
+        its schedule is generated yet.
+        """
+        timetable = Timetable.objects.filter(pk=timetable_id).first()
+        if not timetable:
+            return
+
+        dates = cls.objects.filter(timetable=timetable).aggregate(
+            first_date=models.Min('date'),
+            last_date=models.Max('date')
+        )
+        if dates['first_date'] is not None:
+            start_date = max(start_date or dates['first_date'], dates['first_date'])
+            end_date = min(end_date or dates['last_date'], dates['last_date'])
+            if start_date <= end_date:
+                cls.build(timetable, start_date, end_date)
+
+        # Only once the schedule is rebuilt, so that no process caches
+        # servings of the stale schedule under the new version
+        TimetableVersion.bump([timetable_id])
+
+    @classmethod
+    def get_servings(cls, timetable, date, vendor=None):
+        """
+        Return the servings of timetable on date from the precomputed schedule.
+
+        Dates which are not scheduled yet are resolved by ServingAutoUpdate.
+        """
+        entries = list(cls.objects.filter(timetable=timetable, date=date))
+        if not entries:
+            return ServingAutoUpdate.get_servings(timetable, date, vendor=vendor)
+
+        if not entries[0].is_active:
+            raise ValidationError(
+                _('Timetable {} is inactive on {}.'.format(
+                    timetable.name,
+                    date,
+                ))
+            )
+
+        if entries[0].menu_item_id is None:
+            raise ValidationError(
+                _('No matching menu_item for this Timetable and Date combination.')
+            )
+
+        vendor_ids = {entry.vendor_id for entry in entries if entry.vendor_id}
+        if vendor:
+            vendor_ids &= {vendor.pk}
+        if not vendor_ids:
+            # As ServingAutoUpdate reports dates beyond the schedule
+            raise ValidationError(
+                _('Ensure the specified Vendor has an active tenure '
+                  'for the specified Date on the specified Timetable')
+            )
+
+        return ServingAutoUpdate.materialize_servings(
+            timetable,
+            sorted(vendor_ids),
+            sorted({entry.menu_item_id for entry in entries}),
+            date
+        )
+
+    def __str__(self):
+        return '{} - {} - {}'.format(self.timetable, self.date, self.menu_item or '-')
+
+    class Meta:
+        index_together = ('timetable', 'date')
+        verbose_name = 'Schedule'
+        verbose_name_plural = 'Schedules'
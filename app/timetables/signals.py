@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (Event, MenuItem, Schedule, TimetableVersion, blackout_cache,
+                     tenure_cache,)
+
+
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    # Saves may move an instance to another timetable, or an event to other
+    # dates, whose schedule and caches must be refreshed as well
+    fields = ['timetable_id', 'start_date', 'end_date'] if sender is Event else ['timetable_id']
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def get_timetable_ids(instance):
+    """Return the ids of the timetables of instance, after and before it was saved."""
+    timetable_ids = [instance.timetable_id]
+    previous_state = getattr(instance, '_previous_state', None)
+    if previous_state and previous_state['timetable_id'] != instance.timetable_id:
+        timetable_ids.append(previous_state['timetable_id'])
+    return timetable_ids
+
+
+def get_local_date(value):
+    return timezone.localtime(value, timezone.get_default_timezone()).date()
+
+
+def refresh_schedule(sender, instance, **kwargs):
+    timetable_ids = get_timetable_ids(instance)
+    # Deferred until commit so that cascading deletes are complete
+    transaction.on_commit(
+        lambda: [Schedule.refresh(timetable_id) for timetable_id in timetable_ids]
+    )
+
+
+def refresh_timetable_schedule(sender, instance, **kwargs):
+    transaction.on_commit(lambda: Schedule.refresh(instance.pk))
+
+
+def refresh_event_schedule(sender, instance, **kwargs):
+    ranges = {(
+        instance.timetable_id,
+        get_local_date(instance.start_date),
+        get_local_date(instance.end_date)
+    )}
+    previous_state = getattr(instance, '_previous_state', None)
+    if previous_state:
+        # The dates the event no longer covers are active again
+        ranges.add((
+            previous_state['timetable_id'],
+            get_local_date(previous_state['start_date']),
+            get_local_date(previous_state['end_date'])
+        ))
+
+    transaction.on_commit(lambda: [Schedule.refresh(*dates) for dates in sorted(ranges)])
+
+
+def invalidate_tenures(sender, instance, **kwargs):
+    timetable_ids = get_timetable_ids(instance)
+    for timetable_id in timetable_ids:
+        tenure_cache.delete(timetable_id)
+    # Also drop trees other requests load before the change is committed
+    transaction.on_commit(lambda: [tenure_cache.delete(pk) for pk in timetable_ids])
+
+
+def invalidate_blackouts(sender, instance, **kwargs):
+    timetable_ids = get_timetable_ids(instance)
+    for timetable_id in timetable_ids:
+        blackout_cache.delete(timetable_id)
+    transaction.on_commit(lambda: [blackout_cache.delete(pk) for pk in timetable_ids])
+
+
+def invalidate_timetable_caches(sender, instance, **kwargs):
+    tenure_cache.delete(instance.pk)
+    blackout_cache.delete(instance.pk)
+
+
+def create_timetable_version(sender, instance, created=False, **kwargs):
+    if created:
+        TimetableVersion.objects.get_or_create(timetable_id=instance.pk)
+
+
+def invalidate_served_servings(sender, instance, **kwargs):
+    # Servings don't change the schedule, only bump the version
+    timetable_ids = list(
+        MenuItem.objects.filter(pk=instance.menu_item_id).values_list('timetable_id', flat=True)
+    )
+    transaction.on_commit(lambda: TimetableVersion.bump(timetable_ids))
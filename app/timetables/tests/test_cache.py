@@ -0,0 +1,156 @@
+import datetime
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from app.timetables import cache
+from app.timetables.factories import (
+    CourseFactory, DishFactory, EventFactory, MealFactory, MenuItemFactory, TimetableFactory,
+    VendorFactory, VendorServiceFactory,
+)
+from app.timetables.models import Schedule, Serving, TimetableVersion
+
+
+class ServingsCacheTest(TransactionTestCase):
+    """Tests the read-through cache of servings, invalidated once changes are committed."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.vendor_service = VendorServiceFactory(start_date=None, end_date=None)
+        self.timetable = self.vendor_service.timetable
+        self.vendor = self.vendor_service.vendor
+        self.date = self.timetable.ref_cycle_date
+        self.meal = MealFactory()
+        self.menu_item = MenuItemFactory(
+            timetable=self.timetable,
+            meal=self.meal,
+            course=CourseFactory(name='main'),
+            dish=DishFactory(name='Bread and Egg')
+        )
+
+    def get_servings(self, vendor_slug=None):
+        return cache.get_servings(self.timetable.slug, self.date, vendor_slug)
+
+    def test_servings_are_cached(self):
+        servings = self.get_servings()
+
+        # Only the version of the timetable is read
+        with self.assertNumQueries(1):
+            cached_servings = self.get_servings()
+
+        self.assertEqual(
+            [(serving.pk, str(serving.public_id)) for serving in Serving.objects.all()],
+            [(serving.pk, str(serving.public_id)) for serving in cached_servings]
+        )
+        self.assertEqual(servings[0].menu_item_id, cached_servings[0].menu_item_id)
+        self.assertEqual(self.date, cached_servings[0].date_served)
+        self.assertFalse(cached_servings[0]._state.adding)
+
+    def test_servings_of_a_vendor_are_cached_separately(self):
+        self.get_servings()
+        VendorServiceFactory(
+            timetable=self.timetable, vendor=VendorFactory(name='Other'),
+            start_date=None, end_date=None
+        )
+
+        self.assertEqual(1, len(self.get_servings(self.vendor.slug)))
+        self.assertEqual(2, len(self.get_servings()))
+
+    def test_menu_item_changes_invalidate_the_cache(self):
+        self.get_servings()
+        MenuItemFactory(
+            timetable=self.timetable,
+            meal=self.meal,
+            course=CourseFactory(name='dessert', sequence_order=2),
+            dish=DishFactory(name='Apples')
+        )
+
+        self.assertEqual(2, len(self.get_servings()))
+
+    def test_menu_items_moved_invalidate_the_previous_timetable(self):
+        self.get_servings()
+        self.menu_item.timetable = TimetableFactory(name='Other Timetable')
+        self.menu_item.save()
+
+        self.assertRaises(ValidationError, self.get_servings)
+
+    def test_versions_are_bumped_once_the_schedule_is_refreshed(self):
+        Schedule.build(self.timetable, self.date, self.date)
+        version = TimetableVersion.objects.get(timetable=self.timetable).version
+        build = Schedule.build
+        versions = []
+
+        def record_version(timetable, *args):
+            versions.append(TimetableVersion.objects.get(timetable=timetable).version)
+            build(timetable, *args)
+
+        with mock.patch.object(Schedule, 'build', side_effect=record_version):
+            self.menu_item.save()
+
+        self.assertEqual([version], versions)
+        self.assertEqual(
+            version + 1, TimetableVersion.objects.get(timetable=self.timetable).version
+        )
+
+    def test_serving_changes_invalidate_the_cache(self):
+        self.get_servings()
+        Serving.objects.get().delete()
+
+        servings = self.get_servings()
+        self.assertEqual(1, len(servings))
+        self.assertEqual(Serving.objects.get().pk, servings[0].pk)
+
+    def test_event_changes_invalidate_the_cache(self):
+        self.get_servings()
+        EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(datetime.datetime.combine(self.date, datetime.time())),
+            end_date=timezone.make_aware(
+                datetime.datetime.combine(self.date + datetime.timedelta(days=1), datetime.time())
+            )
+        )
+
+        self.assertRaises(ValidationError, self.get_servings)
+
+    def test_timetable_changes_invalidate_the_cache(self):
+        self.get_servings()
+        old_slug = self.timetable.slug
+        self.timetable.is_active = False
+        self.timetable.save()
+        self.assertRaises(ValidationError, self.get_servings)
+
+        self.timetable.is_active = True
+        self.timetable.name = 'Renamed Timetable'
+        self.timetable.save()
+        self.assertNotEqual(old_slug, self.timetable.slug)
+        self.assertEqual(1, len(self.get_servings()))
+        self.assertRaises(
+            self.timetable.DoesNotExist, cache.get_servings, old_slug, self.date
+        )
+
+    def test_timetables_without_a_version_are_resolved(self):
+        TimetableVersion.objects.all().delete()
+        self.get_servings()
+
+        self.assertEqual(1, len(self.get_servings()))
+        self.assertIsNone(cache.get_version(self.timetable.slug))
+
+    def test_file_based_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        backend = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }
+
+        with override_settings(CACHES={'default': backend, 'servings': backend}):
+            self.get_servings()
+            with self.assertNumQueries(1):
+                self.assertEqual(1, len(self.get_servings()))
+
+            self.vendor_service.delete()
+            self.assertRaises(ValidationError, self.get_servings)
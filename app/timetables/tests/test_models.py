@@ -1,9 +1,12 @@
 import datetime
+from io import StringIO
 
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.db import transaction
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 
 from app.timetables.factories import (
     CourseFactory, DishFactory, EventFactory, MealFactory, MenuItemFactory,
@@ -11,8 +14,8 @@ from app.timetables.factories import (
 )
 
 from app.timetables.models import (
-    Course, Dish, Event, Meal, MenuItem, Serving, ServingAutoUpdate, Timetable,
-    Vendor, VendorService,
+    Course, Dish, Event, Meal, MenuItem, Schedule, Serving, ServingAutoUpdate,
+    Timetable, TimetableVersion, Vendor, VendorService,
 )
 
 
@@ -129,6 +132,88 @@ class TimetableTest(TestCase):
         test_date = datetime.date(2016, 9, 25)
         self.assertRaises(ValidationError, self.timetable.calculate_cycle_day, test_date)
 
+    def test_cycle_days(self):
+        start_date = self.timetable.ref_cycle_date
+        end_date = start_date + datetime.timedelta(days=999)
+        EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(datetime.datetime(2016, 12, 24, 12)),
+            end_date=timezone.make_aware(datetime.datetime(2016, 12, 27))
+        )
+
+        cycle_days = self.timetable.cycle_days(start_date, end_date)
+
+        self.assertEqual(1000, len(cycle_days.dates))
+        self.assertEqual(start_date, cycle_days.dates[0])
+        self.assertEqual(end_date, cycle_days.dates[-1])
+        self.assertEqual(
+            [self.timetable.calculate_cycle_day(date) for date in cycle_days.dates],
+            cycle_days.cycle_days
+        )
+        self.assertEqual(
+            [self.timetable.is_timetable_inactive_this_day(date) for date in cycle_days.dates],
+            cycle_days.inactive
+        )
+        self.assertEqual(
+            [datetime.date(2016, 12, day) for day in (24, 25, 26)],
+            [date for date, blackout in zip(cycle_days.dates, cycle_days.blackout) if blackout]
+        )
+
+    def test_cycle_days_before_ref_cycle_date(self):
+        end_date = self.timetable.ref_cycle_date
+        start_date = end_date - datetime.timedelta(days=self.timetable.cycle_length * 2)
+
+        cycle_days = self.timetable.cycle_days(start_date, end_date).cycle_days
+
+        self.assertEqual(cycle_days[-1], cycle_days[0])
+        self.assertEqual(self.timetable.ref_cycle_day, cycle_days[-1])
+        self.assertEqual(self.timetable.cycle_length, cycle_days[-1 - self.timetable.ref_cycle_day])
+
+    def test_cycle_days_of_empty_range(self):
+        date = self.timetable.ref_cycle_date
+
+        self.assertEqual(
+            ([], [], [], []),
+            self.timetable.cycle_days(date, date - datetime.timedelta(days=1))
+        )
+
+    def test_blackouts_are_cached_until_events_change(self):
+        date = datetime.date(2016, 12, 25)
+        self.assertFalse(self.timetable.is_blackout(date))
+
+        event = EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(datetime.datetime(2016, 12, 24)),
+            end_date=timezone.make_aware(datetime.datetime(2016, 12, 27))
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(self.timetable.is_blackout(date))
+        # Only the version of the timetable
+        with self.assertNumQueries(2):
+            self.assertFalse(self.timetable.is_blackout(datetime.date(2016, 12, 27)))
+            self.assertEqual(
+                {datetime.date(2016, 12, 25), datetime.date(2016, 12, 26)},
+                self.timetable.get_blackout_dates(date, datetime.date(2017, 1, 31))
+            )
+
+        event.delete()
+        self.assertFalse(self.timetable.is_blackout(date))
+
+    def test_blackouts_cached_by_other_processes_are_invalidated_by_the_version(self):
+        date = datetime.date(2016, 12, 25)
+        self.assertFalse(self.timetable.is_blackout(date))
+
+        # As created by another process, whose signals don't reach this one
+        Event.objects.bulk_create([EventFactory.build(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(datetime.datetime(2016, 12, 24)),
+            end_date=timezone.make_aware(datetime.datetime(2016, 12, 27))
+        )])
+        self.assertFalse(self.timetable.is_blackout(date))
+
+        TimetableVersion.bump([self.timetable.pk])
+        self.assertTrue(self.timetable.is_blackout(date))
+
     def test_get_vendors(self):
         vendor_service = VendorServiceFactory(timetable=self.timetable)
 
@@ -260,6 +345,81 @@ class VendorServiceTest(TestCase):
     def test_enforcement_of_uniqueness_of_timetable_and_vendor_together(self):
         self.assertRaises(ValidationError, self.another_vendor_service.save)
 
+    def test_get_vendor_ids(self):
+        timetable = self.vendor_service.timetable
+        open_vendor_service = VendorServiceFactory(
+            timetable=timetable,
+            vendor=VendorFactory(name='Papa Taverna'),
+            start_date=datetime.date(2008, 6, 1),
+            end_date=None
+        )
+        vendor_ids = [self.vendor_service.vendor_id, open_vendor_service.vendor_id]
+
+        self.assertEqual([], VendorService.get_vendor_ids(timetable.pk, datetime.date(2008, 1, 22)))
+        self.assertEqual(
+            vendor_ids[:1], VendorService.get_vendor_ids(timetable.pk, datetime.date(2008, 1, 23))
+        )
+        self.assertEqual(
+            vendor_ids, VendorService.get_vendor_ids(timetable.pk, datetime.date(2008, 12, 28))
+        )
+        self.assertEqual(
+            vendor_ids[1:], VendorService.get_vendor_ids(timetable.pk, datetime.date(2030, 1, 1))
+        )
+
+    def test_get_vendor_ids_in_bulk(self):
+        another_vendor_service = VendorServiceFactory(
+            timetable=TimetableFactory(name='Staff Timetable'),
+            vendor=VendorFactory(name='Papa Taverna'),
+            start_date=None,
+            end_date=datetime.date(2008, 6, 1)
+        )
+        dates = [datetime.date(2008, 1, 1), datetime.date(2008, 7, 1)]
+
+        # The versions and the tenures of the timetables
+        with self.assertNumQueries(2):
+            vendor_ids = VendorService.get_vendor_ids_in_bulk([
+                self.vendor_service.timetable_id, another_vendor_service.timetable_id
+            ], dates)
+
+        self.assertEqual({
+            self.vendor_service.timetable_id: {
+                dates[0]: [], dates[1]: [self.vendor_service.vendor_id]
+            },
+            another_vendor_service.timetable_id: {
+                dates[0]: [another_vendor_service.vendor_id], dates[1]: []
+            },
+        }, vendor_ids)
+
+    def test_tenures_are_cached_until_changed(self):
+        timetable_id = self.vendor_service.timetable_id
+        date = datetime.date(2008, 12, 28)
+        VendorService.get_vendor_ids(timetable_id, date)
+
+        # Only the version of the timetable
+        with self.assertNumQueries(1):
+            vendor_ids = VendorService.get_vendor_ids(timetable_id, date)
+        self.assertEqual([self.vendor_service.vendor_id], vendor_ids)
+
+        self.vendor_service.end_date = datetime.date(2008, 12, 27)
+        self.vendor_service.save()
+        self.assertEqual([], VendorService.get_vendor_ids(timetable_id, date))
+
+    def test_tenures_cached_by_other_processes_are_invalidated_by_the_version(self):
+        timetable_id = self.vendor_service.timetable_id
+        date = datetime.date(2008, 12, 28)
+        VendorService.get_vendor_ids(timetable_id, date)
+
+        # As changed by another process, whose signals don't reach this one
+        VendorService.objects.filter(pk=self.vendor_service.pk).update(
+            end_date=datetime.date(2008, 12, 27)
+        )
+        self.assertEqual(
+            [self.vendor_service.vendor_id], VendorService.get_vendor_ids(timetable_id, date)
+        )
+
+        TimetableVersion.bump([timetable_id])
+        self.assertEqual([], VendorService.get_vendor_ids(timetable_id, date))
+
     def test_enforcement_of_vendor_service_start_date_being_less_than_its_end_date(self):
         self.another_vendor_service.vendor = VendorFactory(name='Papa Taverna')
 
@@ -389,6 +549,20 @@ class ServingAutoUpdateTest(TestCase):
                 e.messages
             )
 
+    def test_get_servings_on_a_no_meal_event(self):
+        EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(datetime.datetime(2016, 9, 30, 18)),
+            end_date=timezone.make_aware(datetime.datetime(2016, 10, 2))
+        )
+
+        with self.assertRaisesMessage(
+            ValidationError,
+            'Timetable {} is inactive on {}.'.format(self.timetable.name, self.date)
+        ):
+            ServingAutoUpdate.get_servings(self.timetable, self.date, vendor=self.vendor)
+        self.assertEqual(0, self.get_servings_count())
+
     def test_get_servings_with_date_being_an_inactive_weekday_of_the_specified_timetable(self):
         date = self.later_date - datetime.timedelta(days=1)
         try:
@@ -471,6 +645,24 @@ class ServingAutoUpdateTest(TestCase):
         self.assertEqual(3, len(servings))
         self.assertIsInstance(servings[0], Serving)
 
+    def test_get_servings_without_vendor_ignores_vendors_not_serving_the_timetable(self):
+        VendorServiceFactory(
+            timetable=TimetableFactory(name='Staff Timetable'),
+            vendor=VendorFactory(name='Papa Taverna'),
+            start_date=None,
+            end_date=None
+        )
+        VendorServiceFactory(
+            timetable=self.timetable,
+            vendor=VendorFactory(name='Spicy Foods'),
+            start_date=self.later_date,
+            end_date=None
+        )
+
+        servings = ServingAutoUpdate.get_servings(self.timetable, self.date)
+
+        self.assertEqual({self.vendor}, {serving.vendor for serving in servings})
+
     def test_manual_creation_of_serving_auto_update(self):
         # Before creation attempt
         kwargs = {
@@ -498,3 +690,227 @@ class ServingAutoUpdateTest(TestCase):
         serving_auto_update.save()
         self.assertIsInstance(ServingAutoUpdate.objects.get(**kwargs), ServingAutoUpdate)
         self.assertEqual(3, self.get_servings_count())
+
+    def test_get_servings_is_idempotent(self):
+        ServingAutoUpdate.get_servings(self.timetable, self.date)
+        servings = ServingAutoUpdate.get_servings(self.timetable, self.date)
+
+        self.assertEqual(3, len(servings))
+        self.assertEqual(3, self.get_servings_count())
+        self.assertEqual(1, ServingAutoUpdate.objects.count())
+
+    def test_get_servings_query_count_does_not_grow_with_vendors_and_menu_items(self):
+        for name in ['Spicy Foods', 'Tantalizer']:
+            VendorServiceFactory(
+                timetable=self.timetable,
+                vendor=VendorFactory(name=name),
+                start_date=None,
+                end_date=None
+            )
+        MenuItemFactory(
+            timetable=self.timetable,
+            meal=self.menu_items[0].meal,
+            course=self.menu_items[0].course,
+            dish=DishFactory(name='Pancakes')
+        )
+
+        # The version and blackouts, the version and tenures, menu items,
+        # existing servings, servings insert, existing auto updates, auto
+        # updates insert, the two inserts' savepoints and the servings lookup.
+        with self.assertNumQueries(14):
+            servings = ServingAutoUpdate.get_servings(self.timetable, self.date)
+            self.assertEqual(12, len(servings))
+
+
+class ScheduleTest(TestCase):
+    """Test the Schedule model."""
+
+    def setUp(self):
+        self.vendor_service = VendorServiceFactory(start_date=None, end_date=None)
+        self.timetable = self.vendor_service.timetable
+        self.vendor = self.vendor_service.vendor
+        self.date = self.timetable.ref_cycle_date
+
+        meal = MealFactory()
+        course = CourseFactory(name='main')
+        self.menu_items = [
+            MenuItemFactory(
+                timetable=self.timetable,
+                meal=meal,
+                course=course,
+                dish=DishFactory(name=dish_name)
+            ) for dish_name in ['Quaker Oat and Moi-moi', 'Bread and Egg', 'Apples']
+        ]
+
+        call_command(
+            'build_schedule',
+            start=self.date.isoformat(),
+            days=14,
+            stdout=StringIO()
+        )
+
+    def test_build_schedule(self):
+        entries = Schedule.objects.filter(timetable=self.timetable)
+
+        self.assertEqual(14, len(set(entry.date for entry in entries)))
+        self.assertEqual(
+            set(self.menu_items),
+            set(entry.menu_item for entry in entries.filter(date=self.date))
+        )
+
+        # Mondays and Wednesdays are inactive weekdays of the timetable
+        inactive_date = datetime.date(2016, 10, 3)
+        self.assertEqual(
+            [False],
+            [entry.is_active for entry in entries.filter(date=inactive_date)]
+        )
+
+    def test_build_schedule_with_no_meal_event(self):
+        EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(timezone.datetime(2016, 10, 1, 0, 0, 0)),
+            end_date=timezone.make_aware(timezone.datetime(2016, 10, 2, 0, 0, 0))
+        )
+        Schedule.refresh(self.timetable.pk)
+
+        self.assertRaises(
+            ValidationError,
+            Schedule.get_servings,
+            self.timetable, self.date
+        )
+
+    def test_build_schedule_reads_tenures_from_the_database(self):
+        VendorService.get_vendor_ids(self.timetable.pk, self.date)
+        # As changed by another process, whose signals don't reach this one
+        VendorService.objects.filter(pk=self.vendor_service.pk).update(
+            start_date=self.date + datetime.timedelta(days=1)
+        )
+
+        Schedule.build(self.timetable, self.date, self.date)
+
+        self.assertEqual(
+            {None},
+            {entry.vendor_id for entry in Schedule.objects.filter(date=self.date)}
+        )
+
+    def test_build_schedule_reads_blackouts_from_the_database(self):
+        self.assertFalse(self.timetable.is_blackout(self.date))
+        # As created by another process, whose signals don't reach this one
+        Event.objects.bulk_create([EventFactory.build(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(timezone.datetime(2016, 10, 1, 0, 0, 0)),
+            end_date=timezone.make_aware(timezone.datetime(2016, 10, 2, 0, 0, 0))
+        )])
+
+        Schedule.build(self.timetable, self.date, self.date)
+
+        self.assertEqual(
+            [False], [entry.is_active for entry in Schedule.objects.filter(date=self.date)]
+        )
+
+    def test_get_servings_from_schedule(self):
+        with self.assertNumQueries(10):
+            servings = Schedule.get_servings(self.timetable, self.date, vendor=self.vendor)
+            self.assertEqual(3, len(servings))
+
+        self.assertEqual(
+            set(self.menu_items),
+            set(serving.menu_item for serving in servings)
+        )
+        self.assertEqual(3, len(Schedule.get_servings(self.timetable, self.date)))
+
+    def test_get_servings_from_schedule_on_an_inactive_weekday(self):
+        self.assertRaises(
+            ValidationError,
+            Schedule.get_servings,
+            self.timetable, datetime.date(2016, 10, 3)
+        )
+
+    def test_get_servings_from_schedule_with_no_menu_item_entry(self):
+        self.assertRaises(
+            ValidationError,
+            Schedule.get_servings,
+            self.timetable, datetime.date(2016, 10, 4)
+        )
+
+    def test_get_servings_from_schedule_without_vendors(self):
+        self.vendor_service.delete()
+        Schedule.refresh(self.timetable.pk)
+
+        for date in [self.date, self.date + datetime.timedelta(days=14)]:
+            with self.assertRaisesRegex(ValidationError, 'active tenure'):
+                Schedule.get_servings(self.timetable, date)
+
+    def test_get_servings_for_a_date_not_scheduled(self):
+        date = self.date + datetime.timedelta(days=14)
+        self.assertFalse(Schedule.objects.filter(date=date).exists())
+
+        self.assertEqual(3, len(Schedule.get_servings(self.timetable, date)))
+
+
+class ScheduleRefreshTest(TransactionTestCase):
+    """Test the refresh of the Schedule model on changes."""
+
+    def setUp(self):
+        self.vendor_service = VendorServiceFactory(start_date=None, end_date=None)
+        self.timetable = self.vendor_service.timetable
+        self.date = self.timetable.ref_cycle_date
+        self.menu_item = MenuItemFactory(timetable=self.timetable)
+        Schedule.build(self.timetable, self.date, self.date)
+
+    def test_schedule_is_refreshed_when_a_menu_item_is_saved(self):
+        menu_item = MenuItemFactory(
+            timetable=self.timetable,
+            meal=self.menu_item.meal,
+            course=self.menu_item.course,
+            dish=DishFactory(name='Bread and Egg')
+        )
+
+        self.assertEqual(
+            {self.menu_item, menu_item},
+            set(entry.menu_item for entry in Schedule.objects.all())
+        )
+
+    def test_both_schedules_are_refreshed_when_a_menu_item_moves(self):
+        other_timetable = TimetableFactory(name='Other Timetable')
+        VendorServiceFactory(
+            timetable=other_timetable, vendor=self.vendor_service.vendor,
+            start_date=None, end_date=None
+        )
+        Schedule.build(other_timetable, self.date, self.date)
+
+        self.menu_item.timetable = other_timetable
+        self.menu_item.save()
+
+        self.assertEqual(
+            [None], [entry.menu_item for entry in Schedule.objects.filter(timetable=self.timetable)]
+        )
+        self.assertEqual(
+            [self.menu_item],
+            [entry.menu_item for entry in Schedule.objects.filter(timetable=other_timetable)]
+        )
+
+    def test_dates_an_event_no_longer_covers_are_active_again(self):
+        event = EventFactory(
+            timetable=self.timetable,
+            start_date=timezone.make_aware(timezone.datetime(2016, 10, 1, 0, 0, 0)),
+            end_date=timezone.make_aware(timezone.datetime(2016, 10, 1, 12, 0, 0))
+        )
+        self.assertEqual([False], [entry.is_active for entry in Schedule.objects.all()])
+
+        event.start_date = timezone.make_aware(timezone.datetime(2016, 10, 5, 0, 0, 0))
+        event.end_date = timezone.make_aware(timezone.datetime(2016, 10, 5, 12, 0, 0))
+        event.save()
+
+        self.assertEqual([True], [entry.is_active for entry in Schedule.objects.all()])
+
+    def test_schedule_is_refreshed_when_a_vendor_service_is_deleted(self):
+        self.vendor_service.delete()
+
+        self.assertEqual([None], [entry.vendor for entry in Schedule.objects.all()])
+
+    def test_schedule_is_refreshed_when_a_timetable_is_deactivated(self):
+        self.timetable.is_active = False
+        self.timetable.save()
+
+        self.assertEqual([False], [entry.is_active for entry in Schedule.objects.all()])
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+class LRUCache(object):
+    """
+    Thread-safe in-process cache with least recently used eviction.
+
+    Entries expire ttl seconds after they are set when ttl is given.
+    Hits and misses are counted so that the cache can be monitored.
+    """
+
+    _missing = object()
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value, expires_at = self._entries.get(key, (self._missing, None))
+            if value is not self._missing and expires_at is not None and expires_at <= monotonic():
+                del self._entries[key]
+                value = self._missing
+
+            if value is self._missing:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
@@ -0,0 +1,120 @@
+"""
+Observation of the SQL run through the database connections.
+
+A QueryObserver counts the queries, their time and the rows fetched by the
+cursors of the connections of the current thread, while it is entered.
+Subclasses record more by extending executed and fetched, and may stop a
+statement from running by raising in executing. Connections wrap
+their cursors only while observed.
+"""
+from time import monotonic
+
+from django.db import connections
+
+
+class ObservedCursor(object):
+    """Cursor wrapper reporting the statements and fetched rows of a cursor to observers."""
+
+    def __init__(self, cursor, observers):
+        self.cursor = cursor
+        self.observers = observers
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.notify_fetched(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, sql, params=None):
+        return self.run(self.cursor.execute, sql, params, many=False)
+
+    def executemany(self, sql, param_list):
+        return self.run(self.cursor.executemany, sql, param_list, many=True)
+
+    def run(self, method, sql, params, many):
+        for observer in list(self.observers):
+            observer.executing(sql, params, many)
+
+        start = monotonic()
+        try:
+            return method(sql, params)
+        finally:
+            duration = monotonic() - start
+            for observer in list(self.observers):
+                observer.executed(sql, params, duration, many)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.notify_fetched(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self.cursor.fetchmany(*args)
+        self.notify_fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.notify_fetched(len(rows))
+        return rows
+
+    def notify_fetched(self, count):
+        for observer in list(self.observers):
+            observer.fetched(count)
+
+
+def get_observers(connection):
+    """Return the observers of connection, wrapping its cursors for them the first time."""
+    observers = getattr(connection, 'query_observers', None)
+    if observers is None:
+        observers = connection.query_observers = []
+        make_cursor = connection.make_cursor
+        make_debug_cursor = connection.make_debug_cursor
+
+        connection.make_cursor = lambda cursor: (
+            ObservedCursor(make_cursor(cursor), observers) if observers else make_cursor(cursor)
+        )
+        connection.make_debug_cursor = lambda cursor: (
+            ObservedCursor(make_debug_cursor(cursor), observers) if observers
+            else make_debug_cursor(cursor)
+        )
+
+    return observers
+
+
+class QueryObserver(object):
+    """Count the queries, their time in seconds and the rows fetched while entered."""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else None
+        self.queries = 0
+        self.duration = 0.0
+        self.rows = 0
+
+    def __enter__(self):
+        for alias in self.aliases or connections:
+            get_observers(connections[alias]).append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for alias in self.aliases or connections:
+            get_observers(connections[alias]).remove(self)
+
+    def executing(self, sql, params, many):
+        pass
+
+    def executed(self, sql, params, duration, many):
+        self.queries += 1
+        self.duration += duration
+
+    def fetched(self, count):
+        self.rows += count
@@ -0,0 +1,10 @@
+from hashid_field import HashidField
+
+
+class HashidBigField(HashidField):
+    """HashidField stored in a 64-bit integer column."""
+
+    description = "A Hashids obscured BigIntegerField"
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
@@ -0,0 +1,98 @@
+from bisect import bisect_left, bisect_right
+
+
+class IntervalTree(object):
+    """
+    Static centered interval tree of closed intervals.
+
+    Built once from (start, end, value) triples, it returns the values of the
+    intervals containing a point in O(log n + m) time. Bounds can be of any
+    comparable type.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = [tuple(interval) for interval in intervals]
+        self._root = self._build(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    @classmethod
+    def _build(cls, intervals):
+        if not intervals:
+            return None
+
+        bounds = sorted(bound for start, end, value in intervals for bound in (start, end))
+        center = bounds[len(bounds) // 2]
+
+        overlapping = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+        return (
+            center,
+            sorted(overlapping, key=lambda interval: interval[0]),
+            sorted(overlapping, key=lambda interval: interval[1], reverse=True),
+            cls._build([interval for interval in intervals if interval[1] < center]),
+            cls._build([interval for interval in intervals if interval[0] > center]),
+        )
+
+    def at(self, point):
+        """Return the values of the intervals containing point."""
+        values = []
+        node = self._root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                # Every interval of the node ends at or after center
+                for start, end, value in by_start:
+                    if start > point:
+                        break
+                    values.append(value)
+                node = left
+            elif point > center:
+                # Every interval of the node starts at or before center
+                for start, end, value in by_end:
+                    if end < point:
+                        break
+                    values.append(value)
+                node = right
+            else:
+                values.extend(value for start, end, value in by_start)
+                node = None
+
+        return values
+
+
+class IntervalSet(object):
+    """
+    Sorted disjoint closed intervals, merged from possibly overlapping ones.
+
+    Whether a point or a range is covered is answered by bisection in
+    O(log n) time.
+    """
+
+    def __init__(self, intervals):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.starts = [start for start, end in merged]
+        self.ends = [end for start, end in merged]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __contains__(self, point):
+        index = bisect_right(self.starts, point) - 1
+        return index >= 0 and point <= self.ends[index]
+
+    def overlapping(self, start, end):
+        """Return the parts of the intervals between start and end, in order."""
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+
+        return [
+            (max(interval_start, start), min(interval_end, end))
+            for interval_start, interval_end in zip(self.starts[first:last], self.ends[first:last])
+        ]
@@ -1,63 +1,167 @@
-import json
+import heapq
+import logging
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from graphene_django.views import GraphQLView
+
+from .db import QueryObserver
+
+logger = logging.getLogger(__name__)
 
 
 class GraphqlResponseFlattenerMiddleware(object):
-    """Flatten the Graphql responses in a one-level JSON object."""
+    """
+    Flatten the Graphql responses in a one-level JSON object.
+
+    Only JSON requests to the paths in GRAPHQL_FLATTENED_PATHS are flattened.
+    The GraphQL view flattens their result before serializing it, so that the
+    response body is never decoded and encoded again.
+    """
 
     def __init__(self, get_response=None):
         self.get_response = get_response
 
     def __call__(self, request):
-        response = self.get_response(request)
-
-        try:
-            content = json.loads(response.content.decode())
-        except json.JSONDecodeError:
-            return response
-
-        if 'data' in content:
-            if content['data'].get('__schema'):
-                return response
-            flattened_content = {}
-            index = 0
-            for resource in list(content['data'].values()):
-                # Use case for retrieval of all records
-                key = list(content['data'].keys())[index]
-
-                if (resource and 'edges' in resource and
-                        isinstance(resource['edges'], list) and
-                        len(resource['edges']) > 0 and
-                        'node' in resource['edges'][0]):
-
-                    flattened_content[key] = []
-                    for item in list(resource.values())[0]:
-                        flattened_content[key].append(list(item.values())[0])
-                elif isinstance(resource, list):
-                    flattened_content[key] = [x for x in resource]
-                # Use case for retrieval a record
-                elif isinstance(resource, dict):
-                    if self.contains_dict_or_None(resource):
-                        flattened_content.update(resource)
-                    else:
-                        flattened_content[key] = resource
-                elif resource is None:
-                    flattened_content[
-                        list(content['data'].keys())[index]
-                    ] = resource
-
-                index += 1
-
-            if 'errors' in content:
-                flattened_content['error'] = content['errors'][0]['message']
-
-            content = flattened_content
-
-        response.content = json.dumps(content)
-        return response
+        request.flatten_graphql_response = (
+            request.path in settings.GRAPHQL_FLATTENED_PATHS and
+            not GraphQLView.request_wants_html(request)
+        )
+
+        return self.get_response(request)
+
+    @classmethod
+    def flatten(cls, content):
+        if content.get('data') is None or content['data'].get('__schema'):
+            return content
+
+        flattened_content = {}
+        for key, resource in content['data'].items():
+            # Use case for retrieval of all records
+            if (isinstance(resource, dict) and
+                    isinstance(resource.get('edges'), list) and
+                    len(resource['edges']) > 0 and
+                    'node' in resource['edges'][0]):
+                flattened_content[key] = [edge['node'] for edge in resource['edges']]
+            elif isinstance(resource, list):
+                flattened_content[key] = resource
+            # Use case for retrieval a record
+            elif isinstance(resource, dict):
+                if cls.contains_dict_or_None(resource):
+                    flattened_content.update(resource)
+                else:
+                    flattened_content[key] = resource
+            elif resource is None:
+                flattened_content[key] = resource
 
-    def contains_dict_or_None(self, resource):
+        if 'errors' in content:
+            flattened_content['error'] = content['errors'][0]['message']
+
+        if 'extensions' in content:
+            flattened_content['extensions'] = content['extensions']
+
+        return flattened_content
+
+    @staticmethod
+    def contains_dict_or_None(resource):
         for key, value in resource.items():
             if value is None:
                 return True
 
             return isinstance(value, dict)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised instead of running the statements of a request over its query budget."""
+
+
+class RequestQueryObserver(QueryObserver):
+    """Count the queries of a request, keeping the slowest, and stop those over max_queries."""
+
+    def __init__(self, max_queries=None, slowest=5):
+        super().__init__()
+        self.max_queries = max_queries
+        self.slowest_count = slowest
+        # Heap of the slowest (duration, number, sql, params)
+        self.slowest = []
+        self.exceeded = False
+
+    def executing(self, sql, params, many):
+        if self.max_queries is not None and self.queries >= self.max_queries:
+            self.exceeded = True
+            raise QueryBudgetExceeded(
+                'The request exceeded the budget of {} queries.'.format(self.max_queries)
+            )
+
+    def executed(self, sql, params, duration, many):
+        super().executed(sql, params, duration, many)
+        statement = (duration, self.queries, sql, params)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, statement)
+        elif self.slowest:
+            heapq.heappushpop(self.slowest, statement)
+
+    def get_slowest(self):
+        return sorted(self.slowest, reverse=True)
+
+
+class QueryBudgetMiddleware(object):
+    """
+    Log the requests running too many or too slow SQL queries.
+
+    Requests over QUERY_BUDGET_LOG_QUERIES queries or QUERY_BUDGET_LOG_DURATION
+    seconds of SQL are logged with their GraphQL operation, api key and
+    slowest statements. When QUERY_BUDGET_ENFORCED, the statements over
+    QUERY_BUDGET_MAX_QUERIES aren't run and the request fails with a 503.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        observer = RequestQueryObserver(
+            settings.QUERY_BUDGET_MAX_QUERIES if settings.QUERY_BUDGET_ENFORCED else None,
+            settings.QUERY_BUDGET_SLOWEST
+        )
+        with observer:
+            try:
+                response = self.get_response(request)
+            except QueryBudgetExceeded:
+                response = None
+
+        if (observer.exceeded or observer.queries > settings.QUERY_BUDGET_LOG_QUERIES or
+                observer.duration > settings.QUERY_BUDGET_LOG_DURATION):
+            self.log(request, observer)
+
+        if observer.exceeded:
+            # Errors raised in resolvers are reported in the GraphQL response instead
+            return self.get_exceeded_response()
+
+        return response
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, QueryBudgetExceeded):
+            return self.get_exceeded_response()
+
+    @staticmethod
+    def get_exceeded_response():
+        data = {'message': 'The request exceeded its query budget.'}
+        return JsonResponse(data, status=503)
+
+    @staticmethod
+    def log(request, observer):
+        api_key = getattr(request, 'api_key', None)
+        lines = [
+            '%d SQL queries in %.3f s%s on %s %s, operation %s, api key %s. Slowest:',
+        ]
+        args = [
+            observer.queries, observer.duration, ' (budget exceeded)' if observer.exceeded else '',
+            request.method, request.path, getattr(request, 'graphql_operation_name', None),
+            api_key.pk if api_key else None,
+        ]
+        for duration, number, sql, params in observer.get_slowest():
+            lines.append('  #%d %.3f s: %s %r')
+            args.extend([number, duration, sql, params])
+
+        logger.warning('\n'.join(lines), *args)
@@ -50,3 +50,31 @@ class SlugifyMixin:
     def save(self, *args, **kwargs):
         self.clean()
         return super().save(*args, **kwargs)
+
+    @classmethod
+    def clean_slugs(cls, instances):
+        """
+        Slugify new instances that are to be created together.
+
+        Uniqueness is checked against the database with a single query and
+        among the instances themselves. Returns a list holding, for each
+        instance, the ValidationError clean would raise or None.
+        """
+        for instance in instances:
+            instance.slug = slugify(getattr(instance, cls.slugify_field))
+
+        slugs = set(cls.objects.filter(
+            slug__in=[instance.slug for instance in instances]
+        ).values_list('slug', flat=True))
+
+        errors = []
+        for instance in instances:
+            try:
+                if instance.slug in slugs:
+                    instance.raise_validation_error(getattr(instance, cls.slugify_field))
+                slugs.add(instance.slug)
+                errors.append(None)
+            except ValidationError as e:
+                errors.append(e)
+
+        return errors
@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import deque
+from time import monotonic
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of DB-API connections shared by the threads of a process.
+
+    At most max_size connections are open at once and checkout waits up to
+    timeout seconds for one to be returned. The most recently returned idle
+    connection is reused first. With a check_interval, it is passed to
+    is_alive when it has been idle for that many seconds or more, and dead
+    connections, like the ones a database restart leaves behind, are
+    replaced transparently. Connections older than max_lifetime seconds are
+    replaced as well.
+    """
+
+    def __init__(self, connect, is_alive, max_size=10, timeout=30, check_interval=None,
+                 max_lifetime=None):
+        self.connect = connect
+        self.is_alive = is_alive
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # Idle connections as (connection, created_at, returned_at)
+        self._idle = deque()
+        # Creation times of the checked out connections by id
+        self._in_use = {}
+
+    def checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                'No database connection was returned to the pool within {} seconds.'.format(
+                    self.timeout
+                )
+            )
+
+        try:
+            connection, created_at = self._checkout_idle()
+            if connection is None:
+                connection, created_at = self.connect(), monotonic()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use[id(connection)] = created_at
+        return connection
+
+    def _checkout_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None, None
+                connection, created_at, returned_at = self._idle.pop()
+
+            now = monotonic()
+            if self.max_lifetime is not None and now - created_at >= self.max_lifetime:
+                self._discard(connection)
+            elif (self.check_interval is not None and
+                  now - returned_at >= self.check_interval and
+                  not self.is_alive(connection)):
+                self._discard(connection)
+            else:
+                return connection, created_at
+
+    def checkin(self, connection, reusable=True):
+        with self._lock:
+            created_at = self._in_use.pop(id(connection), None)
+            if reusable and created_at is not None:
+                self._idle.append((connection, created_at, monotonic()))
+                connection = None
+
+        if connection is not None:
+            self._discard(connection)
+        self._slots.release()
+
+    def close(self):
+        """Close the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+
+        for connection, created_at, returned_at in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'in_use': len(self._in_use), 'max_size': self.max_size}
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """
+    Return the pool of this process registered under key, creating it with factory.
+
+    Connections can't be shared with a parent process, so a forked process
+    gets its own pools and leaves the inherited connections alone.
+    """
+    key = (os.getpid(), key)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = factory()
+        return _pools[key]
+
+
+def close_pools():
+    """Close the idle connections of the pools of this process."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (pool_pid, key), pool in _pools.items() if pool_pid == pid]
+
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,369 @@
+"""
+Ranked search of text columns.
+
+PostgreSQL databases are searched with pg_trgm, through GIN trigram indexes
+on UPPER(column) created by trigram_index migrations. Other databases are
+searched with an NgramIndex of the column per process, built by the first
+search, updated on save and delete, and rebuilt every SEARCH_INDEX_TIMEOUT
+seconds to pick up the changes of other processes. The indexes are meant
+for the small tables of development and tests: they hold every text in the
+memory of each process, and scripts/benchmark_search.py shows them slower
+than a scan of the rows by a million rows.
+
+Both match the texts containing the search terms or at least
+SEARCH_SIMILARITY_THRESHOLD similar to them, and rank them by similarity as
+pg_trgm computes it. PostgreSQL selects similar texts with the % operator,
+so keep pg_trgm.similarity_threshold of the database at the same value.
+"""
+import heapq
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import reduce
+from operator import or_
+from time import monotonic
+
+from django.conf import settings
+from django.db import connections, migrations, transaction
+from django.db.models import (Case, CharField, FloatField, Func, Lookup, Q, TextField, Value,
+                              When)
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django_filters import CharFilter
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def get_trigrams(text):
+    """Return the trigrams of text like pg_trgm, from its lowercased words padded with spaces."""
+    trigrams = set()
+    for word in WORD.findall(text.lower()):
+        padded = '  {} '.format(word)
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def similarity(trigrams, other_trigrams):
+    shared = len(trigrams & other_trigrams)
+    total = len(trigrams) + len(other_trigrams) - shared
+    return shared / total if total else 0.0
+
+
+class NgramIndex(object):
+    """
+    Inverted index of texts by their trigrams, searched like pg_trgm.
+
+    Postings are arrays of document numbers. Replaced and removed texts
+    leave their numbers behind until they outnumber the live ones, when the
+    index is compacted.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        # Lowercased texts, trigram counts and keys by document number, None
+        # once removed, and the numbers by key
+        self._texts = []
+        self._sizes = array('I')
+        self._keys = []
+        self._numbers = {}
+        self._removed = 0
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def add(self, key, text):
+        with self._lock:
+            self._discard(key)
+            if not text:
+                return
+
+            number = len(self._texts)
+            trigrams = get_trigrams(text)
+            self._texts.append(text.lower())
+            self._sizes.append(len(trigrams))
+            self._keys.append(key)
+            self._numbers[key] = number
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, array('I')).append(number)
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+            if self._removed > max(len(self._numbers), 1000):
+                self._compact()
+
+    def _discard(self, key):
+        number = self._numbers.pop(key, None)
+        if number is not None:
+            self._texts[number] = None
+            self._keys[number] = None
+            self._removed += 1
+
+    def _compact(self):
+        documents = [
+            (key, text) for key, text in zip(self._keys, self._texts) if text is not None
+        ]
+        self._reset()
+        for key, text in documents:
+            self.add(key, text)
+
+    def search(self, query, threshold, limit=None):
+        """Return (key, similarity) pairs of the matching texts, most similar first."""
+        query_trigrams = get_trigrams(query)
+        needle = query.lower()
+
+        with self._lock:
+            texts, sizes, keys = self._texts, self._sizes, self._keys
+            size = len(query_trigrams)
+            # Texts sharing fewer trigrams than that are less similar
+            required = threshold * size - 1e-9
+            shared = self._count_shared_trigrams(query_trigrams)
+
+            results = []
+            for number, count in shared.items():
+                if count >= required and texts[number] is not None:
+                    score = count / (size + sizes[number] - count)
+                    if score >= threshold:
+                        results.append((-score, keys[number]))
+
+            for number in self._get_containing_candidates(needle):
+                text = texts[number]
+                if text is not None and needle in text:
+                    count = shared.get(number, 0)
+                    total = size + sizes[number] - count
+                    score = count / total if total else 0.0
+                    # Unless already found similar
+                    if count < required or score < threshold:
+                        results.append((-score, keys[number]))
+
+        if limit is not None:
+            results = heapq.nsmallest(limit, results)
+        else:
+            results.sort()
+        return [(key, -score) for score, key in results]
+
+    def _count_shared_trigrams(self, query_trigrams):
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._postings.get(trigram, ()))
+        return shared
+
+    def _get_containing_candidates(self, needle):
+        # Texts containing needle contain the trigrams within each of its words
+        inner_trigrams = {
+            word[i:i + 3] for word in WORD.findall(needle) for i in range(len(word) - 2)
+        }
+        if not inner_trigrams:
+            return range(len(self._texts))
+
+        return min((self._postings.get(trigram, ()) for trigram in inner_trigrams), key=len)
+
+
+_indexes = {}
+# Lists of the changes committed while an index is built, by index key
+_pending = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(model, field_name):
+    """
+    Return the NgramIndex of the field_name texts of model, building it when due.
+
+    Indexes are built outside of the lock, searches using the previous index
+    meanwhile, and the changes committed during the build are replayed into
+    the new index before it replaces the previous one.
+    """
+    key = (model._meta.label, field_name)
+    with _indexes_lock:
+        index, built_at = _indexes.get(key, (None, None))
+        if index is not None and (
+            monotonic() - built_at < settings.SEARCH_INDEX_TIMEOUT or key in _pending
+        ):
+            return index
+
+        changes = []
+        _pending.setdefault(key, []).append(changes)
+
+    dispatch_uid = 'search-{}'.format(model._meta.label)
+    post_save.connect(update_indexes, sender=model, dispatch_uid=dispatch_uid)
+    post_delete.connect(update_indexes, sender=model, dispatch_uid=dispatch_uid)
+
+    try:
+        built_at = monotonic()
+        index = NgramIndex()
+        for pk, text in model._default_manager.values_list('pk', field_name).iterator():
+            index.add(pk, text)
+    except BaseException:
+        with _indexes_lock:
+            _end_build(key, changes)
+        raise
+
+    with _indexes_lock:
+        _end_build(key, changes)
+        # None marks changes without pks, which drop the index to rebuild it
+        if None not in changes:
+            for pk, instance, deleted in changes:
+                if deleted:
+                    index.discard(pk)
+                else:
+                    index.add(pk, getattr(instance, field_name))
+            _indexes[key] = (index, built_at)
+
+    return index
+
+
+def _end_build(key, changes):
+    builds = [other for other in _pending.get(key, []) if other is not changes]
+    if builds:
+        _pending[key] = builds
+    else:
+        _pending.pop(key, None)
+
+
+def clear_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+        _pending.clear()
+
+
+def update_indexes_on_commit(model, instances, deleted=False):
+    """
+    Add instances to the indexes of model, or discard them when deleted.
+
+    Indexes are only updated once the transaction commits, so that rolled
+    back changes are never searched. Instances saved without their pk, like
+    by bulk_create on some backends, drop the indexes to rebuild them.
+    """
+    # Deleted instances lose their pk before the transaction commits
+    pks = [instance.pk for instance in instances]
+
+    def update():
+        with _indexes_lock:
+            # Indexes being built replay the changes once built
+            changes = [None] if None in pks else [
+                (pk, instance, deleted) for pk, instance in zip(pks, instances)
+            ]
+            for key, builds in _pending.items():
+                if key[0] == model._meta.label:
+                    for pending in builds:
+                        pending.extend(changes)
+
+            keys = [key for key in _indexes if key[0] == model._meta.label]
+            if None in pks:
+                for key in keys:
+                    del _indexes[key]
+                return
+            indexes = [(key[1], _indexes[key][0]) for key in keys]
+
+        for field_name, index in indexes:
+            for pk, instance in zip(pks, instances):
+                if deleted:
+                    index.discard(pk)
+                else:
+                    index.add(pk, getattr(instance, field_name))
+
+    transaction.on_commit(update)
+
+
+def update_indexes(sender, instance, **kwargs):
+    update_indexes_on_commit(sender, [instance], deleted='created' not in kwargs)
+
+
+class UpperTrigramSimilar(Lookup):
+    """UPPER(column) % UPPER(value) of pg_trgm, served by the indexes of trigram_index."""
+
+    lookup_name = 'upper_trigram_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return 'UPPER({}::text) %% UPPER({})'.format(lhs, rhs), lhs_params + rhs_params
+
+
+CharField.register_lookup(UpperTrigramSimilar)
+TextField.register_lookup(UpperTrigramSimilar)
+
+
+class TrigramSimilarity(Func):
+    function = 'SIMILARITY'
+    output_field = FloatField()
+
+
+def search(queryset, field_names, query):
+    """
+    Filter queryset by a search of query in field_names, most similar first.
+
+    The similarity is annotated as search_rank.
+    """
+    threshold = settings.SEARCH_SIMILARITY_THRESHOLD
+
+    if connections[queryset.db].vendor == 'postgresql':
+        queryset = queryset.filter(reduce(or_, [
+            Q(**{'{}__upper_trigram_similar'.format(field_name): query}) |
+            Q(**{'{}__icontains'.format(field_name): query})
+            for field_name in field_names
+        ]))
+        ranks = [TrigramSimilarity(field_name, Value(query)) for field_name in field_names]
+        rank = Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+    else:
+        scores = {}
+        for field_name in field_names:
+            index = get_index(queryset.model, field_name)
+            for pk, score in index.search(query, threshold, settings.SEARCH_MAX_RESULTS):
+                scores[pk] = max(score, scores.get(pk, 0.0))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        ranked = ranked[:settings.SEARCH_MAX_RESULTS]
+        queryset = queryset.filter(pk__in=[pk for pk, score in ranked])
+        rank = Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
+
+
+class SearchFilter(CharFilter):
+    """
+    Filter of a search in the text of field_names, ranked by similarity.
+
+    Declare it before the OrderingFilter of the FilterSet, so that an
+    explicit ordering replaces the ranking.
+    """
+
+    def __init__(self, field_names, *args, **kwargs):
+        self.field_names = field_names
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+
+        return search(qs, self.field_names, value)
+
+
+def trigram_index(table, column):
+    """Return the migration operation of a GIN trigram index on UPPER(column) for PostgreSQL."""
+    name = '{}_{}_upper_trgm'.format(table, column)
+
+    def create_index(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            quote_name = schema_editor.quote_name
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX {} ON {} USING gin (UPPER({}::text) gin_trgm_ops)'.format(
+                    quote_name(name), quote_name(table), quote_name(column)
+                )
+            )
+
+    def drop_index(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute('DROP INDEX IF EXISTS {}'.format(schema_editor.quote_name(name)))
+
+    return migrations.RunPython(create_index, drop_index)
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache import LRUCache
+
+
+class LRUCacheTest(SimpleTestCase):
+    """Test LRUCache."""
+
+    def setUp(self):
+        self.cache = LRUCache(maxsize=2, ttl=10)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(3, self.cache.get('c'))
+
+    def test_expired_entry_is_a_miss(self):
+        with mock.patch('common.cache.monotonic', return_value=0):
+            self.cache.set('a', 1)
+
+        with mock.patch('common.cache.monotonic', return_value=10):
+            self.assertIsNone(self.cache.get('a'))
+
+        self.assertEqual(0, len(self.cache))
+
+    def test_stats(self):
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+
+        self.assertEqual(
+            {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1, 'maxsize': 2},
+            self.cache.stats()
+        )
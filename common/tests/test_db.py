@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from ..db import QueryObserver
+
+
+class QueryObserverTest(TestCase):
+    """Test QueryObserver."""
+
+    def test_queries_and_rows_are_counted(self):
+        User.objects.create(username='ade')
+        User.objects.create(username='bola')
+
+        with QueryObserver() as observer:
+            list(User.objects.all())
+            User.objects.filter(username='ade').exists()
+
+        self.assertEqual(2, observer.queries)
+        self.assertEqual(3, observer.rows)
+        self.assertGreater(observer.duration, 0)
+
+    def test_cursors_are_only_observed_while_entered(self):
+        with QueryObserver('default') as observer:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT %s', [1])
+                cursor.execute('SELECT 1 UNION SELECT 2')
+                self.assertEqual([(1,), (2,)], list(cursor))
+
+        User.objects.count()
+        self.assertEqual(2, observer.queries)
+        self.assertEqual(2, observer.rows)
+        self.assertEqual([], connection.query_observers)
+
+    def test_nested_observers(self):
+        with QueryObserver() as outer:
+            User.objects.count()
+            with QueryObserver() as inner:
+                User.objects.count()
+
+        self.assertEqual(2, outer.queries)
+        self.assertEqual(1, inner.queries)
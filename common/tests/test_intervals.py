@@ -0,0 +1,61 @@
+import random
+
+from django.test import TestCase
+
+from ..intervals import IntervalSet, IntervalTree
+
+
+class IntervalTreeTest(TestCase):
+    """Test the IntervalTree."""
+
+    def test_at(self):
+        tree = IntervalTree([(1, 5, 'a'), (3, 8, 'b'), (8, 9, 'c'), (12, 12, 'd')])
+
+        self.assertEqual([], tree.at(0))
+        self.assertEqual(['a'], tree.at(1))
+        self.assertEqual(['a', 'b'], sorted(tree.at(5)))
+        self.assertEqual(['b', 'c'], sorted(tree.at(8)))
+        self.assertEqual([], tree.at(10))
+        self.assertEqual(['d'], tree.at(12))
+        self.assertEqual(4, len(tree))
+
+    def test_at_matches_a_linear_scan(self):
+        rng = random.Random(0)
+        intervals = []
+        for value in range(500):
+            start = rng.randint(0, 1000)
+            intervals.append((start, start + rng.randint(0, 100), value))
+        tree = IntervalTree(intervals)
+
+        for point in range(-10, 1110):
+            self.assertEqual(
+                sorted(value for start, end, value in intervals if start <= point <= end),
+                sorted(tree.at(point))
+            )
+
+    def test_empty_tree(self):
+        self.assertEqual([], IntervalTree([]).at(1))
+
+
+class IntervalSetTest(TestCase):
+    """Test the IntervalSet."""
+
+    def setUp(self):
+        self.intervals = IntervalSet([(10, 12), (1, 3), (2, 5), (20, 20), (5, 6)])
+
+    def test_intervals_are_merged(self):
+        self.assertEqual([1, 10, 20], self.intervals.starts)
+        self.assertEqual([6, 12, 20], self.intervals.ends)
+        self.assertEqual(3, len(self.intervals))
+
+    def test_contains(self):
+        self.assertEqual(
+            [1, 2, 3, 4, 5, 6, 10, 11, 12, 20],
+            [point for point in range(25) if point in self.intervals]
+        )
+
+    def test_overlapping(self):
+        self.assertEqual([(4, 6), (10, 11)], self.intervals.overlapping(4, 11))
+        self.assertEqual([], self.intervals.overlapping(7, 9))
+        self.assertEqual([(20, 20)], self.intervals.overlapping(13, 30))
+        self.assertEqual([], IntervalSet([]).overlapping(1, 2))
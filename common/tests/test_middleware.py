@@ -0,0 +1,117 @@
+import json
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from ..middleware import GraphqlResponseFlattenerMiddleware, QueryBudgetMiddleware
+
+
+class GraphqlResponseFlattenerMiddlewareTest(SimpleTestCase):
+    """Test GraphqlResponseFlattenerMiddleware."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = GraphqlResponseFlattenerMiddleware(lambda request: HttpResponse())
+
+    def test_only_graphql_json_requests_are_flattened(self):
+        request = self.factory.get('/api')
+        self.middleware(request)
+        self.assertTrue(request.flatten_graphql_response)
+
+        request = self.factory.get('/gh', HTTP_ACCEPT='text/html')
+        self.middleware(request)
+        self.assertFalse(request.flatten_graphql_response)
+
+        request = self.factory.get('/timetables/')
+        self.middleware(request)
+        self.assertFalse(request.flatten_graphql_response)
+
+    def test_flatten_connection(self):
+        content = {'data': {'dishes': {'edges': [
+            {'node': {'name': 'Apples'}},
+            {'node': {'name': 'Bread and Egg'}},
+        ]}}}
+
+        self.assertEqual(
+            {'dishes': [{'name': 'Apples'}, {'name': 'Bread and Egg'}]},
+            GraphqlResponseFlattenerMiddleware.flatten(content)
+        )
+
+    def test_flatten_mutation_with_errors(self):
+        content = {
+            'data': {'createDish': {'dish': None, 'errors': ['name', 'required']}},
+            'errors': [{'message': 'Some error'}],
+        }
+
+        self.assertEqual(
+            {'dish': None, 'errors': ['name', 'required'], 'error': 'Some error'},
+            GraphqlResponseFlattenerMiddleware.flatten(content)
+        )
+
+    def test_flatten_keeps_extensions(self):
+        content = {
+            'data': {'dish': {'name': 'Apples'}},
+            'extensions': {'cost': {'requestedQueryCost': 1}},
+        }
+
+        self.assertEqual(
+            {'dish': {'name': 'Apples'}, 'extensions': {'cost': {'requestedQueryCost': 1}}},
+            GraphqlResponseFlattenerMiddleware.flatten(content)
+        )
+
+    def test_introspection_and_invalid_queries_are_not_flattened(self):
+        content = {'data': {'__schema': {'types': []}}}
+        self.assertEqual(content, GraphqlResponseFlattenerMiddleware.flatten(content))
+
+        content = {'errors': [{'message': 'Syntax Error'}]}
+        self.assertEqual(content, GraphqlResponseFlattenerMiddleware.flatten(content))
+
+
+@override_settings(QUERY_BUDGET_LOG_QUERIES=2, QUERY_BUDGET_SLOWEST=2)
+class QueryBudgetMiddlewareTest(TestCase):
+    """Test QueryBudgetMiddleware."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_response(self, request):
+        for username in self.usernames:
+            User.objects.filter(username=username).exists()
+
+        return HttpResponse()
+
+    def run_middleware(self, *usernames):
+        self.usernames = usernames
+        request = self.factory.get('/api')
+        request.graphql_operation_name = 'Users'
+        middleware = QueryBudgetMiddleware(self.get_response)
+        response = middleware(request)
+        return response
+
+    def test_requests_under_the_thresholds_are_not_logged(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('common.middleware'):
+                self.run_middleware('ade', 'bola')
+
+    def test_requests_over_the_thresholds_are_logged(self):
+        with self.assertLogs('common.middleware', 'WARNING') as logs:
+            response = self.run_middleware('ade', 'bola', 'chidi')
+
+        self.assertEqual(200, response.status_code)
+        lines = logs.records[0].getMessage().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertIn('3 SQL queries', lines[0])
+        self.assertIn('GET /api, operation Users, api key None', lines[0])
+        self.assertIn('auth_user', lines[1])
+
+    @override_settings(QUERY_BUDGET_ENFORCED=True, QUERY_BUDGET_MAX_QUERIES=2)
+    def test_requests_over_the_budget_are_aborted(self):
+        with self.assertLogs('common.middleware', 'WARNING') as logs:
+            response = self.run_middleware('ade', 'bola', 'chidi', 'dayo')
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual({'message': 'The request exceeded its query budget.'},
+                         json.loads(response.content.decode()))
+        self.assertIn('2 SQL queries', logs.output[0])
+        self.assertIn('budget exceeded', logs.output[0])
@@ -0,0 +1,185 @@
+import os
+import threading
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.db.postgresql_pool import base
+from ..pool import ConnectionPool, PoolTimeout, get_pool
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Test the ConnectionPool."""
+
+    def setUp(self):
+        self.connections = []
+        self.pool = ConnectionPool(
+            connect=self.connect,
+            is_alive=lambda connection: not connection.closed,
+            max_size=2,
+            timeout=0.01,
+            check_interval=0
+        )
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_connections_are_reused(self):
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+
+        self.assertIs(connection, self.pool.checkout())
+        self.assertEqual(1, len(self.connections))
+
+    def test_number_of_connections_is_bounded(self):
+        connection = self.pool.checkout()
+        self.pool.checkout()
+        self.assertRaises(PoolTimeout, self.pool.checkout)
+
+        threading.Timer(0.05, self.pool.checkin, [connection]).start()
+        self.pool.timeout = 5
+        self.assertIs(connection, self.pool.checkout())
+        self.assertEqual(2, len(self.connections))
+
+    def test_dead_connections_are_replaced(self):
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+        connection.closed = True
+
+        self.assertIsNot(connection, self.pool.checkout())
+        self.assertEqual({'idle': 0, 'in_use': 1, 'max_size': 2}, self.pool.stats())
+
+    def test_liveness_is_checked_after_check_interval(self):
+        self.pool.check_interval = 60
+        self.pool.is_alive = mock.Mock(return_value=True)
+        self.pool.checkin(self.pool.checkout())
+
+        self.pool.checkout()
+        self.pool.is_alive.assert_not_called()
+
+    def test_liveness_is_not_checked_without_check_interval(self):
+        self.pool.check_interval = None
+        self.pool.is_alive = mock.Mock(return_value=False)
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+
+        self.assertIs(connection, self.pool.checkout())
+        self.pool.is_alive.assert_not_called()
+
+    def test_old_connections_are_replaced(self):
+        self.pool.max_lifetime = 0
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+
+        self.assertIsNot(connection, self.pool.checkout())
+        self.assertTrue(connection.closed)
+
+    def test_unusable_connections_are_discarded(self):
+        connection = self.pool.checkout()
+        self.pool.checkin(connection, reusable=False)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(connection, self.pool.checkout())
+
+    def test_failed_connects_release_their_slot(self):
+        self.pool.connect = mock.Mock(side_effect=OSError)
+        for _ in range(3):
+            self.assertRaises(OSError, self.pool.checkout)
+
+        self.assertEqual({'idle': 0, 'in_use': 0, 'max_size': 2}, self.pool.stats())
+
+    def test_close(self):
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+        self.pool.close()
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(0, self.pool.stats()['idle'])
+
+    def test_get_pool_is_per_process(self):
+        pool = get_pool('test', lambda: self.pool)
+        self.assertIs(pool, get_pool('test', mock.Mock()))
+
+        with mock.patch('common.pool.os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(pool, get_pool('test', mock.Mock()))
+
+
+class PooledDatabaseWrapperTest(SimpleTestCase):
+    """Test the pooled PostgreSQL backend, on fake psycopg2 connections."""
+
+    def setUp(self):
+        self.connections = []
+        patcher = mock.patch.object(base.Database, 'connect', side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # A database of its own, for a pool of its own
+        self.wrapper = ConnectionHandler({'default': {}, 'pooled': {
+            'ENGINE': 'core.db.postgresql_pool',
+            'NAME': self.id(),
+            'POOL': {'MAX_SIZE': 2},
+        }})['pooled']
+
+    def connect(self, **conn_params):
+        connection = mock.MagicMock(closed=0, autocommit=True)
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+        self.connections.append(connection)
+        return connection
+
+    def checkout(self):
+        self.wrapper.ensure_connection()
+        return self.wrapper.connection
+
+    def test_connections_are_checked_in_and_out(self):
+        connection = self.checkout()
+        self.assertEqual({'idle': 0, 'in_use': 1, 'max_size': 2}, self.wrapper.pool.stats())
+
+        self.wrapper.close()
+        self.assertEqual({'idle': 1, 'in_use': 0, 'max_size': 2}, self.wrapper.pool.stats())
+        self.assertIsNone(self.wrapper.connection)
+
+        self.assertIs(connection, self.checkout())
+        self.assertEqual(1, len(self.connections))
+        connection.close.assert_not_called()
+
+    def test_transactions_are_rolled_back_on_checkin(self):
+        connection = self.checkout()
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+        self.wrapper.close()
+
+        connection.rollback.assert_called_once_with()
+        self.assertIs(connection, self.checkout())
+
+    def test_broken_connections_are_discarded(self):
+        connection = self.checkout()
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INERROR
+        connection.rollback.side_effect = base.Database.OperationalError
+
+        self.wrapper.close()
+
+        connection.close.assert_called_once_with()
+        self.assertIsNot(connection, self.checkout())
+        self.assertEqual(2, len(self.connections))
+
+    def test_connections_are_discarded_after_errors(self):
+        connection = self.checkout()
+        self.wrapper.errors_occurred = True
+
+        self.wrapper.close()
+
+        connection.close.assert_called_once_with()
+        self.assertEqual({'idle': 0, 'in_use': 0, 'max_size': 2}, self.wrapper.pool.stats())
@@ -0,0 +1,185 @@
+import random
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from ..search import (NgramIndex, clear_indexes, get_index, get_trigrams, search, similarity,
+                      update_indexes_on_commit)
+
+
+class TrigramTest(SimpleTestCase):
+    """Test the trigrams and similarity, as computed by pg_trgm."""
+
+    def test_trigrams(self):
+        self.assertEqual({'  c', ' ca', 'cat', 'at '}, get_trigrams('Cat'))
+        self.assertEqual({'  a', ' a ', '  b', ' b '}, get_trigrams('a-b_'))
+
+    def test_similarity(self):
+        self.assertAlmostEqual(
+            0.363636, similarity(get_trigrams('word'), get_trigrams('two words')), places=6
+        )
+        self.assertEqual(0.0, similarity(set(), set()))
+
+
+class NgramIndexTest(SimpleTestCase):
+    """Test NgramIndex."""
+
+    texts = ['Jollof Rice', 'Fried rice', 'Rice and Beans', 'Moi-moi', 'Pounded Yam',
+             'Yam Porridge', 'Riced Cauliflower']
+
+    def setUp(self):
+        self.index = NgramIndex()
+        for key, text in enumerate(self.texts):
+            self.index.add(key, text)
+
+    def test_search_ranks_by_similarity(self):
+        results = self.index.search('rice', 0.3)
+
+        self.assertEqual(
+            ['Fried rice', 'Jollof Rice', 'Rice and Beans', 'Riced Cauliflower'],
+            [self.texts[key] for key, score in results]
+        )
+        self.assertEqual(sorted(score for key, score in results)[::-1],
+                         [score for key, score in results])
+
+    def test_search_finds_substrings_of_words(self):
+        self.assertEqual({0, 1, 2, 5, 6}, {key for key, score in self.index.search('ri', 0.3)})
+        self.assertEqual({1}, {key for key, score in self.index.search('ied ri', 0.3)})
+        self.assertEqual({4}, {key for key, score in self.index.search('ounde', 0.9)})
+
+    def test_search_finds_similar_texts(self):
+        self.assertEqual([4], [key for key, score in self.index.search('pounded yams', 0.5)])
+        self.assertEqual([], self.index.search('pounded yams', 0.8))
+
+    def test_search_limit(self):
+        self.assertEqual(2, len(self.index.search('rice', 0.3, limit=2)))
+
+    def test_replaced_and_discarded_texts(self):
+        self.index.add(0, 'Ofada stew')
+        self.index.discard(1)
+        self.index.discard(10)
+
+        self.assertEqual({2, 6}, {key for key, score in self.index.search('rice', 0.3)})
+        self.assertEqual([0], [key for key, score in self.index.search('ofada', 0.3)])
+        self.assertEqual(6, len(self.index))
+
+    def test_compaction(self):
+        for i in range(1100):
+            self.index.add('extra', 'Rice {}'.format(i))
+        self.index.discard('extra')
+
+        self.assertEqual(0, self.index._removed)
+        self.assertEqual(7, len(self.index._texts))
+        self.assertEqual(4, len(self.index.search('rice', 0.3)))
+
+    def test_search_matches_scanning_every_text(self):
+        words = ['rice', 'beans', 'yam', 'stew', 'fried', 'jollof', 'egusi', 'ofada', 'moi']
+        generator = random.Random(1)
+        texts = [' '.join(generator.sample(words, generator.randint(1, 4))) for _ in range(300)]
+        index = NgramIndex()
+        for key, text in enumerate(texts):
+            index.add(key, text)
+
+        for query in ['rice', 'ice st', 'yams', 'jollof rice stew', 'eg', 'fried beans', 'mo']:
+            query_trigrams = get_trigrams(query)
+            expected = {
+                key for key, text in enumerate(texts)
+                if query in text or similarity(query_trigrams, get_trigrams(text)) >= 0.4
+            }
+            self.assertEqual(expected, {key for key, score in index.search(query, 0.4)}, query)
+
+
+class SearchTest(TestCase):
+    """Test search of querysets with NgramIndexes."""
+
+    def setUp(self):
+        clear_indexes()
+        for username in ['adaeze', 'adamu', 'bola', 'obiageli']:
+            User.objects.create(username=username)
+
+    def search(self, query):
+        return [user.username for user in search(User.objects.all(), ['username'], query)]
+
+    def test_search_ranks_results(self):
+        users = search(User.objects.all(), ['username'], 'ada')
+
+        self.assertEqual(['adamu', 'adaeze'], [user.username for user in users])
+        self.assertGreater(users[0].search_rank, users[1].search_rank)
+
+    def test_index_is_rebuilt_when_due(self):
+        self.search('bola')
+        index = get_index(User, 'username')
+
+        with self.settings(SEARCH_INDEX_TIMEOUT=0):
+            self.assertIsNot(index, get_index(User, 'username'))
+
+        with mock.patch('common.search.monotonic', return_value=0):
+            self.assertIs(get_index(User, 'username'), get_index(User, 'username'))
+
+
+class SearchIndexUpdateTest(TransactionTestCase):
+    """Test the updates of the NgramIndexes on committed changes."""
+
+    def setUp(self):
+        clear_indexes()
+        for username in ['adamu', 'bola']:
+            User.objects.create(username=username)
+
+    def search(self, query):
+        return [user.username for user in search(User.objects.all(), ['username'], query)]
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(['bola'], self.search('bola'))
+
+        User.objects.create(username='bolaji')
+        User.objects.filter(username='bola').get().delete()
+        user = User.objects.get(username='adamu')
+        user.username = 'abolade'
+        user.save()
+
+        self.assertEqual(['bolaji', 'abolade'], self.search('bola'))
+
+    def test_rolled_back_saves_are_not_indexed(self):
+        self.search('bola')
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                User.objects.create(username='bolaji')
+                raise RuntimeError
+
+        self.assertEqual(['bola'], self.search('bola'))
+
+    def test_bulk_created_instances_are_indexed(self):
+        self.search('bola')
+        index = get_index(User, 'username')
+
+        users = [User(username='bolaji'), User(username='abolade')]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            update_indexes_on_commit(User, users)
+
+        # SQLite returns no pks from bulk inserts, so the index is rebuilt
+        self.assertEqual(['bola', 'bolaji', 'abolade'], self.search('bola'))
+        self.assertIsNot(index, get_index(User, 'username'))
+
+    def test_changes_committed_during_a_rebuild_are_indexed(self):
+        self.search('bola')
+        index = get_index(User, 'username')
+        concurrent_user = User(pk=1000, username='bolaji')
+
+        class ConcurrentNgramIndex(NgramIndex):
+            def __init__(self):
+                super().__init__()
+                # Searches keep the previous index without waiting for the build
+                self.previous = get_index(User, 'username')
+                update_indexes_on_commit(User, [concurrent_user])
+
+        with self.settings(SEARCH_INDEX_TIMEOUT=0):
+            with mock.patch('common.search.NgramIndex', ConcurrentNgramIndex):
+                rebuilt = get_index(User, 'username')
+
+        self.assertIs(index, rebuilt.previous)
+        self.assertEqual({1000}, {pk for pk, score in rebuilt.search('bolaji', 0.9)})
+        self.assertIs(rebuilt, get_index(User, 'username'))
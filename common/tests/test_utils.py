@@ -1,6 +1,21 @@
-from django.test import TestCase
+import multiprocessing
+import os
+from unittest import mock
 
-from ..utils import timestamp_seconds
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from ..utils import IdGenerator, generate_id, id_generator, timestamp_seconds
+
+
+def generate_ids(count):
+    return id_generator.generate(count)
+
+
+def set_worker_id(worker_ids):
+    with worker_ids.get_lock():
+        worker_ids.value += 1
+        os.environ['ID_GENERATOR_WORKER_ID'] = str(worker_ids.value)
 
 
 class UtilsTest(TestCase):
@@ -11,3 +26,79 @@ class UtilsTest(TestCase):
         [timestamps.add(timestamp_seconds()) for _ in range(5)]
 
         self.assertEqual(5, len(timestamps))
+
+    def test_generate_id(self):
+        ids = [generate_id() for _ in range(5)]
+
+        self.assertEqual(sorted(set(ids)), ids)
+        self.assertLess(max(ids), 2 ** 63)
+
+    def test_generate_batch_ids(self):
+        ids = id_generator.generate(10000)
+
+        self.assertEqual(10000, len(set(ids)))
+        self.assertEqual(sorted(ids), ids)
+
+    def test_ids_of_different_workers_never_collide(self):
+        generators = [IdGenerator(worker_id=worker_id) for worker_id in range(3)]
+
+        with mock.patch('common.utils.time', return_value=1500000000):
+            ids = [generator.generate(5000) for generator in generators]
+
+        self.assertEqual(15000, len(set().union(*ids)))
+
+    def test_clock_going_backwards(self):
+        generator = IdGenerator(worker_id=1)
+
+        with mock.patch('common.utils.time', return_value=1500000000):
+            first_id = generator.generate()[0]
+        with mock.patch('common.utils.time', return_value=1499999999):
+            second_id = generator.generate()[0]
+
+        self.assertGreater(second_id, first_id)
+
+    def test_generate_ids_in_many_processes(self):
+        generate_id()
+        ctx = multiprocessing.get_context('fork')
+        worker_ids = ctx.Value('i', 0)
+        with ctx.Pool(8, initializer=set_worker_id, initargs=(worker_ids,)) as pool:
+            batches = pool.map(generate_ids, [1000] * 32)
+
+        ids = [id_ for batch in batches for id_ in batch]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_forked_processes_need_their_own_worker_id(self):
+        generate_id()
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(1) as pool:
+            self.assertRaises(ImproperlyConfigured, pool.map, generate_ids, [1])
+
+    @override_settings(ID_GENERATOR_WORKER_ID=None)
+    def test_worker_id_is_required(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('ID_GENERATOR_WORKER_ID', None)
+            self.assertRaises(ImproperlyConfigured, IdGenerator().generate)
+
+            os.environ['ID_GENERATOR_WORKER_ID'] = '1024'
+            self.assertRaises(ImproperlyConfigured, IdGenerator().generate)
+
+            os.environ['ID_GENERATOR_WORKER_ID'] = '5'
+            generator = IdGenerator()
+            generator.generate()
+            self.assertEqual(5, generator.worker_id)
+
+    def test_web_worker_ids_stay_below_those_of_other_processes(self):
+        from core import gunicorn_conf
+
+        with mock.patch.dict(os.environ, {'DYNO': 'web.2', 'ID_GENERATOR_WORKER_ID_OFFSET': ''}):
+            os.environ.pop('ID_GENERATOR_WORKER_ID_OFFSET')
+            with mock.patch.object(gunicorn_conf, 'workers', 4):
+                self.assertEqual(5, gunicorn_conf.get_worker_id(1))
+
+        with mock.patch.dict(os.environ, {'DYNO': 'run.1234', 'ID_GENERATOR_WORKER_ID_OFFSET': ''}):
+            os.environ.pop('ID_GENERATOR_WORKER_ID_OFFSET')
+            self.assertRaises(RuntimeError, gunicorn_conf.get_worker_id, 0)
+
+        with mock.patch.dict(os.environ, {'ID_GENERATOR_WORKER_ID_OFFSET': '998'}):
+            self.assertEqual(999, gunicorn_conf.get_worker_id(1))
+            self.assertRaises(RuntimeError, gunicorn_conf.get_worker_id, 2)
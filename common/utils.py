@@ -1,12 +1,110 @@
+import os
+import threading
 from time import time
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
 LAST_TIMESTAMP = 0
 
 
 def timestamp_seconds():
+    # Kept for the migrations that reference it, use generate_id instead
     global LAST_TIMESTAMP
 
     timestamp = int(time())
     LAST_TIMESTAMP = (LAST_TIMESTAMP + 1) if timestamp <= LAST_TIMESTAMP else timestamp
 
     return LAST_TIMESTAMP
+
+
+class IdGenerator(object):
+    """
+    Generate unique 63-bit ids without coordination between processes.
+
+    Like Twitter's Snowflake ids, an id is made of the milliseconds elapsed
+    since EPOCH, the id of the worker process and a sequence number within
+    the millisecond. Ids generated by workers with different worker ids can
+    never collide, and ids of a worker are strictly increasing.
+
+    The worker id is read from the ID_GENERATOR_WORKER_ID environment
+    variable, set for each worker by core/gunicorn_conf.py, or else from the
+    ID_GENERATOR_WORKER_ID setting. It must differ between processes sharing
+    a database, so generating ids without one, or in a process forked from
+    one that generated ids and left with its worker id, raises
+    ImproperlyConfigured rather than risking duplicate ids.
+    """
+
+    EPOCH = 1483228800000  # 2017-01-01T00:00:00Z in milliseconds
+    WORKER_ID_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+    def __init__(self, worker_id=None):
+        self._worker_id = worker_id
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset(self):
+        worker_id = self._worker_id
+        if worker_id is None:
+            worker_id = os.environ.get(
+                'ID_GENERATOR_WORKER_ID', getattr(settings, 'ID_GENERATOR_WORKER_ID', None)
+            )
+        if worker_id is None:
+            raise ImproperlyConfigured(
+                'Set ID_GENERATOR_WORKER_ID to a worker id no other process sharing the '
+                'database uses.'
+            )
+
+        worker_id = int(worker_id)
+        if not 0 <= worker_id <= self.MAX_WORKER_ID:
+            raise ImproperlyConfigured(
+                'ID_GENERATOR_WORKER_ID must be between 0 and {}.'.format(self.MAX_WORKER_ID)
+            )
+        if self._pid is not None and worker_id == self.worker_id:
+            raise ImproperlyConfigured(
+                'Set an ID_GENERATOR_WORKER_ID of its own in each forked process.'
+            )
+
+        self.worker_id = worker_id
+        self.last_timestamp = 0
+        self.sequence = 0
+        self._pid = os.getpid()
+
+    def generate(self, count=1):
+        """Return a list of count new ids."""
+        ids = []
+        with self._lock:
+            # Forked processes must not continue the sequence of their parent
+            if self._pid != os.getpid():
+                self._reset()
+
+            now = int(time() * 1000) - self.EPOCH
+            for _ in range(count):
+                # When the clock goes backwards or a millisecond's sequence is
+                # exhausted, keep counting on the last used millisecond
+                if now > self.last_timestamp:
+                    self.last_timestamp = now
+                    self.sequence = 0
+                elif self.sequence < self.MAX_SEQUENCE:
+                    self.sequence += 1
+                else:
+                    self.last_timestamp += 1
+                    self.sequence = 0
+
+                ids.append(
+                    (self.last_timestamp << (self.WORKER_ID_BITS + self.SEQUENCE_BITS)) |
+                    (self.worker_id << self.SEQUENCE_BITS) |
+                    self.sequence
+                )
+
+        return ids
+
+
+id_generator = IdGenerator()
+
+
+def generate_id():
+    return id_generator.generate()[0]
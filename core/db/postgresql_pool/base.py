@@ -0,0 +1,121 @@
+"""
+PostgreSQL database backend checking connections out of a per-process pool.
+
+Django closes connections at the end of every request when CONN_MAX_AGE is
+0; this backend returns them to the pool instead, so that requests don't pay
+for connection setup. The pool is configured by the POOL dict of the
+database settings:
+
+    MAX_SIZE        Connections open at once per process, 10 by default.
+    TIMEOUT         Seconds to wait for a connection when all are in use.
+    CHECK_INTERVAL  Idle connections are checked with SELECT 1 on checkout
+                    once idle for that many seconds, never by default.
+                    Connections broken during a request are discarded when
+                    it ends regardless.
+    MAX_LIFETIME    Seconds after which connections are replaced.
+    SESSION         Server parameters SET once on every new connection.
+"""
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions, sql
+
+from common.pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+Database = base.Database
+
+
+def connect(conn_params, session):
+    connection = Database.connect(**conn_params)
+
+    if session:
+        with connection.cursor() as cursor:
+            for name, value in sorted(session.items()):
+                cursor.execute(sql.SQL('SET {} = %s').format(sql.Identifier(name)), [value])
+        connection.commit()
+
+    return connection
+
+
+def is_alive(connection):
+    if connection.closed:
+        return False
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except Database.Error:
+        return False
+
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        key = (self.alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+
+        return get_pool(key, lambda: ConnectionPool(
+            connect=lambda: connect(conn_params, options.get('SESSION')),
+            is_alive=is_alive,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 30),
+            check_interval=options.get('CHECK_INTERVAL'),
+            max_lifetime=options.get('MAX_LIFETIME')
+        ))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        try:
+            connection = self.pool.checkout()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e))
+
+        # Same as the postgresql backend, on a connection that may be reused
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        with self.wrap_database_errors:
+            self.pool.checkin(self.connection, reusable=self.is_reusable())
+
+    def is_reusable(self):
+        # Connections closed in a transaction stay referenced by Django until
+        # the atomic block exits, and may be broken after errors.
+        if self.in_atomic_block or self.errors_occurred or self.connection.closed:
+            return False
+
+        status = self.connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                self.connection.rollback()
+                return True
+            except Database.Error:
+                pass
+
+        return False
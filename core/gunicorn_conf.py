@@ -0,0 +1,86 @@
+"""
+Gunicorn configuration of the web process, see the Procfile.
+
+Workers are gthread workers by default, so that a slow request only holds
+one of a worker's threads. GUNICORN_WORKER_CLASS=gevent runs gevent workers
+instead, which needs the gevent and psycogreen packages installed. The app
+and the GraphQL schema are loaded once in the master before forking, and
+workers are recycled after a jittered number of requests.
+
+Keep DB_POOL_MAX_SIZE at least GUNICORN_THREADS for gthread workers, as
+each thread may hold a database connection.
+"""
+
+import multiprocessing
+import os
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', '8000'))
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers to bound the growth of their memory and in-process caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+preload_app = True
+
+errorlog = '-'
+
+
+def get_worker_id_offset():
+    # Heroku names dynos like web.1, give each dyno its own range of ids
+    dyno = os.environ.get('DYNO', '')
+    dyno_number = int(dyno.rpartition('.')[2]) - 1 if dyno.rpartition('.')[2].isdigit() else 0
+    return int(os.environ.get('ID_GENERATOR_WORKER_ID_OFFSET', dyno_number * workers))
+
+
+def get_worker_id(slot):
+    # Ids from 1000 up are left to other processes, see core/settings/production.py
+    worker_id = get_worker_id_offset() + slot
+    if not 0 <= worker_id < 1000:
+        raise RuntimeError(
+            'Worker slot {} of dyno {} would get worker id {}, outside of 0 to 999. Set '
+            'ID_GENERATOR_WORKER_ID_OFFSET to give each web dyno its own range of ids.'.format(
+                slot, os.environ.get('DYNO', ''), worker_id
+            )
+        )
+    return worker_id
+
+
+def when_ready(server):
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from common.pool import close_pools
+
+    # Import core.urls, and core.schema with it, before forking the workers
+    get_resolver().url_patterns
+
+    # Refuse to start rather than generate ids with out of range worker ids
+    get_worker_id(workers - 1)
+
+    # Workers must not share connections opened while loading the app
+    connections.close_all()
+    close_pools()
+
+
+def pre_fork(server, worker):
+    # Give each worker the lowest id slot no live worker uses
+    used_slots = {getattr(other, 'id_slot', None) for other in server.WORKERS.values()}
+    worker.id_slot = next(slot for slot in range(1024) if slot not in used_slots)
+
+
+def post_fork(server, worker):
+    # Workers sharing a database must generate ids with distinct worker ids
+    os.environ['ID_GENERATOR_WORKER_ID'] = str(get_worker_id(worker.id_slot))
+
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
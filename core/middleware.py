@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 import pytz
 
+from django.conf import settings
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
@@ -7,6 +10,19 @@ from ipware.ip import get_real_ip
 from geolite2 import geolite2
 
 
+@lru_cache(maxsize=settings.TIMEZONE_CACHE_SIZE)
+def get_ip_time_zone(ip):
+    # The memory-mapped database is opened once per process and kept open
+    ip_details = geolite2.reader().get(ip)
+    if ip_details:
+        return ip_details.get('location', {}).get('time_zone')
+
+
+@lru_cache(maxsize=1024)
+def get_time_zone(name):
+    return pytz.timezone(name)
+
+
 class TimezoneMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
@@ -15,12 +31,9 @@ class TimezoneMiddleware(MiddlewareMixin):
             if not user_time_zone:
                 user_ip = get_real_ip(request)
                 if user_ip:
-                    reader = geolite2.reader()
-                    ip_details = reader.get(user_ip)
-                    user_time_zone = ip_details['location']['time_zone']
-                    geolite2.close()
+                    user_time_zone = get_ip_time_zone(user_ip)
                     if user_time_zone:
                         request.session['user_time_zone'] = user_time_zone
-            timezone.activate(pytz.timezone(user_time_zone))
+            timezone.activate(get_time_zone(user_time_zone))
         except:
             timezone.deactivate()
@@ -55,6 +55,7 @@ INSTALLED_APPS = PREREQ_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'common.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -97,6 +98,39 @@ DATABASES = {
     }
 }
 
+# Connection pool of the PostgreSQL profiles, see core/db/postgresql_pool.
+# Connections idle for CHECK_INTERVAL seconds are checked before reuse, so
+# that most checkouts cost no round trip.
+DATABASE_POOL = {
+    'MAX_SIZE': int(dotenv.get('DB_POOL_MAX_SIZE', 10)),
+    'TIMEOUT': 30,
+    'CHECK_INTERVAL': 30,
+    'MAX_LIFETIME': 3600,
+    'SESSION': {
+        'statement_timeout': dotenv.get('DB_STATEMENT_TIMEOUT', '30s'),
+    },
+}
+
+# Caches
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Set the backend to django.core.cache.backends.filebased.FileBasedCache
+    # and the location to a directory to share servings between processes
+    'servings': {
+        'BACKEND': dotenv.get(
+            'SERVINGS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': dotenv.get('SERVINGS_CACHE_LOCATION', 'servings'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -159,3 +193,88 @@ SUIT_CONFIG = {
 HASHID_FIELD_SALT = dotenv.get('HASHID_FIELD_SALT')
 DEBUG = dotenv.get('DEBUG')
 WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Worker id of the ids generated by the processes not started by
+# core/gunicorn_conf.py, which sets their ID_GENERATOR_WORKER_ID environment
+# variable. Each process sharing the database, like management commands run
+# next to the web workers, must be given an id of its own in the
+# ID_GENERATOR_WORKER_ID environment variable.
+ID_GENERATOR_WORKER_ID = None
+
+# Number of days the build_schedule command precomputes by default
+SCHEDULE_HORIZON_DAYS = 28
+
+# Longest range of dates the schedule query accepts
+SCHEDULE_QUERY_MAX_DAYS = 3660
+
+# In-process cache of validated api keys. Processes other than the one
+# revoking a key accept it for up to API_KEY_CACHE_TIMEOUT seconds, unless
+# API_KEY_VERSION_CACHE is the alias of a memcached or redis cache, in which
+# the versions of the tokens are checked on every request.
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TIMEOUT = 10
+API_KEY_VERSION_CACHE = None
+
+# In-process cache of vendor tenures by timetable
+TENURE_CACHE_SIZE = 256
+TENURE_CACHE_TIMEOUT = 60
+
+# In-process cache of no-meal dates by timetable
+BLACKOUT_CACHE_SIZE = 256
+BLACKOUT_CACHE_TIMEOUT = 300
+
+# Cache alias and seconds for which the servings query is cached
+SERVINGS_CACHE = 'servings'
+SERVINGS_CACHE_TIMEOUT = 300
+
+# Most reviews created by one createReviews mutation or upload
+REVIEW_UPLOAD_MAX_ROWS = 1000
+
+# Search of the search filter argument, see common/search.py
+SEARCH_SIMILARITY_THRESHOLD = 0.3
+SEARCH_MAX_RESULTS = 500
+SEARCH_INDEX_TIMEOUT = 300
+
+# Number of parsed and validated GraphQL documents kept in memory
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+
+# Cost limits of GraphQL operations, see app/api/cost.py. Api keys may have
+# their own limits. The budget is counted in the GRAPHQL_COST_CACHE cache.
+# Each process counts in its own local-memory cache, and spends its share of
+# the budget between the GRAPHQL_COST_PROCESSES processes serving the API,
+# the workers of a dyno by default, which should count those of every dyno.
+# Memcached or redis count the whole budget across processes, atomically,
+# the database cache can't.
+GRAPHQL_MAX_QUERY_COST = 25000
+GRAPHQL_MAX_QUERY_DEPTH = 10
+GRAPHQL_COST_LIST_SIZE = 100
+GRAPHQL_COST_BUDGET = 250000
+GRAPHQL_COST_WINDOW = 60
+GRAPHQL_COST_CACHE = 'default'
+GRAPHQL_COST_PROCESSES = int(dotenv.get(
+    'GRAPHQL_COST_PROCESSES', dotenv.get('WEB_CONCURRENCY', 1)
+))
+
+# Trace the resolvers of every GraphQL operation into the summary of the
+# last GRAPHQL_TRACING_WINDOW seconds served by /api/tracing. Superusers
+# get the trace of an operation with the X-TavernaTrace header regardless.
+GRAPHQL_TRACING = False
+GRAPHQL_TRACING_WINDOW = 300
+
+# Log the requests running more SQL queries, or seconds of them, with their
+# slowest QUERY_BUDGET_SLOWEST statements. When QUERY_BUDGET_ENFORCED, the
+# requests running more than QUERY_BUDGET_MAX_QUERIES are aborted with a 503.
+QUERY_BUDGET_LOG_QUERIES = 50
+QUERY_BUDGET_LOG_DURATION = 1.0
+QUERY_BUDGET_SLOWEST = 5
+QUERY_BUDGET_ENFORCED = False
+QUERY_BUDGET_MAX_QUERIES = 500
+
+# Seconds for which proxies may cache the responses to persisted queries sent with GET
+PERSISTED_QUERY_MAX_AGE = 60
+
+# Number of client IP addresses whose time zone is kept in memory
+TIMEZONE_CACHE_SIZE = 4096
+
+# GraphQL endpoints whose responses are flattened
+GRAPHQL_FLATTENED_PATHS = ('/api', '/gh')
@@ -9,11 +9,16 @@ ALLOWED_HOSTS = []
 # Uncomment 'USER' and 'PASSWORD' if you have username and password for your database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.postgresql_pool',
         'NAME': dotenv.get('DB_NAME'),
         'USER': dotenv.get('DB_USER', ''),
         'PASSWORD': dotenv.get('DB_PASSWORD', ''),
         'HOST': '127.0.0.1',
         'PORT': dotenv.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0,
+        'POOL': DATABASE_POOL,
     }
 }
+
+# A single process generates ids
+ID_GENERATOR_WORKER_ID = 0
@@ -8,7 +8,21 @@ ALLOWED_HOSTS = ['*']
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 DATABASES = {
-    'default': dj_database_url.config()
+    'default': dj_database_url.config(engine='core.db.postgresql_pool')
 }
 
-DATABASES['default']['CONN_MAX_AGE'] = 500
+# Connections are returned to the pool at the end of each request
+DATABASES['default']['CONN_MAX_AGE'] = 0
+DATABASES['default']['POOL'] = DATABASE_POOL
+
+# Web workers take worker ids below 1000 from core/gunicorn_conf.py. Other
+# processes, like the release phase and one-off dynos (heroku run), read
+# ID_GENERATOR_WORKER_ID from the environment, or else fall back to one of
+# the ids 1000 to 1023 picked by the number of their dyno, run.1234 taking
+# 1000 + 1234 % 24. Give concurrent one-off processes generating ids their
+# own ID_GENERATOR_WORKER_ID if their dyno numbers may collide.
+_dyno_number = dotenv.get('DYNO', '').rpartition('.')[2]
+ID_GENERATOR_WORKER_ID = int(dotenv.get(
+    'ID_GENERATOR_WORKER_ID',
+    1000 + (int(_dyno_number) if _dyno_number.isdigit() else 0) % 24
+))
@@ -12,11 +12,16 @@ DEBUG = True
 # Uncomment 'USER' and 'PASSWORD' if you have username and password for your database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.postgresql_pool',
         'NAME': 'travis_ci_test',
         'USER': 'postgres',
         'PASSWORD': '',
         'HOST': '127.0.0.1',
         'PORT': '5432',
+        'CONN_MAX_AGE': 0,
+        'POOL': DATABASE_POOL,
     }
 }
+
+# A single process generates ids
+ID_GENERATOR_WORKER_ID = 0
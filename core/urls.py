@@ -2,13 +2,12 @@ from django.conf.urls import url, include
 from django.contrib import admin
 from django.views.decorators.csrf import csrf_exempt
 
-from graphene_django.views import GraphQLView
-
 from app.api.auth import authorization_required
+from app.api.views import ApiGraphQLView
 
 urlpatterns = [
     url(r'^api/', include('app.api.urls')),
     url(r'^', admin.site.urls),
-    url(r'^api$', csrf_exempt(authorization_required(GraphQLView.as_view()))),
-    url(r'^gh$', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    url(r'^api$', csrf_exempt(authorization_required(ApiGraphQLView.as_view()))),
+    url(r'^gh$', csrf_exempt(ApiGraphQLView.as_view(graphiql=True))),
 ]
@@ -0,0 +1,74 @@
+"""
+Benchmark computing the cycle days of a range of dates.
+
+Compares calling calculate_cycle_day and is_timetable_inactive_this_day
+for each date with Timetable.cycle_days over the whole range. The blackout
+dates come from the same single query on both sides, so they are fixed here
+and the benchmark needs no database.
+
+Usage: python scripts/benchmark_cycle_days.py [number_of_days]
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from app.timetables.models import Timetable  # noqa: E402
+
+
+def build_timetable():
+    timetable = Timetable(
+        name='Fellows Timetable',
+        cycle_length=14,
+        ref_cycle_day=2,
+        ref_cycle_date=datetime.date(2016, 10, 1),
+        inactive_weekdays='5,6'
+    )
+    blackout_dates = {datetime.date(2016, 12, day) for day in range(24, 32)}
+    timetable.get_blackout_dates = lambda start_date, end_date, blackouts=None: blackout_dates
+
+    return timetable
+
+
+def before(timetable, start_date, end_date):
+    blackout_dates = timetable.get_blackout_dates(start_date, end_date)
+    dates, cycle_days, inactive, blackout = [], [], [], []
+    date = start_date
+    while date <= end_date:
+        dates.append(date)
+        cycle_days.append(timetable.calculate_cycle_day(date))
+        inactive.append(timetable.is_timetable_inactive_this_day(date))
+        blackout.append(date in blackout_dates)
+        date += datetime.timedelta(days=1)
+
+    return dates, cycle_days, inactive, blackout
+
+
+def after(timetable, start_date, end_date):
+    return timetable.cycle_days(start_date, end_date)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    timetable = build_timetable()
+    start_date = timetable.ref_cycle_date
+    end_date = start_date + datetime.timedelta(days=days - 1)
+    assert tuple(before(timetable, start_date, end_date)) == after(timetable, start_date, end_date)
+
+    print('Computing the cycle days of {} dates'.format(days))
+    for name, func in (('before', before), ('after', after)):
+        seconds = timeit.timeit(
+            lambda: func(timetable, start_date, end_date), number=50
+        ) / 50
+        print('{:<7} {:>9.3f} ms'.format(name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark the flattening of large GraphQL connection results.
+
+Compares the former approach, which decoded the serialized response body,
+flattened it and encoded it again, with flattening the result before it is
+serialized once. Reports the mean latency and peak allocations of each.
+
+Usage: python scripts/benchmark_flattener.py [number_of_edges]
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from common.middleware import GraphqlResponseFlattenerMiddleware  # noqa: E402
+
+
+def legacy_flatten(body):
+    """Flattening as done by the middleware on the response body before."""
+    content = json.loads(body)
+    flattened_content = {}
+    index = 0
+    for resource in list(content['data'].values()):
+        key = list(content['data'].keys())[index]
+        if (resource and 'edges' in resource and
+                isinstance(resource['edges'], list) and
+                len(resource['edges']) > 0 and
+                'node' in resource['edges'][0]):
+            flattened_content[key] = []
+            for item in list(resource.values())[0]:
+                flattened_content[key].append(list(item.values())[0])
+        index += 1
+
+    return json.dumps(flattened_content)
+
+
+def build_result(edges):
+    return {'data': {'reviews': {'edges': [
+        {'node': {
+            'id': 'UmV2aWV3Tm9kZTox{}'.format(i),
+            'value': i % 5 + 1,
+            'comment': 'Fresh and Delicious! ' * 4,
+            'serving': {'menuItem': {'dish': {'name': 'Coconut rice {}'.format(i)}}},
+        }} for i in range(edges)
+    ]}}}
+
+
+def before(result):
+    return legacy_flatten(json.dumps(result, separators=(',', ':')))
+
+
+def after(result):
+    return json.dumps(GraphqlResponseFlattenerMiddleware.flatten(result), separators=(',', ':'))
+
+
+def measure(func, result, number):
+    seconds = timeit.timeit(lambda: func(result), number=number) / number
+
+    tracemalloc.start()
+    func(result)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return seconds * 1000, peak / 1024
+
+
+def main():
+    edges = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    result = build_result(edges)
+    assert json.loads(before(result)) == json.loads(after(result))
+
+    print('Flattening a connection of {} edges'.format(edges))
+    for name, func in (('before', before), ('after', after)):
+        milliseconds, kilobytes = measure(func, result, number=20)
+        print('{:<7} {:>9.2f} ms {:>12.0f} KiB peak allocated'.format(
+            name, milliseconds, kilobytes
+        ))
+
+
+if __name__ == '__main__':
+    main()
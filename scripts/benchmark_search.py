@@ -0,0 +1,104 @@
+"""
+Benchmark searching dish names and review comments.
+
+Compares the LIKE '%terms%' scan of every row that the icontains filters
+make on SQLite, in an in-memory database, with an NgramIndex search, which
+also matches similar texts and ranks them. The texts are generated from a
+vocabulary of food words and random words, picked with Zipf frequencies.
+
+Usage: python scripts/benchmark_search.py [number_of_dishes] [number_of_comments]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import timeit
+from bisect import bisect
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from common.search import NgramIndex  # noqa: E402
+
+FOOD_WORDS = [
+    'rice', 'jollof', 'fried', 'beans', 'yam', 'pounded', 'porridge', 'plantain', 'egusi',
+    'soup', 'stew', 'chicken', 'beef', 'fish', 'moi', 'salad', 'bread', 'egg', 'coconut',
+    'ofada', 'amala', 'okra', 'pepper', 'spicy', 'sweet', 'cold', 'hot', 'good', 'great',
+]
+SYLLABLES = ['ba', 'ko', 'la', 'mi', 'nu', 'ra', 'se', 'ti', 'wo', 'ye', 'dan', 'gor', 'pel']
+QUERIES = ['jollof rice', 'plantian', 'egusi soup', 'ice st', 'pounded yam and egusi']
+
+
+def generate_texts(count, min_words, max_words, seed):
+    generator = random.Random(seed)
+    words = FOOD_WORDS + [
+        ''.join(generator.choice(SYLLABLES) for _ in range(generator.randint(2, 4)))
+        for _ in range(5000)
+    ]
+    cumulative_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+    def pick_word():
+        return words[bisect(cumulative_weights, generator.random() * cumulative_weights[-1])]
+
+    return [
+        ' '.join(pick_word() for _ in range(generator.randint(min_words, max_words)))
+        for _ in range(count)
+    ]
+
+
+def build_table(texts):
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE text (id integer PRIMARY KEY, text varchar(500))')
+    connection.executemany('INSERT INTO text (text) VALUES (?)', ((text,) for text in texts))
+    return connection
+
+
+def build_index(texts):
+    index = NgramIndex()
+    for key, text in enumerate(texts):
+        index.add(key, text)
+    return index
+
+
+def before(connection, query):
+    return connection.execute(
+        "SELECT id FROM text WHERE text LIKE ? ESCAPE '\\' LIMIT 500", ('%{}%'.format(query),)
+    ).fetchall()
+
+
+def after(index, query):
+    return index.search(query, 0.3, 500)
+
+
+def benchmark(name, texts):
+    connection = build_table(texts)
+    build_seconds = timeit.timeit(lambda: build_index(texts), number=1)
+    index = build_index(texts)
+
+    print('Searching {} {} (index built in {:.1f} s)'.format(len(texts), name, build_seconds))
+    for query in QUERIES:
+        seconds = [
+            timeit.timeit(lambda: func(*args), number=5) / 5
+            for func, args in ((before, (connection, query)), (after, (index, query)))
+        ]
+        print('{:<22} before {:>8.2f} ms ({:>3} matches)  after {:>8.2f} ms ({:>3} matches)'.format(
+            query, seconds[0] * 1000, len(before(connection, query)),
+            seconds[1] * 1000, len(after(index, query))
+        ))
+
+
+def main():
+    dishes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    comments = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    benchmark('dishes', generate_texts(dishes, 1, 3, seed=1))
+    benchmark('comments', generate_texts(comments, 4, 12, seed=2))
+
+
+if __name__ == '__main__':
+    main()
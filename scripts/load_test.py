@@ -0,0 +1,138 @@
+"""
+Load test the /api endpoint under each gunicorn worker class.
+
+For each worker class, starts gunicorn with core/gunicorn_conf.py, sends
+requests from a number of concurrent clients and reports throughput and
+latency percentiles. The database of the current settings must hold the
+data the query reads and a superuser, whose credentials obtain the api key.
+
+Usage:
+    python scripts/load_test.py --username admin --password secret \\
+        --worker-classes sync,gthread --requests 2000 --concurrency 32 \\
+        --query '{servings(timetable: "fellows", date: "2017-06-05") {publicId}}'
+
+Pass --url to load test an already running server instead.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test the /api endpoint.')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--query', default='{dishes {edges {node {name}}}}')
+    parser.add_argument('--worker-classes', default='sync,gthread')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help='Base url of a running server.')
+    return parser.parse_args()
+
+
+def start_server(worker_class, args):
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        GUNICORN_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads)
+    )
+    gunicorn = os.path.join(os.path.dirname(sys.executable), 'gunicorn')
+    server = subprocess.Popen(
+        [gunicorn, 'core.wsgi', '--config', 'core/gunicorn_conf.py'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    base_url = 'http://127.0.0.1:{}'.format(args.port)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url, timeout=1)
+            return server, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+
+    server.terminate()
+    sys.exit('gunicorn did not start with {} workers.'.format(worker_class))
+
+
+def obtain_api_key(base_url, args):
+    response = requests.post(base_url + '/api/api_key', auth=(args.username, args.password))
+    response.raise_for_status()
+    return response.json()['api_key']
+
+
+def run_client(base_url, api_key, query, count, latencies, errors):
+    session = requests.Session()
+    session.headers['X-TAVERNATOKEN'] = api_key
+    for _ in range(count):
+        started_at = time.perf_counter()
+        response = session.get(base_url + '/api', params={'query': query})
+        latencies.append(time.perf_counter() - started_at)
+        if response.status_code != 200 or 'error' in response.json():
+            errors.append(response.status_code)
+
+
+def load_test(base_url, args):
+    api_key = obtain_api_key(base_url, args)
+    latencies = []
+    errors = []
+    count = args.requests // args.concurrency
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(base_url, api_key, args.query, count, latencies, errors)
+        )
+        for _ in range(args.concurrency)
+    ]
+
+    started_at = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    args = parse_args()
+    print('{} requests from {} clients'.format(args.requests, args.concurrency))
+    row = ('{0:<10} {throughput:>10.1f} req/s  p50 {p50:>8.2f} ms  p99 {p99:>8.2f} ms  '
+           '{errors} errors')
+
+    if args.url:
+        print(row.format('server', **load_test(args.url.rstrip('/'), args)))
+        return
+
+    for worker_class in args.worker_classes.split(','):
+        server, base_url = start_server(worker_class, args)
+        try:
+            print(row.format(worker_class, **load_test(base_url, args)))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()